@@ -0,0 +1,125 @@
+"""
+End to end benchmark of ggmt commands against local replay of gosugamers and Liquipedia.
+Every command runs in its own process with empty cache and history, reported are
+wall time, requests and bytes served by replay servers and peak RSS of the process.
+
+    python -m benchmarks.bench_cli [-r REPEAT] [--latency SECONDS] [--error-rate FRACTION]
+                                   [--save results.json] [--compare baseline.json]
+
+With --compare the exit code is 1 if any command exits differently, makes more requests than
+the baseline or gets slower than the baseline by more than --tolerance. benchmarks/baseline.json
+is the baseline `tox -e bench` checks against.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.replay import ReplayServer, gosugamers_routes, liquipedia_routes
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# name, arguments, stdin
+COMMANDS = [
+    ('tick', ['tick', 'dota2'], None),
+    ('tick all', ['tick', 'dota2', 'counterstrike', 'lol', 'overwatch'], None),
+    ('recap', ['recap', 'dota2'], None),
+    ('watch --print', ['watch', 'dota2', '--print'], '0\n'),
+    ('notify', ['notify', 'dota2', '.', '--force'], None),
+    ('tournament', ['tournament', 'dota2', '--json'], None),
+]
+
+
+def run(args, env, stdin=None):
+    """
+    run ggmt command in new process
+    :returns: (wall seconds, peak rss in KiB, exit code)
+    """
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', 'from ggmt.cli import cli; cli()', '--no-cache'] + args,
+                            env=env, cwd=ROOT, stdin=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if stdin:
+        proc.stdin.write(stdin.encode('utf-8'))
+    proc.stdin.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    return time.perf_counter() - started, usage.ru_maxrss, proc.returncode
+
+
+def bench(repeat=3, latency=0, error_rate=0):
+    """:returns: {command name: {'wall', 'requests', 'bytes', 'rss', 'exit'}} with best wall time of repeats"""
+    results = {}
+    with ReplayServer(gosugamers_routes(), latency=latency, error_rate=error_rate) as gosu, \
+            ReplayServer(liquipedia_routes(), latency=latency, error_rate=error_rate) as liquid, \
+            tempfile.TemporaryDirectory() as home:
+        # empty PATH keeps notify from popping up desktop notifications
+        env = dict(os.environ, HOME=home, XDG_CACHE_HOME=os.path.join(home, 'cache'),
+                   GGMT_GOSUGAMERS_URL=gosu.url, GGMT_LIQUIPEDIA_URL=liquid.url, PATH='')
+        for name, args, stdin in COMMANDS:
+            best = None
+            for _ in range(repeat):
+                gosu.reset()
+                liquid.reset()
+                wall, rss, code = run(args, env, stdin)
+                result = {
+                    'wall': wall,
+                    'requests': gosu.requests + liquid.requests,
+                    'bytes': gosu.bytes + liquid.bytes,
+                    'rss': rss,
+                    'exit': code,
+                }
+                if best is None or wall < best['wall']:
+                    best = result
+            results[name] = best
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """:returns: list of regression descriptions"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['exit'] != base['exit']:
+            regressions.append('{}: exit code {}, baseline {}'.format(name, result['exit'], base['exit']))
+        if result['requests'] > base['requests']:
+            regressions.append('{}: {} requests, baseline {}'.format(name, result['requests'], base['requests']))
+        if result['wall'] > base['wall'] * (1 + tolerance):
+            regressions.append('{}: {:.3f}s, baseline {:.3f}s'.format(name, result['wall'], base['wall']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0, help='seconds every response is delayed by')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests failing with 503')
+    parser.add_argument('--save', help='write results to json file')
+    parser.add_argument('--compare', help='baseline json file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown (default=0.5)')
+    args = parser.parse_args()
+
+    results = bench(args.repeat, args.latency, args.error_rate)
+    print('{:<16}{:>10}{:>10}{:>12}{:>12}{:>6}'.format('command', 'wall s', 'requests', 'bytes', 'rss KiB', 'exit'))
+    for name, r in results.items():
+        print('{:<16}{:>10.3f}{:>10}{:>12}{:>12}{:>6}'.format(
+            name, r['wall'], r['requests'], r['bytes'], r['rss'], r['exit']))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
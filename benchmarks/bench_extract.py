@@ -0,0 +1,103 @@
+"""
+Benchmark of gosugamers match row extraction.
+Compares legacy per field xpath extraction, compiled single pass extraction and streaming extraction
+and checks that all of them produce byte identical json to fixtures in tests/html/match_*.json.
+
+    python -m benchmarks.bench_extract [-n ROUNDS]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+from urllib.parse import urljoin
+
+from parsel import Selector
+
+from ggmt import Match
+from ggmt.matchticker import GosuTicker, time_to_seconds
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'html')
+# keys that depend on when the fixtures were made: timestamp is relative to now,
+# stream is only filled in by GosuTicker.update_match_streams
+VOLATILE_KEYS = ('timestamp', 'stream')
+
+
+def legacy_find_match(ticker, sel):
+    """GosuTicker._find_match as it was before single pass extraction"""
+    xpath = lambda x: sel.xpath(x).extract_first(default='').strip()
+    item = Match()
+    item['url'] = urljoin(ticker.url_base, xpath(".//a/@href"))
+    item['id'] = (re.findall(r'matches/(\d+)', item['url']) or [None])[0]
+    item['game'] = next((g for g in ticker.games if g in item['url'].lower()))
+    item['time'] = xpath("td[@class='status']/span/text()")
+    item['time_secs'] = time_to_seconds(item['time'])
+    item['t1'] = xpath(".//span[contains(@class,'opp1')]/span/text()")
+    item['t1_country'] = xpath(".//span[contains(@class,'opp1')]/span[contains(@class,'flag')]/@title")
+    item['t1_country_short'] = xpath(".//span[contains(@class,'opp1')]"
+                                     "/span[contains(@class,'flag')]/@class").split()[-1]
+    item['t2'] = xpath(".//span[contains(@class,'opp2')]/span/text()")
+    item['t2_country'] = xpath(".//span[contains(@class,'opp2')]/span[contains(@class,'flag')]/@title")
+    item['t2_country_short'] = xpath(".//span[contains(@class,'opp2')]"
+                                     "/span[contains(@class,'flag')]/@class").split()[-1]
+    scores = sel.css('.score::text').extract()
+    item['t1_score'] = scores[0] if scores else None
+    item['t2_score'] = scores[1] if len(scores) > 1 else None
+    return item
+
+
+def legacy(ticker, html):
+    return [legacy_find_match(ticker, row) for row in Selector(text=html).xpath("//table[@id='gb-matches']//tr")]
+
+
+def compiled(ticker, html):
+    return list(ticker.find_matches(Selector(text=html)))
+
+
+def streaming(ticker, html, chunk_size=8192):
+    data = html.encode('utf-8')
+    return list(ticker.stream_matches(data[i:i + chunk_size] for i in range(0, len(data), chunk_size)))
+
+
+def rows_only(html):
+    """rows of already parsed page, to time extraction without html parsing"""
+    return Selector(text=html).xpath("//table[@id='gb-matches']//tr")
+
+
+def dump(matches):
+    return json.dumps([{k: v for k, v in m.items() if k not in VOLATILE_KEYS} for m in matches])
+
+
+def main(rounds):
+    failed = False
+    names = ('legacy', 'compiled', 'streaming', 'legacy rows', 'compiled rows')
+    totals = dict.fromkeys(names, 0)
+    row_format = '{:<18}{:>6}' + '{:>12.2f}ms' * len(names)
+    print(('{:<18}{:>6}' + '{:>14}' * len(names)).format('fixture', 'rows', *names))
+    for game in GosuTicker.games:
+        ticker = GosuTicker(game)
+        with open(os.path.join(FIXTURES, 'match_{}.html'.format(game))) as f:
+            html = f.read()
+        with open(os.path.join(FIXTURES, 'match_{}.json'.format(game))) as f:
+            expected = dump(json.load(f))
+        times = []
+        for name, func in (('legacy', legacy), ('compiled', compiled), ('streaming', streaming)):
+            if dump(func(ticker, html)) != expected:
+                print('{}: {} output differs from fixture'.format(game, name), file=sys.stderr)
+                failed = True
+            times.append(min(timeit.repeat(lambda: func(ticker, html), number=1, repeat=rounds)))
+        rows = rows_only(html)
+        times.append(min(timeit.repeat(lambda: [legacy_find_match(ticker, r) for r in rows], number=1, repeat=rounds)))
+        times.append(min(timeit.repeat(lambda: [ticker._find_match(r) for r in rows], number=1, repeat=rounds)))
+        for name, took in zip(names, times):
+            totals[name] += took
+        print(row_format.format(game, len(rows), *(t * 1000 for t in times)))
+    print(row_format.format('total', '', *(totals[name] * 1000 for name in names)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--rounds', type=int, default=20, help='best of how many rounds')
+    sys.exit(main(parser.parse_args().rounds))
@@ -0,0 +1,95 @@
+"""
+Startup benchmark of the ggmt entry point using python -X importtime.
+Measures interpreter plus import cost of paths that run often from cron or status bars
+and fails if import time goes over budget.
+
+    python -m benchmarks.bench_startup [-r REPEAT] [--budget-scale FACTOR] [--top N]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.replay import ReplayServer, gosugamers_routes
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RE_IMPORT = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# name, arguments, import time budget in milliseconds
+SCENARIOS = [
+    ('--help', ['--help'], 100),
+    ('--help-template', ['--help-template'], 100),
+    ('tick --help', ['tick', '--help'], 100),
+    ('tick (cached)', ['--cache-ttl', '3600', 'tick', 'dota2'], 300),
+]
+HEAVY = ['requests', 'parsel', 'lxml', 'jinja2', 'colorama']
+
+
+def parse_importtime(stderr: str):
+    """:returns: (total import milliseconds, {module: self milliseconds})"""
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        found = RE_IMPORT.match(line)
+        if not found:
+            continue
+        own, cumulative, indent, name = found.groups()
+        modules[name] = int(own) / 1000
+        if not indent.replace(' ', '', 1):
+            total += int(cumulative) / 1000
+    return total, modules
+
+
+def run(args, env):
+    """:returns: (wall seconds, import milliseconds, {module: self milliseconds})"""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from ggmt.cli import cli; cli()'] + args,
+                          env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    wall = time.perf_counter() - started
+    return (wall,) + parse_importtime(proc.stderr)
+
+
+def bench(repeat=5):
+    """:returns: {scenario: (best wall seconds, best import milliseconds, modules of best run)}"""
+    results = {}
+    with ReplayServer(gosugamers_routes()) as gosu, tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, XDG_CACHE_HOME=os.path.join(home, 'cache'), GGMT_GOSUGAMERS_URL=gosu.url)
+        for name, args, _ in SCENARIOS:
+            run(args, env)  # warm up caches, os file cache and template bytecode
+            runs = [run(args, env) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r[1])
+            results[name] = (min(r[0] for r in runs), best[1], best[2])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='multiply budgets for slower machines')
+    parser.add_argument('--top', type=int, default=0, help='list N slowest modules of every scenario')
+    args = parser.parse_args()
+
+    results = bench(args.repeat)
+    over = []
+    print('{:<18}{:>10}{:>12}{:>12}  {}'.format('scenario', 'wall ms', 'import ms', 'budget ms', 'heavy imports'))
+    for name, _, budget in SCENARIOS:
+        wall, imports, modules = results[name]
+        budget *= args.budget_scale
+        heavy = [m for m in HEAVY if m in modules]
+        print('{:<18}{:>10.1f}{:>12.1f}{:>12.0f}  {}'.format(name, wall * 1000, imports, budget,
+                                                            ', '.join(heavy) or '-'))
+        for module, own in sorted(modules.items(), key=lambda m: -m[1])[:args.top]:
+            print('    {:>8.1f} {}'.format(own, module))
+        if imports > budget:
+            over.append(name)
+    if over:
+        print('OVER BUDGET ' + ', '.join(over))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
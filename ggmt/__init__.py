@@ -1,7 +1,9 @@
+import json
 from collections import OrderedDict
 
 
 class StrictDict(dict):
+    __slots__ = ()
     keys = []
     keys = OrderedDict(keys)
 
@@ -14,12 +16,38 @@ class StrictDict(dict):
     def __setattr__(self, key, value):
         raise NotImplementedError("use {}['key'] to set attributes".format(self.__name__))
 
+    def to_json(self) -> str:
+        return json.dumps(self)
+
+    @classmethod
+    def from_json(cls, text: str):
+        item = cls()
+        item.update_from(json.loads(text))
+        return item
+
+    def update_from(self, data: dict):
+        """strict version of dict.update"""
+        for key, value in data.items():
+            self[key] = value
+
+    def as_tuple(self) -> tuple:
+        """values of all keys in order of cls.keys, None for missing ones"""
+        return tuple(self.get(key) for key in self.keys)
+
+    @classmethod
+    def from_tuple(cls, row: tuple):
+        """inverse of as_tuple, None values are left out"""
+        item = cls()
+        item.update_from({key: value for key, value in zip(cls.keys, row) if value is not None})
+        return item
+
 
 class Match(StrictDict):
     """
     Storage object for storing esport games match data.
     See Match.keys for available keys
     """
+    __slots__ = ()
     keys = [
         ('url', 'url to gosugamers match page'),
         ('id', 'gosugamers match id'),
@@ -36,6 +64,8 @@ class Match(StrictDict):
         ('t2_country_short', 'short version of country of team 2'),
         ('t2_score', 'score of team 2'),
         ('stream', 'direct stream url to match hosting channel'),
+        ('source', 'game page match was downloaded from, e.g. dota2 or all'),
+        ('provider', 'match provider that listed the match, e.g. gosugamers'),
     ]
     keys = OrderedDict(keys)
 
@@ -45,6 +75,7 @@ class Match(StrictDict):
 
 
 class Event(StrictDict):
+    __slots__ = ()
     keys = [
         ('name', 'tournament name'),
         ('date', 'when tournament was on going'),
@@ -52,3 +83,40 @@ class Event(StrictDict):
         ('info', 'information about tournament'),
     ]
     keys = OrderedDict(keys)
+
+
+class BracketMatch(StrictDict):
+    """Match of a tournament bracket, see ggmt.brackets"""
+    __slots__ = ()
+    keys = [
+        ('t1', 'name of team 1'),
+        ('t1_score', 'score of team 1, None if match was not played yet'),
+        ('t2', 'name of team 2'),
+        ('t2_score', 'score of team 2, None if match was not played yet'),
+    ]
+    keys = OrderedDict(keys)
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.get('t1_score') and self.get('t2_score'))
+
+
+class Bracket(StrictDict):
+    """Tournament bracket, see ggmt.brackets"""
+    __slots__ = ()
+    keys = [
+        ('name', 'bracket name, e.g. Upper Bracket'),
+        ('rounds', 'list of rounds, every round is a list of BracketMatch'),
+    ]
+    keys = OrderedDict(keys)
+
+
+class Change(StrictDict):
+    """Difference of a match between two polls, see ggmt.diff"""
+    __slots__ = ()
+    keys = [
+        ('change', 'type of change: added, removed, went_live, score_changed or stream_appeared'),
+        ('match', 'Match as seen by current poll, last seen Match for removed matches'),
+        ('previous', 'Match as seen by previous poll, missing for added matches'),
+    ]
+    keys = OrderedDict(keys)
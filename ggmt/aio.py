@@ -0,0 +1,289 @@
+"""
+Asyncio versions of GosuTicker and LiquidBracketDownloader built on httpx, for embedding ggmt in async services:
+
+    async with AsyncFetcher(per_host=4) as fetcher:
+        matches = await AsyncGosuTicker('dota2', fetcher=fetcher).download_matches()
+
+Downloaders that are not given a fetcher create their own, close it with `async with` or aclose().
+
+Pages are parsed by the same code as the blocking downloaders. Requires httpx: pip install ggmt[async]
+"""
+import asyncio
+from typing import List
+from urllib.parse import urlsplit
+
+from parsel import Selector
+
+from ggmt import Bracket, Event, Match
+from ggmt.brackets import BracketCache, page_revision, parse_brackets
+from ggmt.http import POLICY, DeadlineExceeded, HttpPolicy
+from ggmt.matchticker import GosuTicker, merge_matches, response_time
+from ggmt.metrics import METRICS
+from ggmt.settings import MAX_WORKERS
+from ggmt.streams import StreamMemo
+from ggmt.tournament import LiquidBracketDownloader, EVENT_CURRENT, EVENT_FUTURE, EVENT_PAST
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError('async api requires "httpx" package: pip install ggmt[async]')
+    return httpx
+
+
+class AsyncFetcher:
+    """
+    Pooled httpx.AsyncClient with a concurrency limit per host, requests follow HttpPolicy:
+    retries with backoff, circuit breaker and deadline shared with the blocking downloaders.
+    One fetcher can be shared by any number of downloaders and concurrent callers of an event loop.
+    """
+
+    def __init__(self, per_host: int = MAX_WORKERS, timeout: float = GosuTicker.stream_timeout, client=None,
+                 policy: HttpPolicy = None):
+        """
+        :param per_host: how many requests to a single host can be in flight at once
+        :param timeout: request timeout in seconds
+        :param client: httpx.AsyncClient to use instead of creating one
+        :param policy: HttpPolicy of requests, process wide POLICY by default
+        """
+        httpx = _httpx()
+        self.per_host = per_host
+        self.timeout = timeout
+        self.client = client or httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+        self.policy = policy or POLICY
+        self.semaphores = {}
+        self.retry_errors = (httpx.TransportError,)
+        self.errors = (httpx.HTTPError, ConnectionRefusedError, DeadlineExceeded)
+
+    async def get(self, url: str):
+        """
+        :returns: httpx.Response
+        :raises CircuitOpen: if host keeps failing
+        """
+        host = urlsplit(url).netloc
+        semaphore = self.semaphores.get(host)
+        if semaphore is None:
+            semaphore = self.semaphores[host] = asyncio.Semaphore(self.per_host)
+        async with semaphore:
+            return await self.policy.aget(self.client.get, url, self.retry_errors, self.timeout)
+
+    async def get_ok(self, url: str):
+        """
+        :returns: httpx.Response
+        :raises ConnectionRefusedError: if response is not 200
+        """
+        resp = await self.get(url)
+        if resp.status_code != 200:
+            raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
+        return resp
+
+    async def get_text(self, url: str) -> str:
+        """:raises ConnectionRefusedError: if response is not 200"""
+        return (await self.get_ok(url)).text
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+async def _map(func, items, limit: int = None) -> list:
+    """
+    Concurrent version of list(map(func, items)) for coroutine function func
+    :param limit: how many calls run at once, all at once by default
+    """
+    semaphore = asyncio.Semaphore(limit) if limit else None
+
+    async def call(item):
+        if semaphore is None:
+            return await func(item)
+        async with semaphore:
+            return await func(item)
+    return list(await asyncio.gather(*[call(item) for item in items]))
+
+
+def _blocking_only(name: str):
+    """method of blocking downloader without asyncio version, so it isn't inherited as a broken one"""
+    def method(self, *args, **kwargs):
+        raise NotImplementedError('{}.{} has no asyncio version'.format(type(self).__name__, name))
+    method.__name__ = name
+    return method
+
+
+class _Fetching:
+    """Downloader with AsyncFetcher, one is created on first use unless it was given one"""
+    _fetcher = None
+    _owns_fetcher = False
+
+    @property
+    def fetcher(self) -> AsyncFetcher:
+        if self._fetcher is None:
+            self._fetcher = AsyncFetcher()
+            self._owns_fetcher = True
+        return self._fetcher
+
+    async def aclose(self):
+        """close fetcher created by the downloader, fetchers it was given are left open"""
+        if self._owns_fetcher:
+            fetcher, self._fetcher, self._owns_fetcher = self._fetcher, None, False
+            await fetcher.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+class AsyncGosuTicker(_Fetching, GosuTicker):
+    """
+    Asyncio version of GosuTicker, download methods are coroutines.
+    Cancelling a download cancels all of its pending match page requests.
+    Snapshots and streaming iteration are only available in GosuTicker.
+    """
+    download_changes = _blocking_only('download_changes')
+    iter_matches = _blocking_only('iter_matches')
+    iter_match_streams = _blocking_only('iter_match_streams')
+
+    def __init__(self, game, fetcher: AsyncFetcher = None, streams: StreamMemo = None):
+        """
+        :param fetcher: AsyncFetcher to download with, downloader creates its own by default
+        :param streams: StreamMemo of streams resolved before, None to always download match pages
+        """
+        super().__init__(game, streams=streams)
+        self._fetcher = fetcher
+
+    async def download_matches(self, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
+        """see GosuTicker.download_matches"""
+        resp = await self.fetcher.get_ok(self.game_url)
+        matches = self.find_matches(Selector(text=resp.text), response_time(resp))
+        return await self._prepare(matches, crawl_stream, max_workers)
+
+    async def download_history(self, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
+        """see GosuTicker.download_history"""
+        resp = await self.fetcher.get_ok('{}/gosubet'.format(self.game_url))
+        matches = self.find_history(Selector(text=resp.text), response_time(resp))
+        return await self._prepare(matches, crawl_stream, max_workers)
+
+    async def _prepare(self, matches, crawl_stream, max_workers):
+        matches = list(matches)
+        for item in matches:
+            item['source'] = self.game
+        if crawl_stream:
+            await self.update_match_streams(matches, max_workers=max_workers)
+        return matches
+
+    async def find_stream(self, match: Match) -> str:
+        """see GosuTicker.find_stream"""
+        return self.parse_stream(await self.fetcher.get_text(match['url']))
+
+    async def _find_stream_safe(self, match: Match) -> str:
+        if self.streams is not None:
+            found, stream = self.streams.get(match)
+            if found:
+                return stream
+        try:
+            stream = await self.find_stream(match)
+        except self.fetcher.errors as e:
+            self.logger.error("Couldn't retrieve stream for {}: {}".format(match['url'], e))
+            return None
+        if self.streams is not None:
+            self.streams.set(match, stream)
+        return stream
+
+    async def update_match_streams(self, matches: List[Match], max_workers: int = None) -> List[Match]:
+        """
+        Populate live Match objects with stream urls, match pages are downloaded concurrently
+        within the per host limit of the fetcher.
+        :param max_workers: how many match pages to download at once, only limited by fetcher by default
+        """
+        live = [item for item in matches if not item['time_secs']]
+        streams = await _map(self._find_stream_safe, live, max_workers)
+        for item, stream in zip(live, streams):
+            item['stream'] = stream
+        return matches
+
+
+async def download_games(games: List[str], history: bool = False, fetcher: AsyncFetcher = None,
+                         streams: StreamMemo = None) -> List[Match]:
+    """
+    Asyncio version of ggmt.matchticker.download_games
+    :param fetcher: AsyncFetcher to download with, one is created and closed for the call by default
+    :returns: list of Match objects of all games sorted by time_secs, page order for a single game
+    """
+    if fetcher is None:
+        async with AsyncFetcher() as fetcher:
+            return await download_games(games, history, fetcher, streams)
+    tickers = [AsyncGosuTicker(game, fetcher=fetcher, streams=streams) for game in dict.fromkeys(games)]
+    results = await asyncio.gather(*[t.download_history() if history else t.download_matches() for t in tickers])
+    if len(results) == 1:
+        return results[0]
+    return merge_matches(results)
+
+
+class AsyncLiquidBracketDownloader(_Fetching, LiquidBracketDownloader):
+    """
+    Asyncio version of LiquidBracketDownloader, download methods are coroutines.
+    Terminal brackets are only available in LiquidBracketDownloader.
+    """
+    download_brackets = _blocking_only('download_brackets')
+
+    def __init__(self, game, fetcher: AsyncFetcher = None, brackets: BracketCache = None):
+        """
+        :param fetcher: AsyncFetcher to download with, downloader creates its own by default
+        :param brackets: BracketCache of parsed brackets, kept in memory by default
+        """
+        super().__init__(game, brackets=brackets)
+        self._fetcher = fetcher
+
+    async def index(self) -> Selector:
+        """see LiquidBracketDownloader.index"""
+        if self._index is None:
+            self._index = Selector(text=await self.fetcher.get_text(self.game_url))
+        return self._index
+
+    async def find_tournaments(self, category=None, info=False, max_workers=None) -> List[Event]:
+        """see LiquidBracketDownloader.find_tournaments"""
+        events = self.parse_tournaments(await self.index(), category)
+        if info:
+            await self.load_info(events, max_workers=max_workers)
+        return events
+
+    async def find_all_tournaments(self, info=False, max_workers=None) -> List[Event]:
+        """see LiquidBracketDownloader.find_all_tournaments"""
+        sel = await self.index()
+        events = []
+        for category in (EVENT_PAST, EVENT_CURRENT, EVENT_FUTURE):
+            events.extend(self.parse_tournaments(sel, category))
+        if info:
+            await self.load_info(events, max_workers=max_workers)
+        return events
+
+    async def find_info(self, url) -> dict:
+        """see LiquidBracketDownloader.find_info"""
+        return self.parse_info(Selector(text=await self.fetcher.get_text(url)))
+
+    async def load_info(self, events, max_workers=None):
+        """
+        Populate event['info'] of Events, event pages are downloaded concurrently
+        :param max_workers: how many event pages to download at once, only limited by fetcher by default
+        """
+        events = [e for e in events if 'info' not in e]
+        infos = await _map(self.find_info, [e['url'] for e in events], max_workers)
+        for event, info in zip(events, infos):
+            event['info'] = info
+
+    async def find_brackets(self, url: str) -> List[Bracket]:
+        """see LiquidBracketDownloader.find_brackets"""
+        content = (await self.fetcher.get_ok(url)).content
+        revision = page_revision(content)
+        brackets = self.brackets.get(url, revision)
+        if brackets is None:
+            with METRICS.timer('ggmt_phase_seconds', phase='brackets_parse'):
+                brackets = parse_brackets(content)
+            self.brackets.set(url, revision, brackets)
+        return brackets
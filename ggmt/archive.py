@@ -0,0 +1,174 @@
+"""
+Local archive of every downloaded match, so match history can be queried without touching the network.
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable, List
+
+from ggmt import Match
+
+ARCHIVE_LOCATION = os.path.join(os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'),
+                                'ggmt', 'archive.db')
+# upcoming matches that were never seen finished are dropped by compact() after this many seconds
+DEFAULT_STALE_AGE = 3600 * 24 * 7
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS matches ('
+    ' key TEXT PRIMARY KEY,'  # Match.id
+    ' id TEXT, game TEXT, t1 TEXT, t2 TEXT, t1_score TEXT, t2_score TEXT,'
+    ' timestamp INTEGER NOT NULL, finished INTEGER NOT NULL, seen REAL NOT NULL, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS matches_t1 ON matches (t1 COLLATE NOCASE, timestamp)',
+    'CREATE INDEX IF NOT EXISTS matches_t2 ON matches (t2 COLLATE NOCASE, timestamp)',
+    'CREATE INDEX IF NOT EXISTS matches_game ON matches (game, timestamp)',
+    'CREATE INDEX IF NOT EXISTS matches_timestamp ON matches (timestamp)',
+]
+
+# same Match.id is stored once: known scores are kept, started matches keep their earliest timestamp
+UPSERT = (
+    'INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET'
+    ' t1_score = COALESCE(excluded.t1_score, t1_score),'
+    ' t2_score = COALESCE(excluded.t2_score, t2_score),'
+    ' timestamp = CASE WHEN timestamp <= excluded.seen THEN MIN(timestamp, excluded.timestamp)'
+    ' ELSE excluded.timestamp END,'
+    ' finished = MAX(finished, excluded.finished),'
+    ' seen = excluded.seen,'
+    ' data = excluded.data'
+)
+
+
+def _score(value) -> str:
+    return None if value in (None, '') else str(value)
+
+
+class Archive:
+    """
+    Matches stored in sqlite database keyed by Match.id and indexed by team, game and timestamp.
+    """
+
+    def __init__(self, location: str = ARCHIVE_LOCATION):
+        """
+        :param location: sqlite database file, None to keep archive in memory only
+        """
+        if location:
+            os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+        self.db = sqlite3.connect(location or ':memory:', timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+    def add(self, matches: Iterable[Match], finished: bool = False) -> int:
+        """
+        Add or update matches
+        :param finished: matches are finished, e.g. downloaded from match history
+        :returns: amount of matches stored
+        """
+        seen = time.time()
+        rows = []
+        for match in matches:
+            if not match.get('id') or match.get('timestamp') is None:
+                continue
+            rows.append((match.id, match['id'], match.get('game'), match['t1'], match['t2'],
+                         _score(match.get('t1_score')), _score(match.get('t2_score')), int(match['timestamp']),
+                         int(finished), seen, json.dumps(match)))
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.executemany(UPSERT, rows)
+        return len(rows)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    def _where(self, team=None, opponent=None, game=None, since=None, until=None, finished=None):
+        conditions = []
+        params = []
+        if team and opponent:
+            conditions.append('((t1 = ? COLLATE NOCASE AND t2 = ? COLLATE NOCASE)'
+                              ' OR (t2 = ? COLLATE NOCASE AND t1 = ? COLLATE NOCASE))')
+            params += [team, opponent, team, opponent]
+        elif team:
+            # union of both team indexes instead of a scan
+            conditions.append('key IN (SELECT key FROM matches WHERE t1 = ? COLLATE NOCASE'
+                              ' UNION SELECT key FROM matches WHERE t2 = ? COLLATE NOCASE)')
+            params += [team, team]
+        if game:
+            conditions.append('game = ?')
+            params.append(game)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(int(since))
+        if until is not None:
+            conditions.append('timestamp < ?')
+            params.append(int(until))
+        if finished is not None:
+            conditions.append('finished = ?')
+            params.append(int(finished))
+        return ' AND '.join(conditions) or '1', params
+
+    def query(self, team: str = None, opponent: str = None, game: str = None, since: float = None,
+              until: float = None, finished: bool = None, limit: int = None) -> List[Match]:
+        """
+        :param team: name of a team that played, case insensitive
+        :param opponent: name of the other team, head to head matches of team and opponent
+        :param since: unix time matches start at or after
+        :param until: unix time matches start before
+        :param finished: only finished or only unfinished matches, None for both
+        :param limit: maximum amount of newest matches
+        :returns: list of Match objects, newest first
+        """
+        where, params = self._where(team, opponent, game, since, until, finished)
+        sql = 'SELECT data, t1_score, t2_score, timestamp FROM matches WHERE {} ORDER BY timestamp DESC'.format(where)
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        matches = []
+        for data, t1_score, t2_score, timestamp in self.db.execute(sql, params):
+            match = Match()
+            match.update_from(json.loads(data))
+            match['t1_score'], match['t2_score'], match['timestamp'] = t1_score, t2_score, timestamp
+            matches.append(match)
+        return matches
+
+    def win_rate(self, team: str, opponent: str = None, game: str = None, since: float = None,
+                 until: float = None) -> dict:
+        """
+        Results of finished matches of team
+        :returns: dict of played, won, lost, draws and rate (won / played, None if nothing was played)
+        """
+        where, params = self._where(team, opponent, game, since, until, finished=True)
+        won = ('(t1 = ? COLLATE NOCASE AND CAST(t1_score AS INTEGER) > CAST(t2_score AS INTEGER))'
+               ' OR (t2 = ? COLLATE NOCASE AND CAST(t2_score AS INTEGER) > CAST(t1_score AS INTEGER))')
+        sql = ('SELECT COUNT(*), COALESCE(SUM({won}), 0),'
+               ' COALESCE(SUM(CAST(t1_score AS INTEGER) = CAST(t2_score AS INTEGER)), 0)'
+               ' FROM matches WHERE {where} AND t1_score IS NOT NULL AND t2_score IS NOT NULL')
+        played, won, draws = self.db.execute(sql.format(won=won, where=where), [team, team] + params).fetchone()
+        return {'played': played, 'won': won, 'lost': played - won - draws, 'draws': draws,
+                'rate': won / played if played else None}
+
+    def compact(self, stale_age: int = DEFAULT_STALE_AGE) -> int:
+        """
+        Remove upcoming matches that were never seen finished and are long gone,
+        and duplicates of the same match listed with different team names (e.g. TBD before teams were known),
+        keeping the latest one. The database file is shrunk afterwards.
+        :returns: amount of removed matches
+        """
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            removed = self.db.execute('DELETE FROM matches WHERE finished = 0 AND timestamp < ?',
+                                      (time.time() - stale_age,)).rowcount
+            removed += self.db.execute(
+                'DELETE FROM matches WHERE rowid NOT IN (SELECT rowid FROM'
+                ' (SELECT rowid, ROW_NUMBER() OVER (PARTITION BY id, game ORDER BY finished DESC, seen DESC) AS n'
+                '  FROM matches) WHERE n = 1)').rowcount
+        self.db.execute('VACUUM')
+        return removed
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,171 @@
+"""
+Single pass extraction of Liquipedia tournament brackets and cache of parsed brackets per page revision.
+The page is walked once with plain lxml instead of running a css query per bracket cell.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import List
+
+from lxml import etree
+
+from ggmt import Bracket, BracketMatch
+from ggmt.extract import _classes, _text_nodes
+from ggmt.metrics import METRICS
+from ggmt.settings import CACHE_LOCATION
+
+BRACKETS_LOCATION = os.path.join(CACHE_LOCATION, 'brackets')
+RE_REVISION = re.compile(rb'"wgRevisionId"\s*:\s*(\d+)')
+
+
+def page_revision(body: bytes) -> str:
+    """:returns: MediaWiki revision id of page or hash of its content if page doesn't tell it"""
+    found = RE_REVISION.search(body)
+    if found:
+        return found.group(1).decode('ascii')
+    return hashlib.sha1(body).hexdigest()
+
+
+def _first_text(el) -> str:
+    return next((text for text in _text_nodes(el) if text), None)
+
+
+def _pair(cells: List[dict]) -> List[BracketMatch]:
+    """team cells of a round column come in pairs of opponents"""
+    matches = []
+    for i in range(0, len(cells), 2):
+        match = BracketMatch()
+        for key, cell in zip(('t1', 't2'), cells[i:i + 2]):
+            match[key] = cell['name']
+            match[key + '_score'] = cell['score']
+        matches.append(match)
+    return matches
+
+
+def parse_brackets(body: bytes) -> List[Bracket]:
+    """
+    Finds brackets in Liquipedia tournament page.
+    Produces the same structure as the css queries it replaces:
+        bracket   .bracket-scroller named by ../preceding-sibling::h3[1]//text()
+        round     .bracket-column-matches
+        team      .//div[contains(@class,"bracket-cell")]
+        name      .team-template-team-bracket span::text
+        score     .bracket-score::text
+    :param body: html of tournament page
+    :returns: list of Bracket objects
+    """
+    root = etree.HTML(body)
+    if root is None:
+        return []
+    brackets = []
+    heading = ''
+    bracket_el = column_el = cell_el = team_el = None
+    bracket = cells = cell = None
+    for event, el in etree.iterwalk(root, events=('start', 'end')):
+        if not isinstance(el.tag, str):
+            continue  # comments and processing instructions
+        if event == 'end':
+            if el.tag == 'h3':
+                heading = ''.join(el.itertext())
+            elif el is team_el:
+                team_el = None
+            elif el is cell_el:
+                cells.append(cell)
+                cell_el = None
+            elif el is column_el:
+                bracket['rounds'].append(_pair(cells))
+                column_el = None
+            elif el is bracket_el:
+                brackets.append(bracket)
+                bracket_el = None
+            continue
+        classes = _classes(el)
+        if bracket_el is None:
+            if 'bracket-scroller' in classes.split():
+                bracket_el = el
+                bracket = Bracket()
+                bracket['name'] = heading
+                bracket['rounds'] = []
+        elif column_el is None:
+            if 'bracket-column-matches' in classes.split():
+                column_el = el
+                cells = []
+        elif cell_el is None:
+            if el.tag == 'div' and 'bracket-cell' in classes:
+                cell_el = el
+                cell = {'name': '', 'score': None}
+        else:
+            names = classes.split()
+            if team_el is None and 'team-template-team-bracket' in names:
+                team_el = el
+            elif team_el is not None and el.tag == 'span' and not cell['name']:
+                cell['name'] = _first_text(el) or ''
+            if cell['score'] is None and 'bracket-score' in names:
+                cell['score'] = _first_text(el)
+    return brackets
+
+
+class BracketCache:
+    """
+    Parsed brackets keyed by tournament url and page revision, in memory and optionally on disk.
+    A page that didn't change since it was parsed doesn't need to be parsed again.
+    """
+
+    def __init__(self, location: str = BRACKETS_LOCATION):
+        """
+        :param location: directory of json files, None to keep brackets in memory only
+        """
+        self.location = location
+        self.lock = threading.Lock()
+        self.entries = {}  # url: (revision, json text)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.location, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url: str, revision: str) -> List[Bracket]:
+        """:returns: brackets of url parsed from the same revision or None, callers get their own copies"""
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is None and self.location:
+            try:
+                with open(self._path(url)) as f:
+                    entry = tuple(json.load(f))
+            except (OSError, ValueError, TypeError):
+                entry = None
+            if entry is not None:
+                with self.lock:
+                    self.entries[url] = entry
+        if entry is None or entry[0] != revision:
+            METRICS.inc('ggmt_cache_requests', kind='brackets', result='miss')
+            return None
+        METRICS.inc('ggmt_cache_requests', kind='brackets', result='hit')
+        return [_load_bracket(data) for data in json.loads(entry[1])]
+
+    def set(self, url: str, revision: str, brackets: List[Bracket]):
+        entry = (revision, json.dumps(brackets))
+        with self.lock:
+            self.entries[url] = entry
+        if not self.location:
+            return
+        os.makedirs(self.location, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.location, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(url))
+
+
+def _load_bracket(data: dict) -> Bracket:
+    bracket = Bracket()
+    bracket['name'] = data['name']
+    bracket['rounds'] = []
+    for matches in data['rounds']:
+        round_ = []
+        for data in matches:
+            match = BracketMatch()
+            match.update_from(data)
+            round_.append(match)
+        bracket['rounds'].append(round_)
+    return bracket
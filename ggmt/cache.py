@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+import requests
+
+from ggmt.metrics import METRICS, record_response
+from ggmt.settings import CACHE_LOCATION
+
+try:
+    import fcntl
+except ImportError:  # not available on windows, cache works without cross process locking then
+    fcntl = None
+
+
+# endpoint types
+MATCH_LIST = 'match_list'
+MATCH_DETAIL = 'match_detail'
+TOURNAMENT_INDEX = 'tournament_index'
+TOURNAMENT_PAGE = 'tournament_page'
+
+DEFAULT_TTL = {
+    MATCH_LIST: 60,
+    MATCH_DETAIL: 300,
+    TOURNAMENT_INDEX: 3600,
+    TOURNAMENT_PAGE: 900,
+}
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+RE_ENTRY = re.compile(r'^[0-9a-f]{40}$')
+
+
+class HttpCache:
+    """
+    On disk cache of http responses keyed by url.
+    Fresh entries are served without touching the network, expired entries are revalidated
+    with ETag/If-Modified-Since headers. Refreshes of the same url are serialized between processes
+    so concurrently running commands share one download.
+    """
+    logger = logging.getLogger('ggmt.cache')
+
+    def __init__(self, location: str = CACHE_LOCATION, ttl: int = None, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        :param location: directory where responses are stored
+        :param ttl: seconds entries stay fresh, overrides DEFAULT_TTL of every endpoint type
+        :param max_size: total size in bytes, least recently used entries are evicted above it
+        """
+        self.location = location
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def ttl_for(self, kind: str) -> int:
+        if self.ttl is not None:
+            return self.ttl
+        return DEFAULT_TTL.get(kind, 0)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.location, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _read(self, path: str):
+        """:returns: tuple of (meta dict, body bytes) or (None, None) if entry is missing or broken"""
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode('utf-8'))
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _write(self, path: str, meta: dict, body: bytes):
+        os.makedirs(self.location, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.location, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(body)
+        os.replace(tmp, path)
+
+    def _acquire(self, path: str):
+        """:returns: open lock file of path holding exclusive lock, None without fcntl"""
+        if fcntl is None:
+            return None
+        os.makedirs(self.location, exist_ok=True)
+        while True:
+            f = open(path + '.lock', 'a')
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # lock file might have been removed by previous holder while we were waiting for it
+                if os.fstat(f.fileno()).st_ino == os.stat(path + '.lock').st_ino:
+                    return f
+            except OSError:
+                pass
+            f.close()
+
+    def _release(self, lock, path: str = None):
+        """
+        Release lock returned by _acquire
+        :param path: also remove lock file of path, e.g. if the url never returned anything to cache
+        """
+        if lock is None or lock.closed:
+            return
+        if path is not None:
+            try:
+                os.remove(path + '.lock')
+            except OSError:
+                pass
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+    @contextmanager
+    def _lock(self, path: str):
+        lock = self._acquire(path)
+        try:
+            yield
+        finally:
+            self._release(lock)
+
+    def _fresh(self, meta: dict, kind: str) -> bool:
+        return meta is not None and time.time() - meta['fetched'] < self.ttl_for(kind)
+
+    def _hit(self, path: str, meta: dict, body: bytes) -> requests.Response:
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        resp = requests.models.Response()
+        resp.status_code = 200
+        resp.url = meta['url']
+        resp.encoding = meta.get('encoding')
+        resp.headers.update(meta.get('headers', {}))
+        resp.headers['Age'] = str(max(0, int(time.time() - meta['fetched'])))
+        resp._content = body
+        resp._content_consumed = True
+        return resp
+
+    def get(self, session: requests.Session, url: str, kind: str, **kwargs) -> requests.Response:
+        """
+        Cached version of session.get(url)
+        :param kind: endpoint type used to pick ttl, e.g. MATCH_LIST
+        :returns: requests.Response, either downloaded or rebuilt from cache
+        """
+        path = self._path(url)
+        meta, body = self._read(path)
+        if self._fresh(meta, kind):
+            METRICS.inc('ggmt_cache_requests', kind=kind, result='hit')
+            return self._hit(path, meta, body)
+        lock = self._acquire(path)
+        try:
+            # some other process might have refreshed the entry while we were waiting for the lock
+            meta, body = self._read(path)
+            if self._fresh(meta, kind):
+                METRICS.inc('ggmt_cache_requests', kind=kind, result='hit')
+                return self._hit(path, meta, body)
+            headers = dict(kwargs.pop('headers', None) or {})
+            if meta is not None:
+                if meta.get('headers', {}).get('ETag'):
+                    headers['If-None-Match'] = meta['headers']['ETag']
+                if meta.get('headers', {}).get('Last-Modified'):
+                    headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+            started = time.perf_counter()
+            resp = session.get(url, headers=headers, **kwargs)
+            record_response(url, resp, time.perf_counter() - started, streamed=kwargs.get('stream', False))
+            if resp.status_code == 304 and meta is not None:
+                self.logger.debug('revalidated {}'.format(url))
+                METRICS.inc('ggmt_cache_requests', kind=kind, result='revalidated')
+                meta['fetched'] = time.time()
+                self._write(path, meta, body)
+                return self._hit(path, meta, body)
+            METRICS.inc('ggmt_cache_requests', kind=kind, result='miss')
+            if resp.status_code != 200:
+                if meta is None:
+                    # nothing cached under this url, don't leave its lock file behind
+                    self._release(lock, path)
+                return resp
+            meta = {
+                'url': url,
+                'fetched': time.time(),
+                'encoding': resp.encoding,
+                'headers': {k: resp.headers[k] for k in ('ETag', 'Last-Modified', 'Content-Type')
+                            if k in resp.headers},
+            }
+            if kwargs.get('stream'):
+                # written once the body was read, so rows can be parsed as the response arrives,
+                # the lock is held until then so other processes wait for the entry instead of downloading
+                resp = self._tee(path, meta, resp, lock)
+                lock = None
+                return resp
+            self._write(path, meta, resp.content)
+            self.evict()
+            return resp
+        finally:
+            self._release(lock)
+
+    def _tee(self, path: str, meta: dict, resp: requests.Response, lock=None) -> requests.Response:
+        """
+        Make iter_content() of streamed response store the chunks it yields as cache entry of path
+        after the last one, entry is not written if the body wasn't read completely
+        :param lock: lock of path from _acquire, released once the body was read or the response closed
+        """
+        iter_content = resp.iter_content
+        close = resp.close
+
+        def tee(chunk_size=1, decode_unicode=False):
+            try:
+                if decode_unicode:
+                    yield from iter_content(chunk_size, decode_unicode)
+                    return
+                chunks = []
+                for chunk in iter_content(chunk_size):
+                    chunks.append(chunk)
+                    yield chunk
+                self._write(path, meta, b''.join(chunks))
+                self.evict()
+            finally:
+                self._release(lock)
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                self._release(lock)
+
+        resp.iter_content = tee
+        resp.close = close_and_release
+        return resp
+
+    def stale(self, url: str, kind: str = None) -> requests.Response:
+        """
+        Cached response of url however old it is, e.g. to fall back to when host is down
+        :param kind: endpoint type, only recorded in metrics
+        :returns: requests.Response rebuilt from cache, Age header tells how old it is, None if url isn't cached
+        """
+        path = self._path(url)
+        meta, body = self._read(path)
+        if meta is None:
+            return None
+        METRICS.inc('ggmt_cache_requests', kind=kind, result='stale')
+        return self._hit(path, meta, body)
+
+    def evict(self):
+        """Remove least recently used entries until cache fits into max_size"""
+        try:
+            # other files living in the cache directory, e.g. streams.db, are not cached responses
+            entries = [e for e in os.scandir(self.location) if RE_ENTRY.match(e.name) and e.is_file()]
+        except OSError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                os.remove(path + '.lock')
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all cached responses"""
+        max_size, self.max_size = self.max_size, -1
+        try:
+            self.evict()
+        finally:
+            self.max_size = max_size
@@ -1,57 +1,245 @@
 import json
-import os
 import re
-import subprocess
 import sys
-import webbrowser
+import time
 
 import click
-from jinja2 import Template
-from requests.exceptions import ConnectionError
 
 from ggmt import Match
-from ggmt.tournament import LiquidBracketDownloader, EVENT_PAST, EVENT_FUTURE
-from ggmt.matchticker import GosuTicker
+from ggmt.settings import CONFIG_LOCATION, GOSUGAMERS_GAMES, MAX_WORKERS, TEMPLATE_CACHE_LOCATION
 
-COLOR_ENABLED = True
-try:
-    from colorama import Fore, Back
-except ImportError:
-    COLOR_ENABLED = False
+# requests, parsel, jinja2 and colorama are imported by the commands that need them,
+# so --help, --version and cron invocations don't pay for loading all of them
 
 DEFAULT_TEMPLATE = "{{t1}} vs {{t2}} in {{time}} {% if stream %}@ {{stream}}{% endif %}"
 DEFAULT_TEMPLATE_ALL = "{{game}}: {{t1}} vs {{t2}} in {{time}} {% if stream %}@ {{stream}}{% endif %}"
 DEFAULT_TEMPLATE_RECAP = "{{t1}} {{t1_score}}:{{t2_score}} {{t2}}"
-HISTORY_LOCATION = os.path.expanduser('~/.ggmt_history')
-with open(HISTORY_LOCATION, 'a') as f:  # make sure history file exists
-    pass
+DEFAULT_TEMPLATE_QUERY = "{{game}}: {{t1}} {{t1_score}}:{{t2_score}} {{t2}}"
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M']
 
 
-def download_matches(game):
-    """wrapper for connections errors that might be caused during match download"""
+class RegistryChoice(click.Choice):
+    """
+    Choice of names or games of match providers registered in ggmt.sources,
+    the registry is imported when choices are first needed instead of when commands are defined
+    """
+
+    def __init__(self, games: bool = False):
+        """
+        :param games: choose from games supported by any provider instead of provider names
+        """
+        self.games = games
+        super().__init__([])
+
+    @property
+    def choices(self):
+        from ggmt.sources import SOURCES, source_games
+        return tuple(source_games()) if self.games else tuple(SOURCES)
+
+    @choices.setter
+    def choices(self, value):
+        pass  # always read from the registry
+
+
+def get_policy():
+    """returns process wide HttpPolicy configured by cli options, breakers are persisted unless cache is disabled"""
+    from ggmt.http import BREAKER_LOCATION, POLICY, CircuitBreaker
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.obj is None or ctx.obj.get('policy') is not None:
+        return POLICY
+    if not ctx.obj['no_cache']:
+        POLICY.breaker = CircuitBreaker(BREAKER_LOCATION)
+    if ctx.obj['deadline'] is not None:
+        POLICY.set_deadline(ctx.obj['deadline'] - (time.perf_counter() - ctx.obj['started']))
+    ctx.obj['policy'] = POLICY
+    return POLICY
+
+
+def get_cache():
+    """returns HttpCache configured by cli options or None if cache is disabled"""
+    from ggmt.cache import HttpCache
+    get_policy()  # every command that downloads anything asks for cache first
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.obj is None:
+        return HttpCache()
+    if ctx.obj['no_cache']:
+        return None
+    if ctx.obj.get('cache') is None:
+        ctx.obj['cache'] = HttpCache(ttl=ctx.obj['cache_ttl'])
+    return ctx.obj['cache']
+
+
+def get_streams():
+    """returns StreamMemo configured by cli options or None if cache is disabled"""
+    from ggmt.streams import StreamMemo
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.obj is None:
+        return StreamMemo()
+    if ctx.obj['no_cache']:
+        return None
+    if ctx.obj.get('streams') is None:
+        ctx.obj['streams'] = StreamMemo(refresh=ctx.obj['refresh_streams'])
+    return ctx.obj['streams']
+
+
+def get_sources():
+    """returns Sources configured by cli options, stats of sources are persisted unless cache is disabled"""
+    from ggmt.sources import STATS_LOCATION, SourceStats, Sources
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.obj is None:
+        return Sources(cache=get_cache(), streams=get_streams())
+    if ctx.obj.get('sources') is None:
+        stats = SourceStats(None if ctx.obj['no_cache'] else STATS_LOCATION)
+        ctx.obj['sources'] = Sources(ctx.obj['providers'], cache=get_cache(), streams=get_streams(), stats=stats,
+                                     merge=ctx.obj['merge_providers'])
+    return ctx.obj['sources']
+
+
+def get_colors():
+    """returns colorama (Fore, Back) or (None, None) if colorama isn't installed"""
     try:
-        matches = GosuTicker(game).download_matches()
+        from colorama import Fore, Back
+    except ImportError:
+        return None, None
+    return Fore, Back
+
+
+def archive_matches(matches, finished=False):
+    """add downloaded matches to local archive unless it is disabled, archive errors don't fail commands"""
+    import sqlite3
+    from ggmt import archive
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None and ctx.obj is not None and ctx.obj['no_archive']:
+        return
+    try:
+        with archive.Archive(archive.ARCHIVE_LOCATION) as matches_archive:
+            matches_archive.add(matches, finished=finished)
+    except (sqlite3.Error, OSError) as e:
+        click.secho('Cannot archive matches: {}'.format(e), err=True, fg='red')
+
+
+def download_matches(games, concurrency=None, history=False):
+    """wrapper for connections errors that might be caused during match download from sources"""
+    from requests.exceptions import ConnectionError, Timeout
+    if isinstance(games, str):
+        games = [games]
+    sources = get_sources()
+    try:
+        matches = sources.download_games(games, history=history, max_workers=concurrency)
+    except Timeout as e:
+        sys.exit('ERROR: Timed out: {}'.format(e))
     except ConnectionError:
         sys.exit('ERROR: No internet connection')
     except ConnectionRefusedError as e:
-        sys.exit('Cannot connect to gosugamers: {}'.format(e.args[-1]))
+        sys.exit('Cannot connect to match sources: {}'.format(e.args[-1]))
+    except NotImplementedError as e:
+        sys.exit(str(e))
+    finally:
+        if sources.stats.location:
+            sources.stats.save()
+    archive_matches(matches, finished=history)
     return matches
 
 
-def download_history(game):
-    """wrapper for connections errors that might be caused during match download"""
+def download_history(games, concurrency=None):
+    """wrapper for connections errors that might be caused during match history download from sources"""
+    return download_matches(games, concurrency, history=True)
+
+
+def iter_download(games, history=False, concurrency=None, ordered=True):
+    """streaming wrapper for connections errors that might be caused during match download, gosugamers only"""
+    from requests.exceptions import ConnectionError, Timeout
+    from ggmt.matchticker import iter_games
+    downloaded = []
     try:
-        matches = GosuTicker(game).download_history()
+        for match in iter_games(games, history=history, cache=get_cache(), max_workers=concurrency, ordered=ordered,
+                                streams=get_streams()):
+            downloaded.append(match)
+            yield match
+        archive_matches(downloaded, finished=history)
+    except Timeout as e:
+        sys.exit('ERROR: Timed out: {}'.format(e))
     except ConnectionError:
         sys.exit('ERROR: No internet connection')
     except ConnectionRefusedError as e:
         sys.exit('Cannot connect to gosugamers: {}'.format(e.args[-1]))
-    return matches
 
 
-def print_match(match, template):
-    """wrapper to inject colorama colors to template"""
-    click.echo(template.render(match, Fore=Fore, Back=Back))
+def download_changes(games, concurrency=None):
+    """wrapper for connections errors that might be caused during match download, gosugamers only"""
+    from requests.exceptions import ConnectionError, Timeout
+    from ggmt import diff
+    from ggmt.matchticker import download_changes
+    try:
+        changes = download_changes(games, cache=get_cache(), max_workers=concurrency, location=diff.SNAPSHOT_LOCATION,
+                                   streams=get_streams())
+    except Timeout as e:
+        sys.exit('ERROR: Timed out: {}'.format(e))
+    except ConnectionError:
+        sys.exit('ERROR: No internet connection')
+    except ConnectionRefusedError as e:
+        sys.exit('Cannot connect to gosugamers: {}'.format(e.args[-1]))
+    return changes
+
+
+class OutputTimer:
+    """Measures time to first line and total time of command output"""
+
+    def __init__(self):
+        ctx = click.get_current_context(silent=True)
+        self.started = ctx.obj['started'] if ctx and ctx.obj else time.perf_counter()
+        self.first_line = None
+        self.lines = 0
+
+    def line(self, count=1):
+        if self.first_line is None:
+            self.first_line = time.perf_counter() - self.started
+        self.lines += count
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        first_line = self.first_line if self.first_line is not None else total
+        click.echo('time to first line: {:.3f}s, {} lines in {:.3f}s'.format(first_line, self.lines, total), err=True)
+
+
+def collect_games(games, game_options):
+    """merge games from arguments and repeatable --game option"""
+    games = list(games) + list(game_options)
+    if not games:
+        raise click.BadParameter('Missing required parameter "game"')
+    return games
+
+
+def default_template(games):
+    """template for single game or for several games"""
+    return DEFAULT_TEMPLATE_ALL if 'all' in games or len(set(games)) > 1 else DEFAULT_TEMPLATE
+
+
+def get_renderer():
+    """returns Renderer with colorama colors injected, templates are cached on disk unless cache is disabled"""
+    from ggmt.render import Renderer
+    Fore, Back = get_colors()
+    return Renderer(TEMPLATE_CACHE_LOCATION if get_cache() is not None else None, Fore=Fore, Back=Back)
+
+
+def print_match(match, template, timer=None):
+    """print single rendered match right away"""
+    from ggmt.metrics import METRICS
+    with METRICS.timer('ggmt_phase_seconds', phase='render'):
+        line = template.render(match)
+    click.echo(line)
+    if timer:
+        timer.line()
+
+
+def print_matches(matches, template, renderer, timer=None):
+    """render all matches and print them with a single write"""
+    matches = list(matches)
+    if not matches:
+        return
+    click.echo(renderer.render_many(template, matches))
+    if timer:
+        timer.line(len(matches))
 
 
 def print_help_template(ctx, param, value):
@@ -72,62 +260,142 @@ def print_help_template(ctx, param, value):
 @click.version_option()
 @click.option('--help-template', help='Show help message for how to format template',
               is_flag=True, is_eager=True, expose_value=True, callback=print_help_template)
-def cli(help_template):
+@click.option('--no-cache', is_flag=True, help='always download pages instead of using cache in ~/.cache/ggmt')
+@click.option('--cache-ttl', type=click.IntRange(0),
+              help='seconds cached pages are considered fresh (default depends on page type)')
+@click.option('--refresh-streams', is_flag=True,
+              help='look up streams of live matches again instead of reusing ones found by previous runs')
+@click.option('--provider', 'providers', multiple=True, type=RegistryChoice(),
+              help='match provider to use, can be used multiple times (default: all)')
+@click.option('--merge-providers', is_flag=True,
+              help='merge matches of all providers instead of using the first provider that responds')
+@click.option('--deadline', type=click.FloatRange(0),
+              help='seconds the command has to finish its downloads in, cached pages are used after that')
+@click.option('--no-archive', is_flag=True, help="don't add downloaded matches to archive queried by query command")
+@click.option('--profile', is_flag=True,
+              help='report time spent fetching, parsing and rendering, requests and cache hits to stderr')
+@click.pass_context
+def cli(ctx, help_template, no_cache, cache_ttl, refresh_streams, providers, merge_providers, deadline, no_archive,
+        profile):
     """Good Game Match Ticker - cli application for tracking match information for various esport games."""
-    pass
+    ctx.obj = {'no_cache': no_cache, 'cache_ttl': cache_ttl, 'refresh_streams': refresh_streams,
+               'providers': providers, 'merge_providers': merge_providers, 'deadline': deadline,
+               'no_archive': no_archive, 'started': time.perf_counter()}
+    if profile:
+        from ggmt.metrics import METRICS
+        METRICS.detailed = True
+        started = ctx.obj['started']
+        ctx.call_on_close(lambda: click.echo('{}\ntotal {:.3f}s'.format(METRICS.table(), time.perf_counter() - started),
+                                             err=True))
 
 
 @cli.command('tick', help='Show matchticker.')
-@click.argument('game', type=click.Choice(GosuTicker.games))
+@click.argument('games', nargs=-1, type=RegistryChoice(games=True))
+@click.option('-g', '--game', 'game_options', multiple=True, type=RegistryChoice(games=True),
+              help='game to show, can be used multiple times')
 @click.option('-t', '--template', help='set template')
 @click.option('--json', 'is_json', help='output json', is_flag=True)
-def tick(game, template, is_json):
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+@click.option('-S', '--stream', is_flag=True,
+              help='print matches as soon as they are ready instead of after everything is downloaded')
+@click.option('-u', '--unordered', is_flag=True, help='like --stream but without keeping page order')
+@click.option('--timing', is_flag=True, help='report time to first line and total time to stderr')
+@click.option('--changes', is_flag=True,
+              help='output json lines of matches that changed since previous run (added, removed, went_live, '
+                   'score_changed, stream_appeared)')
+def tick(games, game_options, template, is_json, concurrency, stream, unordered, timing, changes):
     """Tick command is great"""
-    if not game:
-        raise click.BadParameter('Missing required parameter "game"')
-
-    matches = download_matches(game)
+    games = collect_games(games, game_options)
+    if changes:
+        for change in download_changes(games, concurrency):
+            click.echo(json.dumps(change, sort_keys=True))
+        return
+    timer = OutputTimer()
+    if stream or unordered:
+        matches = iter_download(games, concurrency=concurrency, ordered=not unordered)
+    else:
+        matches = download_matches(games, concurrency)
     if is_json:
         click.echo(json.dumps(list(matches), indent=2, sort_keys=True))
         return
-    template = template if template else DEFAULT_TEMPLATE_ALL if game == 'all' else DEFAULT_TEMPLATE
-    template = Template(template)
-    for m in matches:
-        if COLOR_ENABLED and m['time_secs'] == 0:
-            m['time'] = Fore.GREEN + m['time'] + Fore.RESET
-        print_match(m, template)
+    renderer = get_renderer()
+    template = renderer.template(template if template else default_template(games))
+
+    Fore, _ = get_colors()
+
+    def colored(matches):
+        # colors are added to copies, streamed matches are archived after they were printed
+        for m in matches:
+            if Fore and m['time_secs'] == 0:
+                m = Match(m)
+                m['time'] = Fore.GREEN + m['time'] + Fore.RESET
+            yield m
+
+    if stream or unordered:
+        for m in colored(matches):
+            print_match(m, template, timer)
+    else:
+        print_matches(colored(matches), template, renderer, timer)
+    if timing:
+        timer.report()
 
 
 @cli.command('recap', help='Show match history.')
-@click.argument('game', type=click.Choice(GosuTicker.games))
+@click.argument('games', nargs=-1, type=RegistryChoice(games=True))
+@click.option('-g', '--game', 'game_options', multiple=True, type=RegistryChoice(games=True),
+              help='game to show, can be used multiple times')
 @click.option('-nc', '--no-color', help='disable color being added', is_flag=True)
 @click.option('-t', '--template', help='set template')
 @click.option('--json', 'is_json', help='output json', is_flag=True)
-def tick(game, template, is_json, no_color):
-    if not game:
-        raise click.BadParameter('Missing required parameter "game"')
-
-    matches = download_history(game)
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+@click.option('-S', '--stream', is_flag=True,
+              help='print matches as soon as they are ready instead of after everything is downloaded')
+@click.option('-u', '--unordered', is_flag=True, help='like --stream but without keeping page order')
+@click.option('--timing', is_flag=True, help='report time to first line and total time to stderr')
+def tick(games, game_options, template, is_json, no_color, concurrency, stream, unordered, timing):
+    games = collect_games(games, game_options)
+    timer = OutputTimer()
+    if stream or unordered:
+        matches = iter_download(games, history=True, concurrency=concurrency, ordered=not unordered)
+    else:
+        matches = download_history(games, concurrency)
     if is_json:
         click.echo(json.dumps(list(matches), indent=2, sort_keys=True))
         return
-    template = template if template else DEFAULT_TEMPLATE_RECAP
-    template = Template(template)
-    for m in matches:
-        if no_color or not COLOR_ENABLED:  # if color is disabled just stdout
-            print_match(m, template)
-            continue
-        if m['t1_score'] > m['t2_score']:
-            m['t1'] = Fore.GREEN + m['t1'] + Fore.RESET
-            m['t2'] = Fore.RED + m['t2'] + Fore.RESET
-        else:
-            m['t2'] = Fore.GREEN + m['t2'] + Fore.RESET
-            m['t1'] = Fore.RED + m['t1'] + Fore.RESET
-        print_match(m, template)
+    renderer = get_renderer()
+    template = renderer.template(template if template else DEFAULT_TEMPLATE_RECAP)
+
+    Fore, _ = get_colors()
+
+    def colored(matches):
+        for m in matches:
+            if no_color or not Fore:  # if color is disabled just stdout
+                yield m
+                continue
+            m = Match(m)  # streamed matches are archived after they were printed
+            if m['t1_score'] > m['t2_score']:
+                m['t1'] = Fore.GREEN + m['t1'] + Fore.RESET
+                m['t2'] = Fore.RED + m['t2'] + Fore.RESET
+            else:
+                m['t2'] = Fore.GREEN + m['t2'] + Fore.RESET
+                m['t1'] = Fore.RED + m['t1'] + Fore.RESET
+            yield m
+
+    if stream or unordered:
+        for m in colored(matches):
+            print_match(m, template, timer)
+    else:
+        print_matches(colored(matches), template, renderer, timer)
+    if timing:
+        timer.report()
 
 
 @cli.command('watch', help='Open a stream in browser or media player(via streamlink).')
-@click.argument('game', type=click.Choice(GosuTicker.games))
+@click.argument('games', nargs=-1, type=RegistryChoice(games=True))
+@click.option('-g', '--game', 'game_options', multiple=True, type=RegistryChoice(games=True),
+              help='game to show, can be used multiple times')
 @click.option('-s', '--show-unavailable', 'show', is_flag=True,
               help="list matches that don't have streams too")
 @click.option('-t', '--template',
@@ -138,19 +406,21 @@ def tick(game, template, is_json, no_color):
               help='open using streamlink instead, requires: https://github.com/streamlink/streamlink')
 @click.option('-p', '--print', 'just_print', is_flag=True, help='just print url instead')
 @click.option('-q', '--quality', help='[default:best] quality when using streamlink', default='best')
-def watch(game, show, template, in_window, use_streamlink, quality, just_print):
-    matches = list(download_matches(game))
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+def watch(games, game_options, show, template, in_window, use_streamlink, quality, just_print, concurrency):
+    games = collect_games(games, game_options)
+    matches = list(download_matches(games, concurrency))
     if not show:
         matches = [m for m in matches if m.get('stream')]
     if not matches:
         click.echo('No streams found :(')
         return
 
-    template = template if template else DEFAULT_TEMPLATE_ALL if game == 'all' else DEFAULT_TEMPLATE
-    template = Template(template)
+    renderer = get_renderer()
+    template = renderer.template(template if template else default_template(games))
     items = ['{}: {}'.format(i, template.render(m)) for i, m in enumerate(matches)]
-    for item in items:
-        click.echo(item)
+    click.echo('\n'.join(items))
     click.echo('-' * len(sorted(items)[0]))
     while True:
         click.echo('select stream to show: ', nl=False)
@@ -173,6 +443,8 @@ def watch(game, show, template, in_window, use_streamlink, quality, just_print):
         click.echo(selected)
         return
     click.echo('Opening {}...'.format(selected))
+    import subprocess
+    import webbrowser
     if use_streamlink:
         subprocess.Popen(['nohup streamlink "{}" {} &'.format(selected, quality)], shell=True, start_new_session=True)
     elif not in_window:
@@ -182,10 +454,14 @@ def watch(game, show, template, in_window, use_streamlink, quality, just_print):
 
 
 @cli.command('notify', help='Notify if a specific team plays.')
-@click.argument('game', type=click.Choice(GosuTicker.games))
-@click.argument('team')
+@click.argument('game', type=RegistryChoice(games=True))
+@click.argument('team', required=False)
+@click.option('-w', '--watch-list', type=click.Path(exists=True, dir_okay=False),
+              help='json file of teams to watch with their aliases, patterns and thresholds instead of team')
 @click.option('-f', '--force', is_flag=True,
               help='ignore history')
+@click.option('-v', '--verbose', is_flag=True,
+              help='print every notification sent, quiet by default so cron has nothing to mail')
 @click.option('-s', '--seconds', default=900,
               help='seconds threshold before sending out the notification (default=900)')
 @click.option('-m', '--minutes', default=0,
@@ -194,72 +470,190 @@ def watch(game, show, template, in_window, use_streamlink, quality, just_print):
               help='Use pushbullet notification instead system notify-send')
 @click.option('-k', '--pushbullet-key', help='Pushbullet API key to use to send the notification, '
                                              'can be set through enviroment variable PUSHBULLET_API')
-def notify(game, team, seconds, minutes, pushbullet, pushbullet_key, force):
-    team = team.lower().strip()
-    if pushbullet:
-        if not pushbullet_key:
-            pushbullet_key = os.environ.get('PUSHBULLET_API', '')
-        if not pushbullet_key:
-            click.secho('To use pushbullet notification supply --pushbulet-key '
-                        'or enviroment variable PUSHBULLET_API', err=True, fg='red')
-            return
-        try:
-            from pushbullet import Pushbullet
-        except ImportError:
-            click.secho('To use pushbullet notification install pusbullet.py package;'
-                        ' pip install pushbullet.py', err=True, fg='red')
-            return
-
+@click.option('--webhook', metavar='URL', help='POST notifications as json to url instead')
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+def notify(game, team, watch_list, seconds, minutes, pushbullet, pushbullet_key, webhook, force, verbose,
+           concurrency):
+    from ggmt.history import History
+    from ggmt.notifications import DesktopBackend, Dispatcher, Notification, PushbulletBackend, WebhookBackend
+    from ggmt.watchlist import WatchList, WatchRule, load_watch_list
     if minutes:
         seconds = minutes * 60
-    matches = download_matches(game)
-    re_team = re.compile(team, flags=re.I)
-    for match in matches:
-        if int(match['time_secs']) > int(seconds):
-            continue
-        if re_team.match(match['t1']) or re_team.match(match['t2']):
+    if watch_list:
+        try:
+            watched = load_watch_list(watch_list, seconds)
+        except (OSError, ValueError) as e:
+            sys.exit('Cannot load watch list {}: {}'.format(watch_list, e))
+    elif team:
+        try:
+            watched = WatchList([WatchRule(team, pattern=team.lower().strip(), seconds=seconds)])
+        except re.error as e:
+            sys.exit('Invalid team pattern "{}": {}'.format(team, e))
+    else:
+        raise click.BadParameter('Missing argument "team" or --watch-list')
+    try:
+        if pushbullet:
+            backend = PushbulletBackend(pushbullet_key).open()
+        elif webhook:
+            backend = WebhookBackend(webhook).open()
+        else:
+            backend = DesktopBackend().open()
+    except (ValueError, ImportError) as e:
+        click.secho(str(e), err=True, fg='red')
+        return
+
+    matches = download_matches(game, concurrency)
+    history = History()
+    sent = []
+    # notifications are sent in the background, matches starting at the same time in one message
+    with Dispatcher([backend]) as dispatcher:
+        for match in matches:
+            # every match is checked against all watched teams at once, "all" page matches by their own game
+            rules = [rule for rule in watched.find(match, None if game == 'all' else game)
+                     if int(match['time_secs']) <= rule.seconds]
+            if not rules:
+                continue
             # already in history?
-            if not force:
-                with open(HISTORY_LOCATION, 'r') as f:
-                    if match.id in f.read():
-                        continue
-            # notify
-            title = "{} vs {} in {}".format(match['t1'], match['t2'], match['time'])
-            body = match.get('stream') or match['url']
-            if pushbullet:
-                push = Pushbullet(pushbullet_key)
-                push.push_note(title, body)
-            else:
-                # The if check below is for fixing notify-send to work with cron
-                # cron notify-send requires $DBUS_SESSION_BUS_ADDRESS to be set
-                # as per http://unix.stackexchange.com/questions/111188
-                subprocess.call('if [ -r "$HOME/.dbus/Xdbus" ]; '
-                                'then . $HOME/.dbus/Xdbus; '
-                                'fi && notify-send "{}" "{}"'.format(title, body),
-                                shell=True)
-            # add to history
-            with open(HISTORY_LOCATION, 'a') as f:
-                f.write('{}\n'.format(match.id))
+            if not force and match.id in history:
+                continue
+            notification = Notification('{} vs {}'.format(match['t1'], match['t2']), match['time'],
+                                        match.get('stream') or match['url'], match['timestamp'])
+            sent.append((match, dispatcher.submit(notification, backend.name)))
+            if verbose:
+                click.echo('{} (watching {})'.format(notification.title, rules[0].name))
+    for match, notification in sent:
+        error = notification.future.exception()
+        if error is None:
+            history.add(match.id)
+        else:
+            click.secho('failed to send notification "{}": {}'.format(notification.title, error), err=True, fg='red')
+    history.prune()
+    history.close()
+
+
+@cli.command('query', help='Query archive of downloaded matches, e.g. head to head history or win rate of a team.')
+@click.argument('team', required=False)
+@click.argument('opponent', required=False)
+@click.option('-g', '--game', type=RegistryChoice(games=True), help='only matches of game')
+@click.option('--since', type=click.DateTime(DATE_FORMATS), help='only matches starting at or after date')
+@click.option('--until', type=click.DateTime(DATE_FORMATS), help='only matches starting before date')
+@click.option('-a', '--all', 'all_', is_flag=True, help='include upcoming and live matches, not only finished ones')
+@click.option('-n', '--limit', type=click.IntRange(1), default=20, help='how many newest matches to show (default=20)')
+@click.option('-t', '--template', help='set template')
+@click.option('--json', 'is_json', help='output json', is_flag=True)
+@click.option('--compact', is_flag=True, help='remove long gone upcoming matches and duplicates from archive first')
+def query(team, opponent, game, since, until, all_, limit, template, is_json, compact):
+    from ggmt import archive
+    game = None if game == 'all' else game
+    since = since.timestamp() if since else None
+    until = until.timestamp() if until else None
+    with archive.Archive(archive.ARCHIVE_LOCATION) as matches_archive:
+        if compact:
+            click.echo('removed {} matches from archive'.format(matches_archive.compact()), err=True)
+        matches = matches_archive.query(team, opponent, game, since, until, finished=None if all_ else True,
+                                        limit=limit)
+        results = matches_archive.win_rate(team, opponent, game, since, until) if team else None
+    if is_json:
+        click.echo(json.dumps({'matches': matches, 'results': results}, indent=2, sort_keys=True))
+        return
+    renderer = get_renderer()
+    template = renderer.template(template if template else DEFAULT_TEMPLATE_QUERY)
+    for match in matches:
+        click.echo('{} {}'.format(time.strftime('%Y-%m-%d %H:%M', time.localtime(match['timestamp'])),
+                                  template.render(match)))
+    if results is None:
+        return
+    rate = '{:.0%}'.format(results['rate']) if results['rate'] is not None else '-'
+    click.echo('{}: {} played, {} won, {} lost, {} draws ({})'.format(
+        team, results['played'], results['won'], results['lost'], results['draws'], rate))
+
+
+@cli.command('export', help='Render match tickers to files as described by manifest.')
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+@click.option('-q', '--quiet', is_flag=True, help="don't list written files")
+def export_(manifest, concurrency, quiet):
+    from requests.exceptions import ConnectionError, Timeout
+    from ggmt.export import export, load_manifest
+    from ggmt.render import Renderer
+    try:
+        outputs = load_manifest(manifest)
+    except (OSError, ValueError) as e:
+        sys.exit('Cannot load manifest {}: {}'.format(manifest, e))
+    try:
+        written = export(outputs, cache=get_cache(), max_workers=concurrency,
+                         renderer=Renderer(TEMPLATE_CACHE_LOCATION if get_cache() is not None else None))
+    except Timeout as e:
+        sys.exit('ERROR: Timed out: {}'.format(e))
+    except ConnectionError:
+        sys.exit('ERROR: No internet connection')
+    except ConnectionRefusedError as e:
+        sys.exit('Cannot connect to gosugamers: {}'.format(e.args[-1]))
+    if quiet:
+        return
+    for location, changed in written:
+        click.echo('{} {}'.format('written  ' if changed else 'unchanged', location))
+
+
+@cli.command('daemon', help='Keep running and notify when watched teams play.')
+@click.option('--config', 'config_file', type=click.Path(dir_okay=False), default=CONFIG_LOCATION,
+              help='json config of games and team rules (default={})'.format(CONFIG_LOCATION))
+@click.option('-c', '--concurrency', type=click.IntRange(1), default=MAX_WORKERS,
+              help='how many match pages to download at once (default={})'.format(MAX_WORKERS))
+@click.option('-v', '--verbose', is_flag=True, help='log what daemon is doing')
+@click.option('--metrics-file', type=click.Path(dir_okay=False),
+              help='write OpenMetrics text file after every poll, e.g. for node exporter textfile collector')
+@click.option('--metrics-port', type=click.IntRange(0, 65535),
+              help='serve OpenMetrics at http://127.0.0.1:PORT/metrics')
+def daemon(config_file, concurrency, verbose, metrics_file, metrics_port):
+    import logging
+    from ggmt.daemon import Daemon, load_config
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING,
+                        format='%(asctime)s %(name)s: %(message)s')
+    try:
+        config = load_config(config_file)
+    except (OSError, ValueError, TypeError) as e:
+        sys.exit('Cannot load config {}: {}'.format(config_file, e))
+    if not config['rules']:
+        sys.exit('No rules in config {}'.format(config_file))
+    get_policy().set_deadline(None)  # deadline is meant for single runs, daemon keeps polling
+    if metrics_file is not None or metrics_port is not None:
+        from ggmt.metrics import METRICS
+        METRICS.detailed = True
+    if metrics_port is not None:
+        try:
+            METRICS.serve(metrics_port)
+        except OSError as e:
+            sys.exit('Cannot serve metrics on port {}: {}'.format(metrics_port, e))
+    try:
+        Daemon(cache=get_cache(), streams=get_streams(), max_workers=concurrency, metrics_location=metrics_file,
+               **config).run()
+    except (ValueError, ImportError) as e:
+        click.secho(str(e), err=True, fg='red')
 
 
 @cli.command('tournament', help='display tournament brackets, default: current tournaments')
-@click.argument('game', type=click.Choice(GosuTicker.games))
+@click.argument('game', type=click.Choice(GOSUGAMERS_GAMES))
 @click.option('-p', '--past', help='show past tournaments', is_flag=True)
 @click.option('-a', '--all', 'all_', help='show all tournaments', is_flag=True)
 @click.option('-f', '--future', help='show future tournaments', is_flag=True)
 @click.option('-b', '--bracket', help='show brackets (experimental)', is_flag=True)
 @click.option('-j', '--json', 'as_json', help='output json', is_flag=True)
 def tournament(game, past, future, bracket, as_json, all_):
-    dl = LiquidBracketDownloader(game)
+    from ggmt.brackets import BracketCache
+    from ggmt.tournament import LiquidBracketDownloader, EVENT_PAST, EVENT_FUTURE
+    cache = get_cache()
+    dl = LiquidBracketDownloader(game, cache=cache, brackets=BracketCache() if cache is not None else None)
     if all_:
-        events = dl.find_tournaments(EVENT_PAST)
-        events.extend(dl.find_tournaments())
-        events.extend(dl.find_tournaments(EVENT_FUTURE))
+        events = dl.find_all_tournaments()
     else:
         cat = EVENT_PAST if past else None
         cat = EVENT_FUTURE if future else cat
         events = dl.find_tournaments(category=cat)
     if as_json:
+        dl.load_info(events)
         click.echo(json.dumps(events, indent=2))
         return
     if not events:
@@ -289,6 +683,6 @@ def tournament(game, past, future, bracket, as_json, all_):
             click.echo('  {} is out of range'.format(choice))
             continue
         break
-    brackets = dl.download_brackets(events[choice].url)
+    brackets = dl.download_brackets(events[choice]['url'])
     for bracket in brackets:
         click.echo(bracket.to_text())
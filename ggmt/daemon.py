@@ -0,0 +1,231 @@
+import json
+import logging
+import sched
+import signal
+import threading
+import time
+from typing import List
+
+from ggmt import Match
+from ggmt.cache import HttpCache
+from ggmt.history import History
+from ggmt.matchticker import GosuTicker
+from ggmt.metrics import METRICS
+from ggmt.notifications import DesktopBackend, Dispatcher, Notification, PushbulletBackend, WebhookBackend
+from ggmt.settings import CONFIG_LOCATION
+from ggmt.streams import StreamMemo
+from ggmt.watchlist import DEFAULT_SECONDS, WatchList, WatchRule
+
+DEFAULT_INTERVAL = 300
+
+
+class Rule(WatchRule):
+    """Team watch rule: notify `seconds` before a match of `team` in `game` starts"""
+
+    def __init__(self, game: str, team: str, seconds: int = DEFAULT_SECONDS, pushbullet: bool = False,
+                 aliases: List[str] = (), webhook: bool = False):
+        """
+        :param team: case insensitive regex matched at the start of team names, also matches exact name
+        :param aliases: other exact names of the team
+        :param pushbullet: notify via pushbullet instead of desktop notification
+        :param webhook: notify via webhook instead of desktop notification
+        """
+        if game not in GosuTicker.games:
+            raise ValueError('unknown game "{}" in rule for "{}"'.format(game, team))
+        super().__init__(team, aliases, pattern=team.lower().strip(), seconds=seconds, game=game)
+        self.team = team
+        self.pushbullet = pushbullet
+        self.webhook = webhook
+
+    @property
+    def backend(self) -> str:
+        """name of notification backend of rule"""
+        if self.pushbullet:
+            return PushbulletBackend.name
+        if self.webhook:
+            return WebhookBackend.name
+        return DesktopBackend.name
+
+    def __repr__(self):
+        return 'Rule({!r}, {!r}, seconds={})'.format(self.game, self.team, self.seconds)
+
+
+def load_config(location: str = CONFIG_LOCATION) -> dict:
+    """
+    Load daemon config from json file, e.g.:
+        {
+            "games": {"dota2": {"interval": 300}},
+            "rules": [{"game": "dota2", "team": "na`vi", "seconds": 900, "aliases": ["natus vincere"]}],
+            "pushbullet_key": "<optional, defaults to $PUSHBULLET_API>",
+            "webhook_url": "<required only by rules with \"webhook\": true>"
+        }
+    Games that have rules but no entry in "games" are polled every DEFAULT_INTERVAL seconds.
+    :returns: dict with "intervals" mapping game to poll interval, "rules" list of Rule, "pushbullet_key"
+              and "webhook_url"
+    """
+    with open(location) as f:
+        data = json.load(f)
+    rules = [Rule(**rule) for rule in data.get('rules', [])]
+    intervals = {rule.game: DEFAULT_INTERVAL for rule in rules}
+    for game, options in data.get('games', {}).items():
+        if game not in GosuTicker.games:
+            raise ValueError('unknown game "{}"'.format(game))
+        intervals[game] = int(options.get('interval', DEFAULT_INTERVAL))
+    return {'intervals': intervals, 'rules': rules, 'pushbullet_key': data.get('pushbullet_key'),
+            'webhook_url': data.get('webhook_url')}
+
+
+def time_to_text(seconds: int) -> str:
+    """converts seconds to gosugamers like time text, e.g. 1h 5m"""
+    if seconds <= 0:
+        return 'Live'
+    hours, minutes = divmod(int(round(seconds / 60)), 60)
+    if not hours:
+        return '{}m'.format(minutes)
+    return '{}h {}m'.format(hours, minutes)
+
+
+class Daemon:
+    """
+    Long running notifier.
+    Every game is downloaded once per its poll interval and matched against all rules of that game.
+    Notifications are scheduled for exactly `rule.seconds` before the match starts and sent in the background
+    by a Dispatcher, matches are added to history once their notification was sent.
+    """
+    logger = logging.getLogger('ggmt.daemon')
+
+    def __init__(self, intervals: dict, rules: List[Rule], pushbullet_key: str = None,
+                 history: History = None, cache: HttpCache = None, max_workers: int = None,
+                 streams: StreamMemo = None, webhook_url: str = None, metrics_location: str = None):
+        """
+        :param intervals: dict of game: poll interval in seconds
+        :param rules: list of Rule
+        :param pushbullet_key: pushbullet api key, required only if some rules use pushbullet
+        :param history: notification history, shared with notify command by default
+        :param streams: StreamMemo shared by all games, streams are remembered in memory by default
+        :param webhook_url: url notifications are POSTed to, required only if some rules use webhook
+        :param metrics_location: OpenMetrics text file written after every poll, None to not write it
+        """
+        self.intervals = intervals
+        self.rules = rules
+        self.watchlist = WatchList(rules)
+        self.rule_index = {id(rule): i for i, rule in enumerate(rules)}
+        self.pushbullet_key = pushbullet_key
+        self.webhook_url = webhook_url
+        self.metrics_location = metrics_location
+        self.history = history
+        self.max_workers = max_workers
+        streams = streams if streams is not None else StreamMemo(location=None)
+        self.tickers = {game: GosuTicker(game, cache=cache, streams=streams) for game in intervals}
+        self.dispatcher = None
+        self.pending = {}  # match id: Notification being sent
+        self.scheduler = sched.scheduler(time.time, time.sleep)
+        self.scheduled = {}  # (match id, rule index): scheduler event
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Run until stop() is called or SIGTERM/SIGINT is received"""
+        if self.history is None:
+            self.history = History()
+        self.open_dispatcher()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *args: self.stop())
+        for game in self.intervals:
+            self.scheduler.enter(0, 0, self.poll, (game,))
+        try:
+            while not self.stopped.is_set():
+                delay = self.scheduler.run(blocking=False)
+                self.stopped.wait(delay if delay is not None else DEFAULT_INTERVAL)
+        finally:
+            for event in self.scheduler.queue:
+                self.scheduler.cancel(event)
+            self.flush()
+            self.history.close()
+            self.logger.info('stopped')
+
+    def stop(self):
+        self.stopped.set()
+
+    def open_dispatcher(self) -> Dispatcher:
+        """
+        Create dispatcher with backends of all rules, unless it exists
+        :raises ValueError: if pushbullet key or webhook url is missing
+        :raises ImportError: if pushbullet.py package is not installed
+        """
+        if self.dispatcher is None:
+            backends = [DesktopBackend()]
+            if any(rule.pushbullet for rule in self.rules):
+                backends.append(PushbulletBackend(self.pushbullet_key))
+            if any(rule.webhook for rule in self.rules):
+                backends.append(WebhookBackend(self.webhook_url))
+            self.dispatcher = Dispatcher([backend.open() for backend in backends])
+        return self.dispatcher
+
+    def record_sent(self):
+        """add matches whose notifications were sent to history, failed ones are retried by the next poll"""
+        for match_id, notification in list(self.pending.items()):
+            if not notification.future.done():
+                continue
+            del self.pending[match_id]
+            if notification.future.exception() is None:
+                self.history.add(match_id)
+
+    def flush(self):
+        """wait for all notifications to be sent"""
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+            self.dispatcher = None
+        self.record_sent()
+
+    def poll(self, game: str):
+        """download matches of game and schedule notifications for every matching rule"""
+        self.scheduler.enter(self.intervals[game], 0, self.poll, (game,))
+        try:
+            matches = self.tickers[game].download_matches(max_workers=self.max_workers)
+        except (OSError, ConnectionRefusedError) as e:
+            self.logger.error('failed to download {} matches: {}'.format(game, e))
+            METRICS.inc('ggmt_polls', game=game, result='failed')
+            self.write_metrics()
+            return
+        METRICS.inc('ggmt_polls', game=game, result='ok')
+        self.logger.debug('polled {}: {} matches'.format(game, len(matches)))
+        self.record_sent()
+        for match in matches:
+            if match.id in self.history:
+                continue
+            # all rules of the game are checked in one pass
+            for rule in self.watchlist.find(match, game):
+                start = match['timestamp']
+                self.schedule(match, rule, (match.id, self.rule_index[id(rule)]), start - rule.seconds, start)
+        self.history.prune()
+        self.write_metrics()
+
+    def write_metrics(self):
+        if not self.metrics_location:
+            return
+        try:
+            METRICS.write(self.metrics_location)
+        except OSError as e:
+            self.logger.error('failed to write metrics {}: {}'.format(self.metrics_location, e))
+
+    def schedule(self, match: Match, rule: Rule, key: tuple, when: float, start: float):
+        """(re)schedule notification of a match, start time might have moved since last poll"""
+        event = self.scheduled.pop(key, None)
+        if event is not None:
+            try:
+                self.scheduler.cancel(event)
+            except ValueError:  # already happened
+                pass
+        self.scheduled[key] = self.scheduler.enterabs(max(when, time.time()), 0, self.send,
+                                                      (match, rule, key, start))
+
+    def send(self, match: Match, rule: Rule, key: tuple, start: float):
+        """queue notification unless it has been already sent or is being sent"""
+        self.scheduled.pop(key, None)
+        self.record_sent()
+        if match.id in self.history or match.id in self.pending:
+            return
+        notification = Notification('{} vs {}'.format(match['t1'], match['t2']), time_to_text(start - time.time()),
+                                    match.get('stream') or match['url'], start)
+        self.logger.info('notifying: {}'.format(notification.title))
+        self.pending[match.id] = self.open_dispatcher().submit(notification, rule.backend)
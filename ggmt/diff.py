@@ -0,0 +1,123 @@
+"""
+Differences between consecutive polls of match lists, so consumers only process what changed.
+"""
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from ggmt import Change, Match
+from ggmt.settings import CACHE_LOCATION
+
+ADDED = 'added'
+REMOVED = 'removed'
+WENT_LIVE = 'went_live'
+SCORE_CHANGED = 'score_changed'
+STREAM_APPEARED = 'stream_appeared'
+
+SNAPSHOT_LOCATION = os.path.join(CACHE_LOCATION, 'snapshots')
+
+
+def _change(kind: str, match: Match, previous: Match = None) -> Change:
+    change = Change()
+    change['change'] = kind
+    change['match'] = match
+    if previous is not None:
+        change['previous'] = previous
+    return change
+
+
+def diff_matches(previous: Dict[str, Match], current: Iterable[Match]) -> List[Change]:
+    """
+    Compare matches of two polls, one match can have several changes, e.g. went_live and stream_appeared
+    :param previous: matches of previous poll keyed by Match.id
+    :param current: matches of current poll
+    :returns: list of Change objects, changes of current matches in their order followed by removed matches
+    """
+    changes = []
+    seen = set()
+    for match in current:
+        seen.add(match.id)
+        old = previous.get(match.id)
+        if old is None:
+            changes.append(_change(ADDED, match))
+            continue
+        if old['time_secs'] and not match['time_secs']:
+            changes.append(_change(WENT_LIVE, match, old))
+        if (old.get('t1_score'), old.get('t2_score')) != (match.get('t1_score'), match.get('t2_score')):
+            changes.append(_change(SCORE_CHANGED, match, old))
+        if match.get('stream') and not old.get('stream'):
+            changes.append(_change(STREAM_APPEARED, match, old))
+    for match_id, old in previous.items():
+        if match_id not in seen:
+            changes.append(_change(REMOVED, old))
+    return changes
+
+
+class Snapshot:
+    """
+    Matches of the previous poll keyed by Match.id.
+    Can be persisted as json file so consecutive cli runs are diffed too.
+    """
+
+    def __init__(self, location: str = None):
+        """
+        :param location: json file to load from and save to, None to keep snapshot in memory only
+        """
+        self.location = location
+        self.matches = OrderedDict()
+        if location:
+            self.load()
+
+    @classmethod
+    def for_game(cls, game: str, directory: str = SNAPSHOT_LOCATION) -> 'Snapshot':
+        return cls(os.path.join(directory, '{}.json'.format(game)))
+
+    def load(self):
+        """load snapshot file, missing or unreadable file is treated as empty snapshot"""
+        self.matches.clear()
+        try:
+            with open(self.location) as f:
+                for data in json.load(f):
+                    match = Match()
+                    match.update_from(data)
+                    self.matches[match.id] = match
+        except (OSError, ValueError, NotImplementedError):
+            self.matches.clear()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.location))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(list(self.matches.values()), f)
+        os.replace(tmp, self.location)
+
+    def reuse_streams(self, matches: Iterable[Match]) -> List[Match]:
+        """
+        Copy streams found by previous poll to matches that are still live
+        :returns: live matches that still need their stream looked up
+        """
+        missing = []
+        for match in matches:
+            if match['time_secs']:
+                continue
+            old = self.matches.get(match.id)
+            if old is not None and not old['time_secs'] and old.get('stream'):
+                match['stream'] = old['stream']
+            else:
+                missing.append(match)
+        return missing
+
+    def update(self, matches: Iterable[Match]) -> List[Change]:
+        """
+        Replace snapshot with current poll, saving it if snapshot has a location
+        :returns: list of Change objects since previous poll
+        """
+        matches = list(matches)
+        changes = diff_matches(self.matches, matches)
+        self.matches = OrderedDict((match.id, match) for match in matches)
+        if self.location:
+            self.save()
+        return changes
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import List
+
+from ggmt.cache import HttpCache
+from ggmt.matchticker import GosuTicker, download_each, merge_matches
+from ggmt.render import Renderer
+
+
+def load_manifest(location: str) -> List[dict]:
+    """
+    Load export manifest - json list of outputs, e.g.:
+        [
+            {"games": ["dota2", "counterstrike"], "template": "ticker.html", "output": "/var/www/ticker.html"},
+            {"games": ["lol"], "template": "recap.html", "output": "/var/www/recap.html", "history": true},
+            {"games": ["dota2"], "template": "{{t1}} vs {{t2}}", "inline": true, "per_match": true,
+             "output": "/var/www/dota2.txt"}
+        ]
+    Templates are rendered once with `matches` list and `games` variables, or once per match
+    like tick templates if "per_match" is set. Relative paths are relative to the manifest.
+    :returns: list of output dicts
+    """
+    with open(location) as f:
+        outputs = json.load(f)
+    if isinstance(outputs, dict):
+        outputs = outputs.get('outputs', [])
+    base = os.path.dirname(os.path.abspath(location))
+    for output in outputs:
+        games = output.get('games')
+        if isinstance(games, str):
+            games = output['games'] = [games]
+        if not games or any(game not in GosuTicker.games for game in games):
+            raise ValueError('output {} has no or unknown games'.format(output.get('output')))
+        if 'template' not in output or 'output' not in output:
+            raise ValueError('every output needs "template" and "output"')
+        output['output'] = os.path.join(base, output['output'])
+        if output.get('inline'):
+            output['template_source'] = output['template']
+        else:
+            with open(os.path.join(base, output['template'])) as f:
+                output['template_source'] = f.read()
+    return outputs
+
+
+def write_atomic(location: str, content: str) -> bool:
+    """
+    Write content to file through a temporary file, so readers never see partially written file.
+    File is left untouched if its content is the same.
+    :returns: whether file was written
+    """
+    data = content.encode('utf-8')
+    try:
+        with open(location, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    except OSError:
+        pass
+    directory = os.path.dirname(os.path.abspath(location))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.ggmt')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        if os.path.exists(location):
+            os.chmod(tmp, os.stat(location).st_mode & 0o777)
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, location)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return True
+
+
+def export(outputs: List[dict], cache: HttpCache = None, renderer: Renderer = None, max_workers: int = None):
+    """
+    Render every output of manifest, every game is downloaded once no matter how many outputs use it.
+    :param outputs: outputs as returned by load_manifest
+    :returns: list of (output location, whether it was written)
+    """
+    renderer = renderer or Renderer()
+    downloaded = {}
+    for history in (False, True):
+        games = [game for output in outputs if bool(output.get('history')) == history for game in output['games']]
+        if games:
+            results = download_each(games, history=history, cache=cache, max_workers=max_workers)
+            downloaded.update({(game, history): matches for game, matches in results.items()})
+    written = []
+    for output in outputs:
+        results = [downloaded[game, bool(output.get('history'))] for game in output['games']]
+        matches = results[0] if len(results) == 1 else merge_matches(results)
+        template = renderer.template(output['template_source'])
+        if output.get('per_match'):
+            content = renderer.render_many(template, matches) + '\n'
+        else:
+            content = template.render(matches=matches, games=output['games'])
+        written.append((output['output'], write_atomic(output['output'], content)))
+    return written
@@ -0,0 +1,143 @@
+"""
+Single pass extraction of gosugamers match rows.
+Every <tr> is walked once with plain lxml instead of evaluating a separate xpath per Match field.
+"""
+import re
+import time
+from typing import Callable, Generator, Iterable, List
+from urllib.parse import urljoin
+
+from lxml import etree
+
+from ggmt import Match
+
+RE_MATCH_ID = re.compile(r'matches/(\d+)')
+RE_URL_SECTION = re.compile(r'^[a-z]+://[^/]+/([^/?#]+)', flags=re.I)
+
+
+def _text_nodes(el) -> Generator[str, None, None]:
+    """equivalent of xpath text() - direct text nodes of element"""
+    if el.text is not None:
+        yield el.text
+    for child in el:
+        if child.tail is not None:
+            yield child.tail
+
+
+def _classes(el) -> str:
+    return el.get('class') or ''
+
+
+class MatchRowExtractor:
+    """
+    Extracts Match from gosugamers match table row.
+    Produces the same values as the per field xpath queries it replaces:
+        url       .//a/@href
+        time      td[@class='status']/span/text()
+        t1/t2     .//span[contains(@class,'opp1')]/span/text()
+        country   .//span[contains(@class,'opp1')]/span[contains(@class,'flag')]/@title
+        scores    .score::text
+    """
+
+    def __init__(self, url_base: str, games: List[str], time_parser: Callable[[str], int]):
+        """
+        :param url_base: base url for relative match urls
+        :param games: list of game names that can appear in match urls
+        :param time_parser: function converting time text to seconds
+        """
+        self.url_base = url_base
+        self.games = games
+        self.time_parser = time_parser
+        self.game_index = {g: g for g in games if g != 'all'}
+
+    def find_game(self, url: str) -> str:
+        section = RE_URL_SECTION.findall(url)
+        if section and section[0].lower() in self.game_index:
+            return self.game_index[section[0].lower()]
+        # url doesn't start with game name, fallback to looking for it anywhere
+        return next((g for g in self.games if g in url.lower()), None)
+
+    def extract(self, row, reference: float = None) -> Match:
+        """
+        :param row: lxml element of match table row
+        :param reference: unix time the page was downloaded at, default now
+        :return: Match
+        """
+        href = time_text = None
+        opps = {'opp1': {}, 'opp2': {}}
+        scores = []
+        for el in row.iter(etree.Element):
+            classes = _classes(el)
+            if href is None and el.tag == 'a' and el.get('href') is not None:
+                href = el.get('href')
+            if 'score' in classes.split():
+                scores.extend(_text_nodes(el))
+            if el.tag != 'span':
+                continue
+            parent = el.getparent()
+            if time_text is None and parent.tag == 'td' and parent.get('class') == 'status' \
+                    and parent.getparent() is row:
+                time_text = next(_text_nodes(el), None)
+            if parent.tag != 'span':
+                continue
+            parent_classes = _classes(parent)
+            for opp, found in opps.items():
+                if opp not in parent_classes:
+                    continue
+                if 'name' not in found:
+                    name = next(_text_nodes(el), None)
+                    if name is not None:
+                        found['name'] = name
+                if 'flag' in classes and 'country' not in found and el.get('title') is not None:
+                    found['country'] = el.get('title')
+                if 'flag' in classes and 'country_short' not in found:
+                    found['country_short'] = classes
+
+        item = Match()
+        item['url'] = urljoin(self.url_base, (href or '').strip())
+        item['id'] = (RE_MATCH_ID.findall(item['url']) or [None])[0]
+        item['game'] = self.find_game(item['url'])
+        item['time'] = (time_text or '').strip()
+        item['time_secs'] = self.time_parser(item['time'])
+        item['timestamp'] = int((time.time() if reference is None else reference) + item['time_secs'])
+        for opp, key in (('opp1', 't1'), ('opp2', 't2')):
+            found = opps[opp]
+            item[key] = found.get('name', '').strip()
+            item[key + '_country'] = found.get('country', '').strip()
+            item[key + '_country_short'] = (found.get('country_short', '').split() or [''])[-1]
+        item['t1_score'] = scores[0] if scores else None
+        item['t2_score'] = scores[1] if len(scores) > 1 else None
+        return item
+
+
+def iter_table_rows(chunks: Iterable[bytes], table_id: str = 'gb-matches') -> Generator:
+    """
+    Incrementally parse html and yield rows of table as soon as they are parsed.
+    Rows are cleared after being consumed so memory stays flat for big pages.
+    :param chunks: iterable of html bytes, e.g. response.iter_content()
+    :param table_id: id attribute of the table
+    :return: generator of lxml <tr> elements
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+    depth = 0
+
+    def rows():
+        nonlocal depth
+        for event, el in parser.read_events():
+            if el.tag != 'table' and not depth:
+                continue
+            if el.tag == 'table':
+                if event == 'start' and (depth or el.get('id') == table_id):
+                    depth += 1
+                elif event == 'end' and depth:
+                    depth -= 1
+                continue
+            if event == 'end' and el.tag == 'tr':
+                yield el
+                el.clear(keep_tail=True)
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from rows()
+    parser.close()
+    yield from rows()
@@ -0,0 +1,104 @@
+"""
+Process wide request coalescing and short lived cache of parsed results,
+so bursts of identical calls in long running processes download and parse every page once.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+DEFAULT_RESULT_TTL = 10
+DEFAULT_MAX_ENTRIES = 256
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share a single execution of the function"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # key: Future of call in flight
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable):
+        """
+        Call func unless a call with the same key is already in flight, in which case wait for its result
+        :returns: result of func, exceptions are raised to every waiting caller
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class ResultCache:
+    """
+    In memory cache of parsed results, e.g. Match lists keyed by (game url, endpoint).
+    Entries live for a few seconds only, concurrent loads of the same key are coalesced.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_RESULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param ttl: seconds results are reused
+        :param max_entries: oldest entries are dropped above this amount
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key: (expires, value)
+        self.flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable):
+        """
+        :param load: function producing the value if it isn't cached
+        :returns: cached or freshly loaded value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+        return self.flight.do(key, lambda: self._load(key, load))
+
+    def _load(self, key, load):
+        value = load()
+        with self.lock:
+            self.misses += 1
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """:returns: dict of hits, misses, coalesced (calls that waited for another caller's load) and entries"""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.flight.coalesced,
+                    'entries': len(self.entries)}
+
+
+# shared by all downloaders of the process
+REQUESTS = SingleFlight()
+RESULTS = ResultCache()
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import time
+
+LEGACY_HISTORY_LOCATION = os.path.expanduser('~/.ggmt_history')
+HISTORY_LOCATION = os.path.expanduser('~/.ggmt_history.db')
+DEFAULT_MAX_AGE = 3600 * 24 * 30
+DEFAULT_MAX_COUNT = 10000
+
+
+class History:
+    """
+    Notification history stored in sqlite database.
+    All ids are loaded into memory once so membership checks don't touch the disk;
+    concurrent writers (e.g. overlapping cron runs) are serialized by sqlite.
+    """
+
+    def __init__(self, location: str = HISTORY_LOCATION, legacy_location: str = LEGACY_HISTORY_LOCATION,
+                 max_age: int = DEFAULT_MAX_AGE, max_count: int = DEFAULT_MAX_COUNT):
+        """
+        :param location: sqlite database file
+        :param legacy_location: plain text history file of older versions, imported once
+        :param max_age: seconds after which entries are pruned
+        :param max_count: maximum amount of entries kept after pruning
+        """
+        self.location = location
+        self.max_age = max_age
+        self.max_count = max_count
+        self.db = sqlite3.connect(location, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS history (id TEXT PRIMARY KEY, added REAL NOT NULL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS history_added ON history (added)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        if legacy_location:
+            self._import_legacy(legacy_location)
+        self.ids = {row[0] for row in self.db.execute('SELECT id FROM history')}
+
+    def _import_legacy(self, location: str):
+        """import plain text history file where every line is a match id"""
+        if self.db.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            if self.db.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return
+            if os.path.exists(location):
+                added = time.time()
+                with open(location) as f:
+                    ids = {line.strip() for line in f if line.strip()}
+                self.db.executemany('INSERT OR IGNORE INTO history VALUES (?, ?)', ((i, added) for i in ids))
+            self.db.execute("INSERT INTO meta VALUES ('legacy_imported', ?)", (location,))
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, match_id: str):
+        """add match id to history"""
+        self.db.execute('INSERT OR REPLACE INTO history VALUES (?, ?)', (match_id, time.time()))
+        self.ids.add(match_id)
+
+    def prune(self, max_age: int = None, max_count: int = None):
+        """
+        Remove entries older than max_age seconds and all but newest max_count entries.
+        Defaults to values History was created with.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        max_count = self.max_count if max_count is None else max_count
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.execute('DELETE FROM history WHERE added < ?', (time.time() - max_age,))
+            self.db.execute('DELETE FROM history WHERE id NOT IN '
+                            '(SELECT id FROM history ORDER BY added DESC LIMIT ?)', (max_count,))
+        self.ids = {row[0] for row in self.db.execute('SELECT id FROM history')}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,285 @@
+"""
+Policy of all outbound http requests: connect/read timeouts, jittered exponential retries of
+connection errors and 5xx responses, per host circuit breaker and an overall deadline.
+When a host keeps failing its last cached response is served instead of waiting for it.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from ggmt.metrics import METRICS, record_response
+from ggmt.settings import CACHE_LOCATION
+
+BREAKER_LOCATION = os.path.join(CACHE_LOCATION, 'breakers.json')
+DEFAULT_TIMEOUT = (3.05, 10)  # connect, read
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.25
+MAX_BACKOFF = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 60
+
+
+class CircuitOpen(ConnectionRefusedError):
+    """host failed too many times recently and isn't asked until its breaker resets"""
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """command ran out of time before request could be made"""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of every host, hosts failing `threshold` times in a row aren't requested
+    for `reset_timeout` seconds, then a single trial request is let through to check whether host recovered.
+    Other requests are refused until the trial succeeds or fails, or it takes longer than `reset_timeout`.
+    Can be persisted as json file so cron runs don't wait for a host that is known to be down.
+    """
+
+    def __init__(self, location: str = None, threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        """
+        :param location: json file to load from and save to, None to keep breakers in memory only
+        :param threshold: consecutive failures opening the breaker
+        :param reset_timeout: seconds open breaker blocks requests
+        """
+        self.location = location
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.hosts = {}  # host: {'failures': count, 'opened': unix time or None, 'trial': unix time or None}
+        if location:
+            self.load()
+
+    def load(self):
+        """load breakers file, missing or unreadable file is treated as all breakers closed"""
+        try:
+            with open(self.location) as f:
+                hosts = json.load(f)
+            self.hosts = {host: {'failures': int(h['failures']), 'opened': h['opened'] and float(h['opened']),
+                                 'trial': h.get('trial') and float(h['trial'])}
+                          for host, h in hosts.items()}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            self.hosts = {}
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.location))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.hosts, f)
+        os.replace(tmp, self.location)
+
+    def allow(self, host: str) -> bool:
+        """:returns: whether host can be requested, caller must report success or failure of half open breaker"""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or not state['opened']:
+                return True
+            now = time.time()
+            if now - state['opened'] < self.reset_timeout:
+                return False
+            if state.get('trial') and now - state['trial'] < self.reset_timeout:
+                return False  # half open, another request is checking the host
+            state['trial'] = now
+            return True
+
+    def retry_in(self, host: str) -> float:
+        """:returns: seconds until open breaker of host lets requests through"""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or not state['opened']:
+                return 0
+            return max(0, state['opened'] + self.reset_timeout - time.time())
+
+    def success(self, host: str):
+        with self.lock:
+            if host not in self.hosts:
+                return
+            del self.hosts[host]
+            self._changed()
+
+    def failure(self, host: str):
+        with self.lock:
+            state = self.hosts.setdefault(host, {'failures': 0, 'opened': None, 'trial': None})
+            state['failures'] += 1
+            if state['failures'] >= self.threshold:
+                state['opened'] = time.time()  # also reopens breaker whose trial request failed
+                state['trial'] = None
+            self._changed()
+
+    def _changed(self):
+        if self.location:
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def reset(self):
+        with self.lock:
+            self.hosts.clear()
+            self._changed()
+
+
+class HttpPolicy:
+    """
+    Makes GET requests, optionally through HttpCache, according to the policy.
+    Downloaders share the process wide POLICY by default.
+    """
+    logger = logging.getLogger('ggmt.http')
+
+    def __init__(self, timeout: tuple = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF, breaker: CircuitBreaker = None, deadline: float = None):
+        """
+        :param timeout: (connect, read) timeout in seconds of requests that don't set their own
+        :param retries: how many times failed requests are retried
+        :param backoff: seconds of the first retry delay, doubled by every retry and jittered
+        :param breaker: CircuitBreaker of hosts, in memory breaker by default
+        :param deadline: seconds from now all requests have to be done in, None for no deadline
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.set_deadline(deadline)
+
+    def set_deadline(self, seconds: float = None):
+        """requests made more than `seconds` from now fail with DeadlineExceeded, None to remove deadline"""
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """:returns: seconds left until deadline, None if there is no deadline"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def _timeout(self, timeout):
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            raise DeadlineExceeded('deadline exceeded')
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def get(self, session: requests.Session, url: str, cache=None, kind: str = None,
+            **kwargs) -> requests.Response:
+        """
+        Policy version of session.get(url) or cache.get(session, url, kind)
+        :param cache: HttpCache to serve responses from and to fall back to, None to always download
+        :returns: requests.Response, possibly a stale cached one if host is failing
+        :raises CircuitOpen: if breaker of host is open and nothing is cached
+        :raises requests.RequestException: of the last attempt if all attempts failed and nothing is cached
+        """
+        host = urlsplit(url).netloc
+        if not self.breaker.allow(host):
+            stale = cache.stale(url, kind) if cache is not None else None
+            if stale is not None:
+                self.logger.warning('{} is failing, using cached {}'.format(host, url))
+                return stale
+            raise CircuitOpen('{} is failing, retrying in {:.0f}s'.format(host, self.breaker.retry_in(host)))
+        timeout = kwargs.pop('timeout', None) or self.timeout
+        resp = error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self._delay(attempt - 1)
+                remaining = self.remaining()
+                if remaining is not None and remaining <= delay:
+                    break
+                time.sleep(delay)
+            try:
+                attempt_timeout = self._timeout(timeout)
+            except DeadlineExceeded as e:
+                error = error or e
+                break
+            started = time.perf_counter()
+            try:
+                if cache is None:
+                    resp = session.get(url, timeout=attempt_timeout, **kwargs)
+                    record_response(url, resp, time.perf_counter() - started, streamed=kwargs.get('stream', False))
+                else:  # cache records requests it sends
+                    resp = cache.get(session, url, kind, timeout=attempt_timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                resp, error = None, e
+                METRICS.inc('ggmt_http_requests', host=host, status='error')
+                METRICS.observe('ggmt_http_request_seconds', time.perf_counter() - started, host=host)
+                self.logger.debug('attempt {} of {} failed: {}'.format(attempt + 1, url, e))
+                continue
+            if resp.status_code not in RETRY_STATUSES:
+                self.breaker.success(host)
+                return resp
+            self.logger.debug('attempt {} of {} failed: {}'.format(attempt + 1, url, resp.status_code))
+        if resp is not None or not isinstance(error, DeadlineExceeded):  # running out of time isn't host's fault
+            self.breaker.failure(host)
+        stale = cache.stale(url, kind) if cache is not None else None
+        if stale is not None:
+            self.logger.warning('{} failed, using cached response'.format(url))
+            return stale
+        if resp is not None:
+            return resp
+        raise error
+
+    async def aget(self, get, url: str, errors: tuple = (), timeout: float = None):
+        """
+        Asyncio version of get() for clients without cache, e.g. AsyncFetcher
+        :param get: coroutine function get(url, timeout=timeout) making a single request, e.g. httpx.AsyncClient.get
+        :param errors: exceptions of failed requests to retry, e.g. httpx.TransportError
+        :param timeout: seconds or (connect, read) timeout, default policy timeout
+        :returns: response of get, status is checked by its status_code
+        :raises CircuitOpen: if breaker of host is open
+        :raises Exception: one of errors of the last attempt if all attempts failed
+        """
+        host = urlsplit(url).netloc
+        if not self.breaker.allow(host):
+            raise CircuitOpen('{} is failing, retrying in {:.0f}s'.format(host, self.breaker.retry_in(host)))
+        timeout = timeout or self.timeout
+        resp = error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self._delay(attempt - 1)
+                remaining = self.remaining()
+                if remaining is not None and remaining <= delay:
+                    break
+                await asyncio.sleep(delay)
+            try:
+                attempt_timeout = self._timeout(timeout)
+            except DeadlineExceeded as e:
+                error = error or e
+                break
+            if isinstance(attempt_timeout, tuple):  # httpx takes (connect, read, write, pool)
+                connect, read = attempt_timeout
+                attempt_timeout = (connect, read, read, connect)
+            started = time.perf_counter()
+            try:
+                resp = await get(url, timeout=attempt_timeout)
+            except errors as e:
+                resp, error = None, e
+                METRICS.inc('ggmt_http_requests', host=host, status='error')
+                METRICS.observe('ggmt_http_request_seconds', time.perf_counter() - started, host=host)
+                self.logger.debug('attempt {} of {} failed: {}'.format(attempt + 1, url, e))
+                continue
+            record_response(url, resp, time.perf_counter() - started)
+            if resp.status_code not in RETRY_STATUSES:
+                self.breaker.success(host)
+                return resp
+            self.logger.debug('attempt {} of {} failed: {}'.format(attempt + 1, url, resp.status_code))
+        if resp is not None or not isinstance(error, DeadlineExceeded):
+            self.breaker.failure(host)
+        if resp is not None:
+            return resp
+        raise error
+
+
+POLICY = HttpPolicy()
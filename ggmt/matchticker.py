@@ -1,29 +1,61 @@
 import logging
+import os
+import queue
 import re
-from datetime import timedelta, datetime
-from typing import Generator, List
-from urllib.parse import urljoin
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, Generator, Iterable, List
 
 import requests
 from parsel import Selector, SelectorList
 
-from ggmt import Match
+from ggmt import Change, Match
+from ggmt.cache import HttpCache, MATCH_LIST, MATCH_DETAIL
+from ggmt.diff import SNAPSHOT_LOCATION, Snapshot
+from ggmt.extract import MatchRowExtractor, iter_table_rows
+from ggmt.flight import REQUESTS, RESULTS, ResultCache
+from ggmt.http import POLICY, HttpPolicy
+from ggmt.metrics import METRICS
+from ggmt.settings import GOSUGAMERS_GAMES, MAX_WORKERS
+from ggmt.streams import StreamMemo
 
 
+RE_TIME = re.compile(r'(\d+)([wdhm])')
+UNIT_SECONDS = {'w': 3600 * 24 * 7, 'd': 3600 * 24, 'h': 3600, 'm': 60}
+
+
+@lru_cache(maxsize=1024)
 def time_to_seconds(text: str) -> int:
     """
-    converts text time to seconds
-    :returns: seconds integer
+    converts text time to seconds, e.g. "1w 2d", "1h 30m", "Live" or "2h 5m ago" of recent matches.
+    Pages repeat the same few texts, so results are memoized.
+    :returns: seconds integer until match starts, negative for matches that started in the past
     """
-    if 'live' in text.lower():
-        return 0
     text = text.strip().lower()
+    if 'live' in text:
+        return 0
     seconds = 0
-    seconds += int((re.findall('(\d+)w', text) or [0])[0]) * 3600 * 24 * 7
-    seconds += int((re.findall('(\d+)d', text) or [0])[0]) * 3600 * 24
-    seconds += int((re.findall('(\d+)h', text) or [0])[0]) * 3600
-    seconds += int((re.findall('(\d+)m', text) or [0])[0]) * 60
-    return seconds
+    units = set()
+    for amount, unit in RE_TIME.findall(text):
+        if unit not in units:  # only the first amount of every unit counts
+            units.add(unit)
+            seconds += int(amount) * UNIT_SECONDS[unit]
+    return -seconds if text.endswith('ago') else seconds
+
+
+def response_time(resp) -> float:
+    """
+    when response was downloaded, reference for match timestamps
+    :param resp: requests or httpx response, Age header is set by caches
+    """
+    try:
+        age = float(resp.headers.get('Age') or 0)
+    except ValueError:
+        age = 0
+    return time.time() - age
 
 
 def clean_stream_url(url: str) -> str:
@@ -47,116 +79,455 @@ def clean_stream_url(url: str) -> str:
     return url
 
 
+def mount_pool(session: requests.Session, size: int) -> requests.Session:
+    """make session keep up to `size` connections per host so concurrent requests reuse them"""
+    if getattr(session.get_adapter('http://'), '_pool_maxsize', 0) >= size:
+        return session  # never shrink pool of a session shared with others
+    adapter = requests.adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    """process wide session, so downloaders created without one share a single connection pool"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = mount_pool(requests.session(), max(MAX_WORKERS, requests.adapters.DEFAULT_POOLSIZE))
+        return _session
+
+
 class GosuTicker:
     """
     Match downloader for http://gosugamers.net source
     """
-    games = [
-        'dota2',
-        'counterstrike',
-        'hearthstone',
-        'heroesofthestorm',
-        'lol',
-        'overwatch',
-        'starcraft2',
-        'all',
-    ]
-    url_base = "http://www.gosugamers.net/"
+    games = GOSUGAMERS_GAMES
+    url_base = os.environ.get('GGMT_GOSUGAMERS_URL', "http://www.gosugamers.net/")
     logger = logging.getLogger('gosuticker')
+    max_workers = MAX_WORKERS
+    stream_timeout = 10
 
-    def __init__(self, game):
+    def __init__(self, game, cache: HttpCache = None, session: requests.Session = None, snapshot: Snapshot = None,
+                 streams: StreamMemo = None, results: ResultCache = RESULTS, policy: HttpPolicy = POLICY):
+        """
+        :param cache: HttpCache to serve responses from, None to always download
+        :param session: requests session to use, process wide shared_session() by default
+        :param snapshot: matches of previous poll for download_changes, in memory snapshot by default
+        :param streams: StreamMemo of streams resolved by previous runs, None to always download match pages
+        :param results: ResultCache of parsed match lists shared by tickers of the process, None to disable
+        :param policy: HttpPolicy of timeouts, retries and circuit breakers of requests
+        """
         if game not in self.games:
             raise NotImplementedError(""""parser for game "{}" doesn't exist""".format(game))
+        self.game = game
         if game == 'all':
             game = ''
         self.game_url = self.url_base + game
-        self.session = requests.session()
+        self.session = session or shared_session()
+        self.cache = cache
+        self.results = results
+        self.policy = policy
+        self.snapshot = snapshot or Snapshot()
+        self.streams = streams
+        self.extractor = MatchRowExtractor(self.url_base, self.games, time_to_seconds)
+
+    def _get(self, url: str, kind: str, **kwargs) -> requests.Response:
+        with METRICS.timer('ggmt_fetch_seconds', kind=kind):
+            if kwargs.get('stream'):  # streamed body can be read only once
+                return self._download(url, kind, **kwargs)
+            # concurrent requests of the same page, e.g. by "all" and game tickers, share one download
+            return REQUESTS.do((url, kind), lambda: self._download(url, kind, **kwargs))
 
-    def download_matches(self, crawl_stream: bool = True) -> List[Match]:
+    def _selector(self, resp: requests.Response) -> Selector:
+        with METRICS.timer('ggmt_phase_seconds', phase='selector'):
+            return Selector(text=resp.text)
+
+    def _download(self, url: str, kind: str, **kwargs) -> requests.Response:
+        return self.policy.get(self.session, url, self.cache, kind, **kwargs)
+
+    def _cached(self, endpoint: str, crawl_stream: bool, load) -> List[Match]:
+        """parsed matches from self.results, every caller gets its own copies of Match objects"""
+        if self.results is None:
+            return load()
+        matches = self.results.get((self.game_url, endpoint, crawl_stream), load)
+        return [Match(match) for match in matches]
+
+    def download_matches(self, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
         """
         Downloads live and upcoming matches.
+        Results are shared with concurrent and recent callers of the process, see ResultCache.
+        :param max_workers: how many match pages to crawl for streams at once
         :return: list of Match objects
         """
-        resp = self.session.get(self.game_url)
+        return self._cached('matches', crawl_stream, lambda: self._download_matches(crawl_stream, max_workers))
+
+    def _download_matches(self, crawl_stream, max_workers):
+        resp = self._get(self.game_url, MATCH_LIST)
         if resp.status_code != 200:
             raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
-        sel = Selector(text=resp.text)
-        matches = list(self.find_matches(sel))
+        matches = list(self.find_matches(self._selector(resp), response_time(resp)))
+        for item in matches:
+            item['source'] = self.game
         if crawl_stream:
-            matches = self.update_match_streams(matches)
+            matches = self.update_match_streams(matches, max_workers=max_workers)
         return matches
 
-    def download_history(self, crawl_stream: bool = True) -> List[Match]:
+    def download_history(self, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
         """
         Downloads recent matches.
+        Results are shared with concurrent and recent callers of the process, see ResultCache.
+        :param max_workers: how many match pages to crawl for streams at once
         :return: list of Match objects
         """
-        resp = self.session.get('{}/gosubet'.format(self.game_url))
+        return self._cached('history', crawl_stream, lambda: self._download_history(crawl_stream, max_workers))
+
+    def _download_history(self, crawl_stream, max_workers):
+        resp = self._get('{}/gosubet'.format(self.game_url), MATCH_LIST)
         if resp.status_code != 200:
             raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
-        sel = Selector(text=resp.text)
-        matches = list(self.find_history(sel))
+        matches = list(self.find_history(self._selector(resp), response_time(resp)))
+        for item in matches:
+            item['source'] = self.game
         if crawl_stream:
-            matches = self.update_match_streams(matches)
+            matches = self.update_match_streams(matches, max_workers=max_workers)
         return matches
 
-    def _find_match(self, sel: Selector) -> Match:
-        xpath = lambda x: sel.xpath(x).extract_first(default='').strip()
-        item = Match()
-        item['url'] = urljoin(self.url_base, xpath(".//a/@href"))
-        item['id'] = (re.findall('matches/(\d+)', item['url']) or [None])[0]
-        item['game'] = next((g for g in self.games if g in item['url'].lower()))
-        item['time'] = xpath("td[@class='status']/span/text()")
-        item['time_secs'] = time_to_seconds(item['time'])
-        item['timestamp'] = int((datetime.now() + timedelta(item['time_secs'])).timestamp())
-        item['t1'] = xpath(".//span[contains(@class,'opp1')]/span/text()")
-        item['t1_country'] = xpath(".//span[contains(@class,'opp1')]/span[contains(@class,'flag')]/@title")
-        item['t1_country_short'] = xpath(".//span[contains(@class,'opp1')]"
-                                         "/span[contains(@class,'flag')]/@class").split()[-1]
-        item['t2'] = xpath(".//span[contains(@class,'opp2')]/span/text()")
-        item['t2_country'] = xpath(".//span[contains(@class,'opp2')]/span[contains(@class,'flag')]/@title")
-        item['t2_country_short'] = xpath(".//span[contains(@class,'opp2')]"
-                                         "/span[contains(@class,'flag')]/@class").split()[-1]
-        scores = sel.css('.score::text').extract()
-        item['t1_score'] = scores[0] if scores else None
-        item['t2_score'] = scores[1] if len(scores) > 1 else None
-        return item
-
-    def update_match_streams(self, matches: List[Match]) -> List[Match]:
-        """Populate Match objects with stream urls"""
-        updated = []
-        for item in matches:
-            # Populate stream data if match is live
-            if not item['time_secs']:
-                resp = self.session.get(item['url'])
-                sel_detailed = Selector(text=resp.text)
-                item['stream'] = sel_detailed.xpath("//div[@class='matches-streams']"
-                                                    "/span[.//a[re:test(text(),'english', 'i')]]"
-                                                    "//iframe/@src").extract_first()
-                item['stream'] = clean_stream_url(item['stream'])
-            updated.append(item)
-        return updated
-
-    def _find_matches(self, sel: SelectorList):
+    def download_changes(self, max_workers: int = None) -> List[Change]:
+        """
+        Downloads live and upcoming matches and compares them to the previous poll kept in self.snapshot.
+        Streams found by previous poll are reused, so match pages are only downloaded for matches that went live.
+        :param max_workers: how many match pages to crawl for streams at once
+        :return: list of Change objects
+        """
+        matches = self.download_matches(crawl_stream=False)
+        self.update_match_streams(self.snapshot.reuse_streams(matches), max_workers=max_workers)
+        return self.snapshot.update(matches)
+
+    def iter_matches(self, history: bool = False, ordered: bool = True,
+                     max_workers: int = None) -> Generator[Match, None, None]:
+        """
+        Streaming version of download_matches and download_history.
+        Matches are parsed while the page is being downloaded, matches that are not live are yielded right away
+        and live ones as soon as their stream is found.
+        :param history: iterate recent matches instead of live and upcoming ones
+        :param ordered: keep page order, otherwise yield matches as soon as they are ready
+        :param max_workers: how many match pages to crawl for streams at once
+        :returns: Generator for Match objects
+        """
+        if history:
+            resp = self._get('{}/gosubet'.format(self.game_url), MATCH_LIST)
+        else:
+            resp = self._get(self.game_url, MATCH_LIST, stream=True)
+        if resp.status_code != 200:
+            raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
+        if history:
+            matches = self.find_history(self._selector(resp), response_time(resp))
+        else:
+            matches = self.stream_matches(resp.iter_content(8192), response_time(resp))
+
+        def with_source(matches):
+            for item in matches:
+                item['source'] = self.game
+                yield item
+
+        yield from self.iter_match_streams(with_source(matches), ordered=ordered, max_workers=max_workers)
+
+    def iter_match_streams(self, matches: Iterable[Match], ordered: bool = True,
+                           max_workers: int = None) -> Generator[Match, None, None]:
+        """
+        Streaming version of update_match_streams.
+        :param matches: iterable of Match objects, consumed lazily
+        :param ordered: keep order of matches, otherwise yield matches as soon as they are ready
+        :param max_workers: how many match pages to download at once, default GosuTicker.max_workers
+        :returns: Generator for Match objects
+        """
+        max_workers = max_workers or self.max_workers
+        if max_workers > requests.adapters.DEFAULT_POOLSIZE:
+            mount_pool(self.session, max_workers)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque()  # ordered: (match, future) in order, future is None for matches that are not live
+        futures = {}  # unordered: future: match
+
+        def resolved(item, future):
+            item['stream'] = future.result()
+            return item
+
+        try:
+            for item in matches:
+                future = executor.submit(self._find_stream_safe, item) if not item['time_secs'] else None
+                if ordered:
+                    pending.append((item, future))
+                    while pending and (pending[0][1] is None or pending[0][1].done()):
+                        item, future = pending.popleft()
+                        yield resolved(item, future) if future else item
+                elif future is None:
+                    yield item
+                else:
+                    futures[future] = item
+                    for future in [f for f in futures if f.done()]:
+                        yield resolved(futures.pop(future), future)
+            for item, future in pending:
+                yield resolved(item, future) if future else item
+            for future in as_completed(futures):
+                yield resolved(futures[future], future)
+        finally:
+            # don't download pages of matches nobody waits for anymore, e.g. when consumer stopped early
+            for future in [future for _, future in pending if future] + list(futures):
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _find_match(self, sel: Selector, reference: float = None) -> Match:
+        return self._extract(sel.root, reference)
+
+    def _extract(self, row, reference: float = None) -> Match:
+        if not METRICS.detailed:
+            return self.extractor.extract(row, reference)
+        with METRICS.timer('ggmt_row_parse_seconds', page=self.game):
+            return self.extractor.extract(row, reference)
+
+    def find_stream(self, match: Match) -> str:
+        """
+        Downloads match page and finds stream url of the match
+        :returns: clean stream url or None if match page has no english stream
+        """
+        resp = self._get(match['url'], MATCH_DETAIL, timeout=self.stream_timeout)
+        if resp.status_code != 200:
+            raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
+        return self.parse_stream(resp.text)
+
+    def parse_stream(self, text: str) -> str:
+        """
+        Finds stream url in match page html
+        :returns: clean stream url or None if match page has no english stream
+        """
+        with METRICS.timer('ggmt_phase_seconds', phase='stream_parse'):
+            sel_detailed = Selector(text=text)
+            stream = sel_detailed.xpath("//div[@class='matches-streams']"
+                                        "/span[.//a[re:test(text(),'english', 'i')]]"
+                                        "//iframe/@src").extract_first()
+            return clean_stream_url(stream)
+
+    def _find_stream_safe(self, match: Match) -> str:
+        """find_stream that reuses remembered streams and logs errors instead of raising them"""
+        if self.streams is not None:
+            found, stream = self.streams.get(match)
+            if found:
+                return stream
+        try:
+            stream = self.find_stream(match)
+        except (requests.RequestException, ConnectionRefusedError) as e:
+            self.logger.error("Couldn't retrieve stream for {}: {}".format(match['url'], e))
+            return None
+        if self.streams is not None:
+            self.streams.set(match, stream)
+        return stream
+
+    def update_match_streams(self, matches: List[Match], max_workers: int = None) -> List[Match]:
+        """
+        Populate Match objects with stream urls.
+        Match pages of live matches are downloaded concurrently, order of matches is preserved.
+        :param max_workers: how many match pages to download at once, default GosuTicker.max_workers
+        """
+        matches = list(matches)
+        # Populate stream data only if match is live
+        live = [item for item in matches if not item['time_secs']]
+        if self.streams is not None:
+            for item in matches:
+                if item['time_secs']:
+                    self.streams.discard(item)
+        if not live:
+            return matches
+        max_workers = max(1, min(max_workers or self.max_workers, len(live)))
+        if max_workers > requests.adapters.DEFAULT_POOLSIZE:
+            mount_pool(self.session, max_workers)
+        with METRICS.timer('ggmt_phase_seconds', phase='streams'):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                streams = executor.map(self._find_stream_safe, live)
+                for item, stream in zip(live, streams):
+                    item['stream'] = stream
+        return matches
+
+    def _find_matches(self, sel: SelectorList, reference: float = None):
         """
         Base match finder method
         :param sel: html Selector of match region
+        :param reference: unix time the page was downloaded at, match timestamps are relative to it, default now
         :return: Generator Matches
         """
+        reference = time.time() if reference is None else reference
         for match in sel:
-            item = self._find_match(match)
+            item = self._find_match(match, reference)
             yield item
 
-    def find_matches(self, sel: Selector) -> Generator[Match, None, None]:
+    def find_matches(self, sel: Selector, reference: float = None) -> Generator[Match, None, None]:
         """
         Generator to find live and upcoming matches in parsel.Selector object
+        :param reference: see _find_matches
+        :returns: Generator for Match objects
+        """
+        yield from self._find_matches(sel.xpath("//table[@id='gb-matches']//tr"), reference)
+
+    def stream_matches(self, chunks: Iterable[bytes], reference: float = None) -> Generator[Match, None, None]:
+        """
+        Generator to find live and upcoming matches while html is still being parsed
+        :param chunks: iterable of html bytes, e.g. response.iter_content()
+        :param reference: see _find_matches
         :returns: Generator for Match objects
         """
-        yield from self._find_matches(sel.xpath("//table[@id='gb-matches']//tr"))
+        reference = time.time() if reference is None else reference
+        for row in iter_table_rows(chunks, table_id='gb-matches'):
+            yield self._extract(row, reference)
 
-    def find_history(self, sel: Selector) -> Generator[Match, None, None]:
+    def find_history(self, sel: Selector, reference: float = None) -> Generator[Match, None, None]:
         """
         Generator to find recent matches in parsel.Selector object
+        :param reference: see _find_matches
         :returns: Generator for Match objects
         """
-        yield from self._find_matches(sel.xpath("//h2[contains(text(),'Recent')]/..//tr"))
+        yield from self._find_matches(sel.xpath("//h2[contains(text(),'Recent')]/..//tr"), reference)
+
+
+def _shared_tickers(games: List[str], cache: HttpCache = None, max_workers: int = None,
+                    streams: StreamMemo = None) -> List[GosuTicker]:
+    """tickers for unique games sharing one session and connection pool"""
+    games = list(OrderedDict.fromkeys(games))
+    workers = max_workers or GosuTicker.max_workers
+    session = mount_pool(shared_session(), max(len(games), workers, requests.adapters.DEFAULT_POOLSIZE))
+    return [GosuTicker(game, cache=cache, session=session, streams=streams) for game in games]
+
+
+def download_each(games: List[str], history: bool = False, cache: HttpCache = None,
+                  max_workers: int = None, streams: StreamMemo = None) -> Dict[str, List[Match]]:
+    """
+    Downloads matches of several games at once over a shared connection pool.
+    :param games: list of GosuTicker.games
+    :param history: download recent matches instead of live and upcoming ones
+    :param max_workers: how many match pages to crawl for streams at once per game
+    :param streams: StreamMemo shared by all games
+    :returns: dict of game: list of Match objects in page order
+    """
+    tickers = _shared_tickers(games, cache, max_workers, streams)
+
+    def download(ticker):
+        if history:
+            return ticker.download_history(max_workers=max_workers)
+        return ticker.download_matches(max_workers=max_workers)
+
+    if len(tickers) == 1:
+        return {tickers[0].game: download(tickers[0])}
+    with ThreadPoolExecutor(max_workers=len(tickers)) as executor:
+        return OrderedDict(zip([t.game for t in tickers], executor.map(download, tickers)))
+
+
+def download_changes(games: List[str], cache: HttpCache = None, max_workers: int = None,
+                     location: str = SNAPSHOT_LOCATION, streams: StreamMemo = None) -> List[Change]:
+    """
+    Downloads matches of several games and compares them to snapshots of previous run stored in location.
+    :param games: list of GosuTicker.games
+    :param location: directory of per game snapshots, None to compare to nothing
+    :returns: list of Change objects, changes of matches listed on several pages are reported once
+    """
+    tickers = _shared_tickers(games, cache, max_workers, streams)
+    if location:
+        for ticker in tickers:
+            ticker.snapshot = Snapshot.for_game(ticker.game, location)
+    if len(tickers) == 1:
+        results = [tickers[0].download_changes(max_workers=max_workers)]
+    else:
+        with ThreadPoolExecutor(max_workers=len(tickers)) as executor:
+            results = list(executor.map(lambda ticker: ticker.download_changes(max_workers=max_workers), tickers))
+    changes = []
+    seen = set()
+    for result in results:
+        for change in result:
+            key = (change['change'], change['match'].id)
+            if key not in seen:
+                seen.add(key)
+                changes.append(change)
+    return changes
+
+
+def merge_matches(results: Iterable[List[Match]]) -> List[Match]:
+    """
+    Merge match lists of several games
+    :returns: list of unique Match objects sorted by time_secs, recent matches by how long ago they started
+    """
+    merged = OrderedDict()
+    for matches in results:
+        for match in matches:
+            # the same match might be listed on both game and "all" pages
+            merged.setdefault(match.id, match)
+    return sorted(merged.values(), key=lambda m: abs(int(m['time_secs'])))
+
+
+def download_games(games: List[str], history: bool = False, cache: HttpCache = None,
+                   max_workers: int = None, streams: StreamMemo = None) -> List[Match]:
+    """
+    Downloads matches of several games at once over a shared connection pool.
+    :param games: list of GosuTicker.games
+    :param history: download recent matches instead of live and upcoming ones
+    :param max_workers: how many match pages to crawl for streams at once per game
+    :returns: list of Match objects of all games sorted by time_secs,
+        Match['source'] is the game page match was found on
+    """
+    results = download_each(games, history=history, cache=cache, max_workers=max_workers, streams=streams)
+    if len(results) == 1:  # keep page order
+        return next(iter(results.values()))
+    return merge_matches(results.values())
+
+
+def iter_games(games: List[str], history: bool = False, cache: HttpCache = None, max_workers: int = None,
+               ordered: bool = True, streams: StreamMemo = None) -> Generator[Match, None, None]:
+    """
+    Streaming version of download_games, see GosuTicker.iter_matches.
+    Matches of several games are yielded as soon as they are ready, `ordered` keeps page order within every game.
+    """
+    tickers = _shared_tickers(games, cache, max_workers, streams)
+    if len(tickers) == 1:
+        yield from tickers[0].iter_matches(history=history, ordered=ordered, max_workers=max_workers)
+        return
+    done = object()
+    results = queue.Queue()
+    stopped = threading.Event()
+
+    def produce(ticker):
+        matches = ticker.iter_matches(history=history, ordered=ordered, max_workers=max_workers)
+        try:
+            for match in matches:
+                if stopped.is_set():
+                    break
+                results.put(match)
+        except Exception as e:
+            results.put(e)
+        finally:
+            # cancels match pages the ticker didn't download yet
+            matches.close()
+            results.put(done)
+
+    executor = ThreadPoolExecutor(max_workers=len(tickers))
+    futures = [executor.submit(produce, ticker) for ticker in tickers]
+    try:
+        seen = set()
+        finished = 0
+        while finished < len(tickers):
+            match = results.get()
+            if match is done:
+                finished += 1
+                continue
+            if isinstance(match, Exception):
+                raise match
+            # the same match might be listed on both game and "all" pages
+            if match.id not in seen:
+                seen.add(match.id)
+                yield match
+    finally:
+        # consumer might have stopped early, producers stop with their next match
+        stopped.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
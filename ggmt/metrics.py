@@ -0,0 +1,195 @@
+"""
+Process wide timing and request metrics of fetch, parse and render phases.
+Shown as a table by --profile and exported in OpenMetrics text format to a file or http endpoint
+by long running commands. Kept free of third party imports, so any module can record metrics.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+COUNTER = 'counter'
+SUMMARY = 'summary'
+
+# name: (type, unit, help), counters are exported with _total suffix, summaries with _count and _sum
+DESCRIPTIONS = {
+    'ggmt_http_requests': (COUNTER, None, 'http requests sent over the network by host and status, "error" if failed'),
+    'ggmt_http_response_bytes': (COUNTER, 'bytes', 'bytes of http response bodies by host'),
+    'ggmt_http_request_seconds': (SUMMARY, 'seconds', 'time of http requests by host, including dns and connect'),
+    'ggmt_cache_requests': (COUNTER, None, 'cache lookups by kind and result: hit, revalidated, miss or stale'),
+    'ggmt_fetch_seconds': (SUMMARY, 'seconds', 'time to get a page by kind, cache lookup and retries included'),
+    'ggmt_phase_seconds': (SUMMARY, 'seconds', 'time spent in parse and render phases'),
+    'ggmt_row_parse_seconds': (SUMMARY, 'seconds', 'time to extract a match from its table row by page'),
+    'ggmt_notifications': (COUNTER, None, 'notification messages by backend and result'),
+    'ggmt_polls': (COUNTER, None, 'daemon polls by game and result'),
+}
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+               for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Metrics:
+    """
+    Counters and summaries (count, sum and max) keyed by metric name and labels, safe to use from threads.
+    Usage:
+        METRICS.inc('ggmt_cache_requests', kind='match_list', result='hit')
+        with METRICS.timer('ggmt_phase_seconds', phase='selector'):
+            ...
+    """
+
+    def __init__(self):
+        # per row timers cost about as much as parsing a row, they are only kept when profiling or exporting
+        self.detailed = False
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels): value
+        self.summaries = {}  # (name, labels): [count, sum, max]
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """observe seconds the block took, also when it raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+    def openmetrics(self) -> str:
+        """:returns: all metrics in OpenMetrics text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, list(value)) for key, value in self.summaries.items())
+        families = {}  # name: (type, sample lines)
+        for (name, labels), value in counters:
+            families.setdefault(name, (COUNTER, []))[1].append(
+                '{}_total{} {}'.format(name, _labels(labels), _number(value)))
+        for (name, labels), (count, total, _) in summaries:
+            samples = families.setdefault(name, (SUMMARY, []))[1]
+            samples.append('{}_count{} {}'.format(name, _labels(labels), count))
+            samples.append('{}_sum{} {}'.format(name, _labels(labels), _number(total)))
+        lines = []
+        for name in sorted(families):
+            kind, samples = families[name]
+            _, unit, description = DESCRIPTIONS.get(name, (kind, None, ''))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            if unit:
+                lines.append('# UNIT {} {}'.format(name, unit))
+            if description:
+                lines.append('# HELP {} {}'.format(name, description))
+            lines.extend(samples)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, location: str):
+        """atomically write metrics file, e.g. for node exporter textfile collector"""
+        directory = os.path.dirname(os.path.abspath(location))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.openmetrics())
+        os.replace(tmp, location)
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """
+        Serve metrics at http://host:port/metrics from a daemon thread
+        :returns: http server, call its shutdown() to stop serving
+        """
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.openmetrics().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):  # http.server.ThreadingHTTPServer requires python 3.7
+            daemon_threads = True
+
+        server = Server((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+    def table(self) -> str:
+        """:returns: human readable table of timings followed by counters, e.g. for --profile"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, list(value)) for key, value in self.summaries.items())
+
+        def label(name, labels):
+            name = name[len('ggmt_'):]
+            if name.endswith('_seconds'):
+                name = name[:-len('_seconds')]
+            return ' '.join([name] + [str(v) for _, v in labels])
+
+        rows = [('timings', 'count', 'total s', 'mean ms', 'max ms')]
+        for (name, labels), (count, total, maximum) in summaries:
+            rows.append((label(name, labels), str(count), '{:.3f}'.format(total),
+                         '{:.2f}'.format(total / count * 1000), '{:.2f}'.format(maximum * 1000)))
+        width = max(len(row[0]) for row in rows + [(label(name, labels),) for (name, labels), _ in counters])
+        lines = ['{:<{w}} {:>8} {:>10} {:>10} {:>10}'.format(*row, w=width) for row in rows]
+        lines.append('{:<{w}} {:>8}'.format('counters', 'value', w=width))
+        for (name, labels), value in counters:
+            lines.append('{:<{w}} {:>8}'.format(label(name, labels), _number(value), w=width))
+        return '\n'.join(lines)
+
+
+METRICS = Metrics()
+
+
+def record_response(url: str, resp, seconds: float, streamed: bool = False):
+    """
+    Record http request that went over the network
+    :param resp: requests or httpx response
+    :param streamed: body wasn't read yet, its size is taken from Content-Length header
+    """
+    host = urlsplit(url).netloc
+    METRICS.inc('ggmt_http_requests', host=host, status=str(resp.status_code))
+    METRICS.observe('ggmt_http_request_seconds', seconds, host=host)
+    if streamed:
+        size = resp.headers.get('Content-Length')
+        size = int(size) if size and size.isdigit() else 0
+    else:
+        size = len(resp.content)
+    METRICS.inc('ggmt_http_response_bytes', size, host=host)
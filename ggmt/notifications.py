@@ -0,0 +1,344 @@
+"""
+Notification backends and a dispatcher sending notifications in the background.
+Every backend keeps one client for all notifications, has its own bounded queue, worker thread and rate limit,
+and notifications of matches starting at the same time are batched into a single message.
+"""
+import logging
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Iterable, List, Tuple
+
+import requests
+
+from ggmt.http import DEFAULT_TIMEOUT
+from ggmt.metrics import METRICS
+
+XDBUS_LOCATION = os.path.expanduser('~/.dbus/Xdbus')
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_BATCH_WINDOW = 0.5
+
+
+def dbus_environment(location: str = XDBUS_LOCATION) -> dict:
+    """
+    Environment of notify-send with variables exported by the desktop session to Xdbus file, e.g.
+        DBUS_SESSION_BUS_ADDRESS='unix:abstract=/tmp/dbus-XYZ,guid=...'
+        export DBUS_SESSION_BUS_ADDRESS
+    cron notify-send requires $DBUS_SESSION_BUS_ADDRESS to be set, as per http://unix.stackexchange.com/questions/111188
+    The file is only parsed, never executed.
+    """
+    env = dict(os.environ)
+    try:
+        with open(location) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return env
+    for line in lines:
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError:
+            continue
+        for word in words:
+            key, sep, value = word.partition('=')
+            if sep and key.isidentifier():
+                env[key] = value
+    return env
+
+
+def notify_send(title: str, body: str, env: dict = None):
+    """
+    Send desktop notification via notify-send, title and body are passed as arguments without a shell
+    :param env: environment of notify-send, see dbus_environment
+    :raises OSError: if notify-send is not installed
+    :raises subprocess.CalledProcessError: if notify-send failed
+    """
+    subprocess.run(['notify-send', '--', title, body], env=env if env is not None else dbus_environment(),
+                   stdout=subprocess.DEVNULL, check=True)
+
+
+def pushbullet_client(pushbullet_key: str = None):
+    """
+    Create pushbullet client
+    :param pushbullet_key: api key, defaults to PUSHBULLET_API enviroment variable
+    :raises ValueError: if no api key is available
+    :raises ImportError: if pushbullet.py package is not installed
+    """
+    pushbullet_key = pushbullet_key or os.environ.get('PUSHBULLET_API', '')
+    if not pushbullet_key:
+        raise ValueError('To use pushbullet notification supply --pushbulet-key '
+                         'or enviroment variable PUSHBULLET_API')
+    try:
+        from pushbullet import Pushbullet
+    except ImportError:
+        raise ImportError('To use pushbullet notification install pusbullet.py package;'
+                          ' pip install pushbullet.py')
+    return Pushbullet(pushbullet_key)
+
+
+class Notification:
+    """Notification about one match, `title` is "<headline> in <when>" and body links the match"""
+
+    def __init__(self, headline: str, when: str, link: str, start: float = None):
+        """
+        :param headline: e.g. "Navi vs OG"
+        :param when: time until match starts, e.g. "5m"
+        :param link: stream or match url
+        :param start: unix time match starts at, notifications of matches starting together are batched
+        """
+        self.headline = headline
+        self.when = when
+        self.link = link
+        self.start = start
+        self.future = Future()
+
+    @property
+    def title(self) -> str:
+        return '{} in {}'.format(self.headline, self.when)
+
+    def __repr__(self):
+        return 'Notification({!r}, {!r})'.format(self.title, self.link)
+
+
+def message(notifications: List[Notification]) -> Tuple[str, str]:
+    """:returns: (title, body) of single message about all notifications"""
+    if len(notifications) == 1:
+        return notifications[0].title, notifications[0].link
+    title = '{} in {}'.format(', '.join(n.headline for n in notifications), notifications[0].when)
+    body = '\n'.join('{}: {}'.format(n.headline, n.link) for n in notifications)
+    return title, body
+
+
+class RateLimiter:
+    """Token bucket allowing `burst` messages at once and `rate` messages per second on average"""
+
+    def __init__(self, rate: float = None, burst: int = 1):
+        """
+        :param rate: messages per second, None for no limit
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait(self):
+        """block until a message can be sent"""
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            time.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 1
+            self.updated = time.monotonic()
+        self.tokens -= 1
+
+
+class NotificationBackend:
+    """
+    Interface of notification backends, see DesktopBackend.
+    The client created by connect() is reused for every message.
+    """
+    name = None
+    rate = None  # messages per second, None for no limit
+    burst = 1
+
+    def __init__(self, rate: float = None, burst: int = None):
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+        self.client = None
+
+    def connect(self):
+        """:returns: client of backend"""
+        return None
+
+    def open(self):
+        """create client unless it exists, raises configuration errors early"""
+        if self.client is None:
+            self.client = self.connect()
+        return self
+
+    def send(self, title: str, body: str, notifications: List[Notification]):
+        """
+        Send one message
+        :param notifications: notifications the message is about
+        """
+        raise NotImplementedError
+
+
+class DesktopBackend(NotificationBackend):
+    """notify-send desktop notifications, the client is environment with session bus address"""
+    name = 'desktop'
+
+    def connect(self):
+        return dbus_environment()
+
+    def send(self, title, body, notifications):
+        notify_send(title, body, env=self.client)
+
+
+class PushbulletBackend(NotificationBackend):
+    """notes pushed via https://pushbullet.com"""
+    name = 'pushbullet'
+    rate = 1
+    burst = 5
+
+    def __init__(self, key: str = None, **kwargs):
+        """
+        :param key: api key, defaults to PUSHBULLET_API enviroment variable
+        """
+        super().__init__(**kwargs)
+        self.key = key
+
+    def connect(self):
+        return pushbullet_client(self.key)
+
+    def send(self, title, body, notifications):
+        self.client.push_note(title, body)
+
+
+class WebhookBackend(NotificationBackend):
+    """
+    json POSTed to url: {"title": ..., "body": ..., "matches": [{"headline", "when", "link", "start"}, ...]}
+    """
+    name = 'webhook'
+    rate = 5
+    burst = 10
+
+    def __init__(self, url: str, timeout: tuple = DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        if not url:
+            raise ValueError('webhook notification requires an url')
+        self.url = url
+        self.timeout = timeout
+
+    def connect(self):
+        return requests.Session()
+
+    def send(self, title, body, notifications):
+        data = {'title': title, 'body': body,
+                'matches': [{'headline': n.headline, 'when': n.when, 'link': n.link, 'start': n.start}
+                            for n in notifications]}
+        self.client.post(self.url, json=data, timeout=self.timeout).raise_for_status()
+
+
+BACKENDS = OrderedDict((cls.name, cls) for cls in (DesktopBackend, PushbulletBackend, WebhookBackend))
+
+
+def _batches(notifications: List[Notification]) -> List[List[Notification]]:
+    """group notifications of matches starting at the same time, in order of the first of every group"""
+    batches = OrderedDict()
+    for notification in notifications:
+        key = notification.start if notification.start is not None else id(notification)
+        batches.setdefault(key, []).append(notification)
+    return list(batches.values())
+
+
+class Dispatcher:
+    """
+    Sends notifications in the background, every backend has a worker thread fed by a bounded queue.
+    Notifications arriving within `batch_window` seconds of each other are batched by match start time.
+    Usage:
+        with Dispatcher([DesktopBackend()]) as dispatcher:
+            notification = dispatcher.submit(Notification('Navi vs OG', '5m', url, start), 'desktop')
+        notification.future.result()  # raises error of backend if sending failed
+    """
+    logger = logging.getLogger('ggmt.notifications')
+
+    def __init__(self, backends: Iterable[NotificationBackend], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_window: float = DEFAULT_BATCH_WINDOW):
+        """
+        :param backends: backends by their name, backend can be given only once
+        :param queue_size: notifications waiting for a backend, submit() blocks when queue is full
+        :param batch_window: seconds to wait for more notifications to batch with
+        """
+        self.backends = OrderedDict((backend.name, backend) for backend in backends)
+        self.queue_size = queue_size
+        self.batch_window = batch_window
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.workers = {}
+
+    def submit(self, notification: Notification, backend: str = DesktopBackend.name) -> Notification:
+        """
+        Queue notification, its future is resolved once it was sent
+        :param backend: name of backend to send it with
+        :returns: notification
+        """
+        if backend not in self.backends:
+            raise ValueError('unknown notification backend "{}"'.format(backend))
+        with self.lock:
+            if backend not in self.workers:
+                self.queues[backend] = queue.Queue(maxsize=self.queue_size)
+                worker = threading.Thread(target=self._work, args=(self.backends[backend], self.queues[backend]),
+                                          name='notify-{}'.format(backend), daemon=True)
+                self.workers[backend] = worker
+                worker.start()
+            notifications = self.queues[backend]
+        # blocks while queue is full, the lock is not held so other backends and close() aren't held up
+        notifications.put(notification)
+        return notification
+
+    def _collect(self, notifications: queue.Queue) -> Tuple[List[Notification], bool]:
+        """:returns: (batch of notifications, whether dispatcher is closing)"""
+        first = notifications.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                notification = notifications.get(timeout=remaining) if remaining > 0 else notifications.get_nowait()
+            except queue.Empty:
+                return batch, False
+            if notification is None:
+                return batch, True
+            batch.append(notification)
+
+    def _work(self, backend: NotificationBackend, notifications: queue.Queue):
+        limiter = RateLimiter(backend.rate, backend.burst)
+        closing = False
+        while not closing:
+            batch, closing = self._collect(notifications)
+            for group in _batches(batch):
+                limiter.wait()
+                self._send(backend, group)
+
+    def _send(self, backend: NotificationBackend, group: List[Notification]):
+        title, body = message(group)
+        self.logger.info('notifying via {}: {}'.format(backend.name, title))
+        try:
+            backend.open().send(title, body, group)
+        except Exception as e:
+            self.logger.error('failed to send notification "{}": {}'.format(title, e))
+            METRICS.inc('ggmt_notifications', backend=backend.name, result='failed')
+            for notification in group:
+                notification.future.set_exception(e)
+            return
+        METRICS.inc('ggmt_notifications', backend=backend.name, result='sent')
+        for notification in group:
+            notification.future.set_result(True)
+
+    def close(self):
+        """send all queued notifications and stop workers"""
+        with self.lock:
+            workers = list(self.workers.items())
+            self.workers = {}
+            for backend, _ in workers:
+                self.queues[backend].put(None)
+        for _, worker in workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
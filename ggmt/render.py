@@ -0,0 +1,52 @@
+import hashlib
+import logging
+import os
+from typing import Iterable
+
+from jinja2 import Environment, FileSystemBytecodeCache, FunctionLoader, Template
+
+from ggmt.metrics import METRICS
+from ggmt.settings import TEMPLATE_CACHE_LOCATION
+
+
+class Renderer:
+    """
+    Renders matches with jinja2 templates.
+    Templates are compiled once per process and their bytecode is cached on disk keyed by template hash,
+    so repeated runs with the same template skip compilation.
+    """
+    logger = logging.getLogger('ggmt.render')
+
+    def __init__(self, cache_location: str = TEMPLATE_CACHE_LOCATION, **globals):
+        """
+        :param cache_location: directory for compiled templates, None to disable on disk cache
+        :param globals: variables available to every template, e.g. colorama Fore and Back
+        """
+        self.sources = {}
+        bytecode_cache = None
+        if cache_location:
+            try:
+                os.makedirs(cache_location, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_location)
+            except OSError as e:
+                self.logger.warning('template cache disabled: {}'.format(e))
+        self.env = Environment(loader=FunctionLoader(self._load), bytecode_cache=bytecode_cache, auto_reload=False)
+        self.env.globals.update(globals)
+
+    def _load(self, name):
+        return self.sources[name], None, lambda: True
+
+    def template(self, source: str) -> Template:
+        """:returns: compiled template for template source"""
+        name = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        self.sources[name] = source
+        with METRICS.timer('ggmt_phase_seconds', phase='template'):
+            return self.env.get_template(name)
+
+    def render_many(self, template: Template, matches: Iterable) -> str:
+        """
+        Renders template for every match
+        :returns: rendered matches joined by new lines
+        """
+        with METRICS.timer('ggmt_phase_seconds', phase='render'):
+            return '\n'.join([template.render(match) for match in matches])
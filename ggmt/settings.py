@@ -0,0 +1,31 @@
+"""
+Lightweight constants shared by cli and downloaders.
+Kept free of third party imports so the cli can build its options without loading requests, parsel or jinja2.
+"""
+import os
+
+GOSUGAMERS_GAMES = [
+    'dota2',
+    'counterstrike',
+    'hearthstone',
+    'heroesofthestorm',
+    'lol',
+    'overwatch',
+    'starcraft2',
+    'all',
+]
+LIQUIPEDIA_GAMES = [
+    'dota2',
+    'counterstrike',
+    # 'hearthstone',
+    # 'heroesofthestorm',
+    'overwatch',
+    # 'starcraft2',
+    # 'all',
+]
+MAX_WORKERS = 8
+
+CACHE_LOCATION = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'ggmt')
+TEMPLATE_CACHE_LOCATION = os.path.join(CACHE_LOCATION, 'templates')
+CONFIG_LOCATION = os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'),
+                               'ggmt', 'daemon.json')
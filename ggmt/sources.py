@@ -0,0 +1,334 @@
+"""
+Registry of match sources.
+A game can be served by several sources which are queried in parallel, either the first good response wins
+or responses of all sources are merged. Latency and error stats of every source decide which one is asked first.
+Kept free of third party imports, sources import their downloaders when they are used.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, List, Tuple
+
+from ggmt import Match
+from ggmt.settings import CACHE_LOCATION, GOSUGAMERS_GAMES
+
+STATS_LOCATION = os.path.join(CACHE_LOCATION, 'sources.json')
+# matches of the same teams starting this many seconds apart are the same match listed by different sources
+DEDUPE_WINDOW = 1800
+DEFAULT_HEDGE_DELAY = 2
+MIN_HEDGE_DELAY = 0.05
+
+SOURCES = OrderedDict()  # name: MatchSource subclass
+
+
+def register(cls):
+    """class decorator adding MatchSource subclass to SOURCES"""
+    if not cls.name:
+        raise ValueError('source {} has no name'.format(cls.__name__))
+    SOURCES[cls.name] = cls
+    return cls
+
+
+def source_games(names: Iterable[str] = None) -> List[str]:
+    """:returns: games supported by any of the named sources, all registered sources by default"""
+    games = OrderedDict()
+    for name in names or SOURCES:
+        games.update(OrderedDict.fromkeys(SOURCES[name].games))
+    return list(games)
+
+
+class MatchSource:
+    """
+    Interface of match sources, see GosuSource.
+    Downloads raise OSError subclasses (e.g. ConnectionRefusedError) when the source is unavailable.
+    """
+    name = None
+    games = []
+
+    def __init__(self, cache=None, streams=None):
+        """
+        :param cache: HttpCache to serve responses from, None to always download
+        :param streams: StreamMemo of streams resolved by previous runs
+        """
+        self.cache = cache
+        self.streams = streams
+
+    def download_matches(self, game: str, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
+        """:returns: live and upcoming matches"""
+        raise NotImplementedError
+
+    def download_history(self, game: str, crawl_stream: bool = True, max_workers: int = None) -> List[Match]:
+        """:returns: recent matches"""
+        raise NotImplementedError
+
+    def resolve_stream(self, match: Match) -> str:
+        """:returns: stream url of live match or None"""
+        raise NotImplementedError
+
+
+@register
+class GosuSource(MatchSource):
+    """http://gosugamers.net match ticker, see GosuTicker"""
+    name = 'gosugamers'
+    games = GOSUGAMERS_GAMES
+
+    def ticker(self, game: str):
+        from ggmt.matchticker import GosuTicker
+        return GosuTicker(game, cache=self.cache, streams=self.streams)
+
+    def download_matches(self, game, crawl_stream=True, max_workers=None):
+        return self.ticker(game).download_matches(crawl_stream, max_workers=max_workers)
+
+    def download_history(self, game, crawl_stream=True, max_workers=None):
+        return self.ticker(game).download_history(crawl_stream, max_workers=max_workers)
+
+    def resolve_stream(self, match):
+        return self.ticker('all').find_stream(match)
+
+
+class SourceStats:
+    """
+    Exponentially weighted moving averages of latency and error rate of every source.
+    Can be persisted as json file so consecutive cli runs start with the fastest source too.
+    """
+
+    def __init__(self, location: str = None, alpha: float = 0.3):
+        """
+        :param location: json file to load from and save to, None to keep stats in memory only
+        :param alpha: weight of the newest sample
+        """
+        self.location = location
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.sources = {}  # name: {'latency': seconds, 'error_rate': 0..1, 'requests': count}
+        if location:
+            self.load()
+
+    def load(self):
+        """load stats file, missing or unreadable file is treated as no stats"""
+        try:
+            with open(self.location) as f:
+                sources = json.load(f)
+            self.sources = {name: {'latency': float(s['latency']), 'error_rate': float(s['error_rate']),
+                                   'requests': int(s['requests'])} for name, s in sources.items()}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            self.sources = {}
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.location))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f, self.lock:
+            json.dump(self.sources, f)
+        os.replace(tmp, self.location)
+
+    def record(self, name: str, latency: float, ok: bool):
+        with self.lock:
+            stats = self.sources.get(name)
+            if stats is None:
+                self.sources[name] = {'latency': latency, 'error_rate': 0.0 if ok else 1.0, 'requests': 1}
+                return
+            stats['latency'] += self.alpha * (latency - stats['latency'])
+            stats['error_rate'] += self.alpha * ((0.0 if ok else 1.0) - stats['error_rate'])
+            stats['requests'] += 1
+
+    def score(self, name: str) -> float:
+        """expected seconds until a good response, sources without stats score 0 so they get tried"""
+        stats = self.sources.get(name)
+        if stats is None:
+            return 0.0
+        return stats['latency'] / max(1 - stats['error_rate'], 0.05)
+
+    def hedge_delay(self, name: str) -> float:
+        """seconds to wait for the source before asking the next one too"""
+        stats = self.sources.get(name)
+        if stats is None:
+            return DEFAULT_HEDGE_DELAY
+        return max(stats['latency'] * 2, MIN_HEDGE_DELAY)
+
+
+def _teams(match: Match) -> frozenset:
+    return frozenset(match[key].strip().lower() for key in ('t1', 't2'))
+
+
+def merge_results(results: Iterable[Tuple[str, List[Match]]], window: int = DEDUPE_WINDOW) -> List[Match]:
+    """
+    Merge match lists of several sources.
+    Matches are duplicates if they have the same Match.id, or if they come from different sources and have
+    the same teams starting less than `window` seconds apart.
+    :param results: iterable of (source name, list of Match objects)
+    :returns: list of unique Match objects sorted by time_secs, earlier sources win
+    """
+    merged = []
+    ids = set()
+    teams = {}  # teams: list of (source name, Match)
+    for name, matches in results:
+        for match in matches:
+            if match.id in ids:
+                continue
+            key = _teams(match)
+            if any(other_name != name and abs(other['timestamp'] - match['timestamp']) < window
+                   for other_name, other in teams.get(key, [])):
+                continue
+            ids.add(match.id)
+            teams.setdefault(key, []).append((name, match))
+            merged.append(match)
+    return sorted(merged, key=lambda m: abs(int(m['time_secs'])))  # history has negative time_secs
+
+
+class Sources:
+    """
+    Match sources of games ordered by SourceStats.
+    With merge disabled the best source is asked first and the next one is asked too
+    if it fails, returns no matches or doesn't respond within its hedge delay; the first good response wins.
+    """
+    logger = logging.getLogger('sources')
+
+    def __init__(self, names: Iterable[str] = None, cache=None, streams=None, stats: SourceStats = None,
+                 merge: bool = False):
+        """
+        :param names: names of registered sources to use, all by default
+        :param cache: HttpCache shared by sources
+        :param streams: StreamMemo shared by sources
+        :param stats: SourceStats to record to and order by, in memory stats by default
+        :param merge: merge matches of all sources instead of using the first good response
+        """
+        names = list(names or SOURCES)
+        unknown = [name for name in names if name not in SOURCES]
+        if unknown:
+            raise NotImplementedError('unknown sources: {}'.format(', '.join(unknown)))
+        self.sources = [SOURCES[name](cache=cache, streams=streams) for name in names]
+        self.stats = stats or SourceStats()
+        self.merge = merge
+
+    @property
+    def games(self) -> List[str]:
+        return source_games(source.name for source in self.sources)
+
+    def for_game(self, game: str) -> List[MatchSource]:
+        """:returns: sources supporting game, best first"""
+        sources = [source for source in self.sources if game in source.games]
+        if not sources:
+            raise NotImplementedError('no source for game "{}"'.format(game))
+        return sorted(sources, key=lambda source: self.stats.score(source.name))
+
+    def _timed(self, source: MatchSource, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = getattr(source, method)(*args, **kwargs)
+        except Exception:
+            self.stats.record(source.name, time.perf_counter() - started, ok=False)
+            raise
+        self.stats.record(source.name, time.perf_counter() - started, ok=True)
+        return result
+
+    def _download(self, source: MatchSource, method: str, game: str, **kwargs) -> List[Match]:
+        matches = self._timed(source, method, game, **kwargs)
+        for match in matches:
+            match['provider'] = source.name
+        return matches
+
+    def _query(self, game: str, method: str, **kwargs) -> List[Tuple[str, List[Match]]]:
+        """:returns: list of (source name, matches) of the first good source or of all sources if merging"""
+        sources = self.for_game(game)
+        if len(sources) == 1:
+            return [(sources[0].name, self._download(sources[0], method, game, **kwargs))]
+        executor = ThreadPoolExecutor(max_workers=len(sources))
+        try:
+            if self.merge:
+                futures = [(s.name, executor.submit(self._download, s, method, game, **kwargs)) for s in sources]
+                return self._merge_futures(game, futures)
+            return self._first(game, sources, executor, method, **kwargs)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _merge_futures(self, game, futures):
+        results = []
+        error = None
+        for name, future in futures:
+            try:
+                results.append((name, future.result()))
+            except Exception as e:
+                self.logger.warning('source {} failed for {}: {}'.format(name, game, e))
+                error = e
+        if not results:
+            raise error
+        return results
+
+    def _first(self, game, sources, executor, method, **kwargs):
+        remaining = list(sources)
+        pending = {}  # future: source
+        empty = error = None
+        while True:
+            if remaining:
+                source = remaining.pop(0)
+                pending[executor.submit(self._download, source, method, game, **kwargs)] = source
+            if not pending:
+                if empty is not None:
+                    return [empty]
+                raise error
+            timeout = self.stats.hedge_delay(source.name) if remaining else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future).name
+                try:
+                    matches = future.result()
+                except Exception as e:
+                    self.logger.warning('source {} failed for {}: {}'.format(name, game, e))
+                    error = e
+                    continue
+                if matches:
+                    return [(name, matches)]
+                empty = empty or (name, matches)
+
+    def download(self, game: str, history: bool = False, crawl_stream: bool = True,
+                 max_workers: int = None) -> List[Match]:
+        """
+        :param history: download recent matches instead of live and upcoming ones
+        :returns: list of Match objects, in page order unless several sources are merged
+        :raises: error of the last source if every source failed
+        """
+        method = 'download_history' if history else 'download_matches'
+        results = self._query(game, method, crawl_stream=crawl_stream, max_workers=max_workers)
+        if len(results) == 1:
+            return results[0][1]
+        return merge_results(results)
+
+    def download_games(self, games: List[str], history: bool = False, crawl_stream: bool = True,
+                       max_workers: int = None) -> List[Match]:
+        """
+        Downloads matches of several games at once
+        :returns: list of Match objects of all games sorted by time_secs, in page order for single game
+        """
+        games = list(OrderedDict.fromkeys(games))
+        method = 'download_history' if history else 'download_matches'
+
+        def query(game):
+            return self._query(game, method, crawl_stream=crawl_stream, max_workers=max_workers)
+
+        if len(games) == 1:
+            results = query(games[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(games)) as executor:
+                results = [result for game_results in executor.map(query, games) for result in game_results]
+        if len(results) == 1:  # keep page order
+            return results[0][1]
+        return merge_results(results)
+
+    def resolve_stream(self, match: Match) -> str:
+        """:returns: stream found by the first source that has one"""
+        sources = sorted(self.sources, key=lambda source: self.stats.score(source.name))
+        for source in [s for s in sources if match.get('game') in s.games] or sources:
+            try:
+                stream = self._timed(source, 'resolve_stream', match)
+            except Exception as e:
+                self.logger.warning('source {} failed to resolve stream: {}'.format(source.name, e))
+                continue
+            if stream:
+                return stream
+        return None
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+import time
+
+from ggmt import Match
+from ggmt.settings import CACHE_LOCATION
+
+STREAMS_LOCATION = os.path.join(CACHE_LOCATION, 'streams.db')
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MISSING_TTL = 300
+
+
+class StreamMemo:
+    """
+    Stream urls of live matches resolved by previous runs, keyed by Match.id.
+    A live match keeps its stream for hours, so its match page only needs to be downloaded once.
+    Entries are valid only while the match is live: found streams for `ttl` seconds,
+    matches without english stream are looked up again after `missing_ttl` seconds in case one appears.
+    """
+
+    def __init__(self, location: str = STREAMS_LOCATION, ttl: int = DEFAULT_TTL,
+                 missing_ttl: int = DEFAULT_MISSING_TTL, refresh: bool = False):
+        """
+        :param location: sqlite database file, None to keep streams in memory only
+        :param ttl: seconds found streams are reused
+        :param missing_ttl: seconds a match without stream isn't looked up again
+        :param refresh: ignore remembered streams and resolve every stream again
+        """
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        if location:
+            os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+        self.db = sqlite3.connect(location or ':memory:', timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS streams (id TEXT PRIMARY KEY, stream TEXT, resolved REAL NOT NULL)')
+        self.db.execute('DELETE FROM streams WHERE resolved < ?', (time.time() - max(ttl, missing_ttl),))
+        self.entries = {row[0]: (row[1], row[2]) for row in self.db.execute('SELECT id, stream, resolved FROM streams')}
+
+    def get(self, match: Match):
+        """
+        :returns: tuple of (whether stream is remembered, stream url or None)
+        """
+        entry = self.entries.get(match.id)
+        if entry is None or self.refresh or match['time_secs']:
+            return False, None
+        stream, resolved = entry
+        if time.time() - resolved >= (self.ttl if stream else self.missing_ttl):
+            return False, None
+        return True, stream
+
+    def set(self, match: Match, stream: str):
+        """remember stream of live match, None if match has no stream"""
+        resolved = time.time()
+        with self.lock:
+            self.entries[match.id] = (stream, resolved)
+            self.db.execute('INSERT OR REPLACE INTO streams VALUES (?, ?, ?)', (match.id, stream, resolved))
+
+    def discard(self, match: Match):
+        """forget stream of match, e.g. because it is not live anymore"""
+        with self.lock:
+            if self.entries.pop(match.id, None) is not None:
+                self.db.execute('DELETE FROM streams WHERE id = ?', (match.id,))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.db.execute('DELETE FROM streams')
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
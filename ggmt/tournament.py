@@ -1,10 +1,19 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from urllib.parse import urljoin
 
-import requests
 import sys
 from parsel.selector import Selector
 
-from ggmt import Event
+from ggmt import Bracket, Event
+from ggmt.brackets import BracketCache, page_revision, parse_brackets
+from ggmt.cache import HttpCache, TOURNAMENT_INDEX, TOURNAMENT_PAGE
+from ggmt.flight import REQUESTS
+from ggmt.http import POLICY, HttpPolicy
+from ggmt.matchticker import mount_pool, shared_session
+from ggmt.metrics import METRICS
+from ggmt.settings import LIQUIPEDIA_GAMES, MAX_WORKERS
 
 EVENT_CURRENT = 'Ongoing'
 EVENT_PAST = 'Completed'
@@ -13,34 +22,67 @@ EVENT_FUTURE = 'Upcoming'
 
 class LiquidBracketDownloader:
     """Bracket downloader for brackets displayed on LiquidPedia"""
-    games = [
-        'dota2',
-        'counterstrike',
-        # 'hearthstone',
-        # 'heroesofthestorm',
-        'overwatch',
-        # 'starcraft2',
-        # 'all',
-    ]
-    url_base = 'http://wiki.teamliquid.net/'
-
-    def __init__(self, game):
+    games = LIQUIPEDIA_GAMES
+    url_base = os.environ.get('GGMT_LIQUIPEDIA_URL', 'http://wiki.teamliquid.net/')
+    max_workers = MAX_WORKERS
+
+    def __init__(self, game, cache: HttpCache = None, policy: HttpPolicy = POLICY, brackets: BracketCache = None):
+        """
+        :param cache: HttpCache to serve responses from, None to always download
+        :param policy: HttpPolicy of timeouts, retries and circuit breakers of requests
+        :param brackets: BracketCache of parsed brackets, kept in memory by default
+        """
         if game not in self.games:
             raise NotImplementedError(""""parser for game "{}" doesn't exist""".format(game))
         if game == 'all':
             game = ''
         self.game_url = self.url_base + game
+        self.session = shared_session()
+        self.cache = cache
+        self.policy = policy
+        self.brackets = brackets or BracketCache(location=None)
+        self._index = None
+
+    def _get(self, url, kind, **kwargs):
+        with METRICS.timer('ggmt_fetch_seconds', kind=kind):
+            return REQUESTS.do((url, kind), lambda: self._download(url, kind, **kwargs))
 
-    def find_tournaments(self, category=None):
+    def _selector(self, resp) -> Selector:
+        with METRICS.timer('ggmt_phase_seconds', phase='selector'):
+            return Selector(text=resp.text)
+
+    def _download(self, url, kind, **kwargs):
+        return self.policy.get(self.session, url, self.cache, kind, **kwargs)
+
+    def index(self) -> Selector:
+        """game page listing all tournaments, downloaded once per downloader"""
+        if self._index is None:
+            resp = self._get(self.game_url, TOURNAMENT_INDEX)
+            self._index = self._selector(resp)
+        return self._index
+
+    def find_tournaments(self, category=None, info=False, max_workers=None):
         """
         :param category: what category to show,
             choice from: EVENT_CURRENT[default], EVENT_PAST, EVENT_FUTURE
+        :param info: download event pages to fill in event['info'], see load_info
+        :return: list of Events
+        """
+        index = self.index()
+        with METRICS.timer('ggmt_phase_seconds', phase='tournaments_parse'):
+            ongoing = self.parse_tournaments(index, category)
+        if info:
+            self.load_info(ongoing, max_workers=max_workers)
+        return ongoing
+
+    def parse_tournaments(self, sel: Selector, category=None):
+        """
+        :param sel: game page listing all tournaments
+        :param category: see find_tournaments
         :return: list of Events
         """
         if category is None:
             category = EVENT_CURRENT
-        resp = requests.get(self.game_url)
-        sel = Selector(text=resp.text)
         ongoing_events = sel.xpath("//li[contains(text(),'{}')]/..//a".format(category))
         if not ongoing_events:
             ongoing_events = sel.xpath("//div[contains(text(),'COMPLETED')]"
@@ -51,47 +93,96 @@ class LiquidBracketDownloader:
             event['name'] = t.xpath('text()').extract_first('')
             event['date'] = t.xpath('small/text()').extract_first('').strip('()')
             event['url'] = urljoin(self.url_base, t.xpath('@href').extract_first(''))
-            resp = requests.get(event['url'])
-            sel = Selector(text=resp.text)
-            info = sel.xpath("//div[contains(@class,'infobox-header')][contains(text(), 'League Info')]/../..")
-            event['info'] = dict()
-            for node in info.xpath("//div[contains(@class,'infobox-description')]"):
-                title = node.xpath('text()').extract_first('').lower().strip(':')
-                value = ''.join(node.xpath('following-sibling::div//text()').extract()).strip()
-                url = node.xpath('following-sibling::div/a/@href').extract_first('')
-                event['info'][title] = {'value': value, 'url': urljoin(self.url_base, url)} if url else value
             ongoing.append(event)
         return ongoing
 
+    def find_all_tournaments(self, info=False, max_workers=None):
+        """
+        Past, current and future tournaments from a single download of the game page
+        :return: list of Events
+        """
+        events = []
+        for category in (EVENT_PAST, EVENT_CURRENT, EVENT_FUTURE):
+            events.extend(self.find_tournaments(category))
+        if info:
+            self.load_info(events, max_workers=max_workers)
+        return events
+
+    def find_info(self, url) -> dict:
+        """
+        Downloads event page and finds league information
+        :return: dict of title: value or title: {'value': value, 'url': url} for linked values
+        """
+        resp = self._get(url, TOURNAMENT_PAGE)
+        sel = self._selector(resp)
+        with METRICS.timer('ggmt_phase_seconds', phase='info_parse'):
+            return self.parse_info(sel)
+
+    def parse_info(self, sel: Selector) -> dict:
+        """
+        Finds league information in event page
+        :return: see find_info
+        """
+        info = sel.xpath("//div[contains(@class,'infobox-header')][contains(text(), 'League Info')]/../..")
+        found = dict()
+        for node in info.xpath("//div[contains(@class,'infobox-description')]"):
+            title = node.xpath('text()').extract_first('').lower().strip(':')
+            value = ''.join(node.xpath('following-sibling::div//text()').extract()).strip()
+            url = node.xpath('following-sibling::div/a/@href').extract_first('')
+            found[title] = {'value': value, 'url': urljoin(self.url_base, url)} if url else value
+        return found
+
+    def load_info(self, events, max_workers=None):
+        """
+        Populate event['info'] of Events, event pages are downloaded concurrently
+        :param max_workers: how many event pages to download at once
+        """
+        events = [e for e in events if 'info' not in e]
+        if not events:
+            return
+        max_workers = max(1, min(max_workers or self.max_workers, len(events)))
+        mount_pool(self.session, max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for event, info in zip(events, executor.map(self.find_info, [e['url'] for e in events])):
+                event['info'] = info
+
+    def find_brackets(self, url: str) -> List[Bracket]:
+        """
+        Downloads event page and finds its brackets.
+        Brackets are parsed once per page revision, unchanged pages are served from self.brackets.
+        :return: list of Bracket objects
+        """
+        resp = self._get(url, TOURNAMENT_PAGE)
+        if resp.status_code != 200:
+            raise ConnectionRefusedError('Got response error {}'.format(resp.status_code))
+        revision = page_revision(resp.content)
+        brackets = self.brackets.get(url, revision)
+        if brackets is None:
+            with METRICS.timer('ggmt_phase_seconds', phase='brackets_parse'):
+                brackets = parse_brackets(resp.content)
+            self.brackets.set(url, revision, brackets)
+        return brackets
+
     def download_brackets(self, url):
         """
         Experimental
-        Download and display brackets in the terminal
+        Download brackets to display in the terminal
+        :return: list of terminalbrackets.Bracket objects
         """
         try:
             from terminalbrackets import Team, Bracket
         except ImportError:
             sys.exit('For brackets functionality "terminalbrackets" package is required')
-        resp = requests.get(url)
-        sel = Selector(text=resp.text)
-
-        brackets = sel.css('.bracket-scroller')
         xtr_brackets = []
-        for bracket in brackets:
-            bracket_name = ''.join(bracket.xpath('../preceding-sibling::h3[1]//text()').extract())
-
-            rounds = bracket.css('.bracket-column-matches')
+        for bracket in self.find_brackets(url):
             xtr_rounds = []
-            for r in rounds:
-                teams = r.xpath('.//div[contains(@class,"bracket-cell")]')
+            for matches in bracket['rounds']:
                 xtr_teams = []
-                for t in teams:
-                    name = t.css('.team-template-team-bracket span::text').extract_first('')
-                    score = t.css('.bracket-score::text').extract_first(0)
-                    if name and score:
-                        xtr_teams.append(Team(name, score))
+                for match in matches:
+                    for key in ('t1', 't2'):
+                        # teams of matches that weren't played yet aren't displayed
+                        if match.get(key) and match.get(key + '_score'):
+                            xtr_teams.append(Team(match[key], match[key + '_score']))
                 xtr_rounds.append(xtr_teams)
-            xtr_brackets.append(Bracket(bracket_name, xtr_rounds))
-        print(xtr_brackets)
+            xtr_brackets.append(Bracket(bracket['name'], xtr_rounds))
         return xtr_brackets
-
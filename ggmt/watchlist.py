@@ -0,0 +1,152 @@
+"""
+Team watch lists: every match is checked against all rules in one pass.
+Exact team names and aliases are looked up by normalized name in a dict,
+regex patterns are compiled into a single alternation that is only expanded when it matches,
+except patterns with groups, whose numbers and backreferences would change in the alternation.
+"""
+import json
+import re
+from collections import OrderedDict
+from typing import Iterable, List
+
+from ggmt import Match
+
+DEFAULT_SECONDS = 900
+RE_NOT_ALNUM = re.compile(r'[\W_]+')
+
+
+def normalize_team(name: str) -> str:
+    """team name without case, whitespace and punctuation, e.g. "Na`Vi " -> "navi" """
+    return RE_NOT_ALNUM.sub('', name.casefold())
+
+
+class WatchRule:
+    """
+    Notify `seconds` before a match of a team starts.
+    Team is recognized by exact name or aliases (compared normalized) or by case insensitive regex pattern
+    matched at the start of team name.
+    """
+
+    def __init__(self, name: str, aliases: Iterable[str] = (), pattern: str = None,
+                 seconds: int = DEFAULT_SECONDS, game: str = None):
+        """
+        :param name: team name, also used to report the rule
+        :param game: game rule applies to, None for all games
+        """
+        self.name = name
+        self.aliases = list(aliases)
+        self.pattern = pattern
+        self.re_pattern = re.compile(pattern, flags=re.I) if pattern else None
+        self.seconds = seconds
+        self.game = game
+
+    @property
+    def names(self) -> List[str]:
+        return [self.name] + self.aliases
+
+    def matches(self, match: Match) -> bool:
+        teams = (match['t1'], match['t2'])
+        if self.re_pattern is not None and any(self.re_pattern.match(team) for team in teams):
+            return True
+        names = {normalize_team(name) for name in self.names}
+        return any(normalize_team(team) in names for team in teams)
+
+    def __repr__(self):
+        return 'WatchRule({!r}, pattern={!r}, seconds={}, game={!r})'.format(
+            self.name, self.pattern, self.seconds, self.game)
+
+
+class WatchList:
+    """Rules compiled for matching, separately for every game as rules can be limited to one"""
+
+    def __init__(self, rules: List[WatchRule]):
+        self.rules = list(rules)
+        self.order = {id(rule): i for i, rule in enumerate(self.rules)}
+        # game: (normalized name: rules, combined pattern, rules with patterns in it, rules with other patterns)
+        self.compiled = {}
+
+    def _compile(self, game: str):
+        compiled = self.compiled.get(game)
+        if compiled is not None:
+            return compiled
+        rules = [rule for rule in self.rules if rule.game is None or game is None or rule.game == game]
+        index = {}
+        for rule in rules:
+            for name in rule.names:
+                index.setdefault(normalize_team(name), []).append(rule)
+        patterns = [rule for rule in rules if rule.re_pattern is not None and not rule.re_pattern.groups]
+        separate = [rule for rule in rules if rule.re_pattern is not None and rule.re_pattern.groups]
+        combined = None
+        if patterns:
+            try:
+                combined = re.compile('|'.join('(?:{})'.format(rule.pattern) for rule in patterns), flags=re.I)
+            except re.error:  # e.g. clashing group names, patterns are tried one by one then
+                combined = None
+        compiled = self.compiled[game] = (index, combined, patterns, separate)
+        return compiled
+
+    def find(self, match: Match, game: str = None) -> List[WatchRule]:
+        """
+        :param game: game match belongs to, defaults to match['game']
+        :returns: rules matching either team of match in order of the list
+        """
+        index, combined, patterns, separate = self._compile(game or match.get('game'))
+        found = OrderedDict()
+        for team in (match['t1'], match['t2']):
+            for rule in index.get(normalize_team(team), ()):
+                found[id(rule)] = rule
+            # one regex call rules out all patterns, each pattern is tried only if one of them matched
+            if patterns and (combined is None or combined.match(team)):
+                for rule in patterns:
+                    if rule.re_pattern.match(team):
+                        found[id(rule)] = rule
+            for rule in separate:
+                if rule.re_pattern.match(team):
+                    found[id(rule)] = rule
+        return sorted(found.values(), key=lambda rule: self.order[id(rule)])
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def parse_watch_list(data, seconds: int = DEFAULT_SECONDS) -> WatchList:
+    """
+    Build WatchList from json data, e.g.:
+        {
+            "seconds": 900,
+            "teams": [
+                "OG",
+                {"name": "Natus Vincere", "aliases": ["na`vi", "navi"], "seconds": 1800},
+                {"name": "Liquid", "pattern": "team ?liquid", "game": "dota2", "seconds": 0}
+            ]
+        }
+    A plain list of teams is accepted too.
+    :param seconds: default threshold of teams without one, overridden by "seconds" of data
+    :raises ValueError: if data is malformed or a pattern is not a valid regex
+    """
+    if isinstance(data, dict):
+        seconds = int(data.get('seconds', seconds))
+        data = data.get('teams', [])
+    if not isinstance(data, list):
+        raise ValueError('watch list should be a list of teams')
+    rules = []
+    for team in data:
+        if isinstance(team, str):
+            team = {'name': team}
+        if not isinstance(team, dict) or not team.get('name'):
+            raise ValueError('team without name in watch list: {!r}'.format(team))
+        unknown = set(team) - {'name', 'aliases', 'pattern', 'seconds', 'game'}
+        if unknown:
+            raise ValueError('unknown keys {} of team "{}"'.format(', '.join(sorted(unknown)), team['name']))
+        try:
+            rules.append(WatchRule(team['name'], team.get('aliases', ()), team.get('pattern'),
+                                   int(team.get('seconds', seconds)), team.get('game')))
+        except re.error as e:
+            raise ValueError('invalid pattern of team "{}": {}'.format(team['name'], e))
+    return WatchList(rules)
+
+
+def load_watch_list(location: str, seconds: int = DEFAULT_SECONDS) -> WatchList:
+    """load json watch list file, see parse_watch_list"""
+    with open(location) as f:
+        return parse_watch_list(json.load(f), seconds)
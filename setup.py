@@ -13,9 +13,13 @@ setup(
         'click',
         'requests',
         'parsel',
+        'lxml',
         'jinja2',
         'colorama'
     ],
+    extras_require={
+        'async': ['httpx'],
+    },
     entry_points="""
         [console_scripts]
         ggmt=ggmt.cli:cli
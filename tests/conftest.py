@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from ggmt import Match
+from ggmt.flight import RESULTS
+from ggmt.http import POLICY, CircuitBreaker
+from ggmt.metrics import METRICS
+
+
+@pytest.fixture(autouse=True)
+def clear_results():
+    """parsed match lists are cached process wide, don't leak them between tests"""
+    RESULTS.clear()
+    yield
+    RESULTS.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_policy():
+    """circuit breakers and deadline of the process wide http policy are shared by all tests"""
+    yield
+    POLICY.breaker = CircuitBreaker()
+    POLICY.set_deadline(None)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """--profile and metrics export turn on per row timers of the process wide metrics"""
+    yield
+    METRICS.detailed = False
+
+
+@pytest.fixture(autouse=True)
+def archive_location(monkeypatch, tmp_path):
+    """commands archive downloaded matches, keep them out of the real archive"""
+    location = str(tmp_path / 'archive.db')
+    monkeypatch.setattr('ggmt.archive.ARCHIVE_LOCATION', location)
+    return location
+
+
+@pytest.fixture
+def make_match():
+    """
+    factory of Match objects, time_secs and timestamp are derived from each other relative to current time
+    unless both are given, other keys are passed as keyword arguments
+    """
+    def make(id='1', t1='a', t2='b', time_secs=None, timestamp=None, game='dota2', **fields):
+        now = int(time.time())
+        if timestamp is None:
+            time_secs = time_secs or 0
+            timestamp = now + time_secs
+        elif time_secs is None:
+            time_secs = timestamp - now
+        match = Match()
+        match.update_from({'id': id, 't1': t1, 't2': t2, 'time_secs': time_secs, 'timestamp': timestamp,
+                           't1_score': None, 't2_score': None, 'game': game,
+                           'url': 'http://www.gosugamers.net/{}/matches/{}'.format(game, id)})
+        match.update_from(fields)
+        return match
+    return make
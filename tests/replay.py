@@ -0,0 +1,165 @@
+"""
+Local stand-in for gosugamers and Liquipedia that replays recorded pages from tests/html.
+
+    with ReplayServer(gosugamers_routes()) as gosu, ReplayServer(liquipedia_routes()) as liquid:
+        GosuTicker.url_base = gosu.url
+        ...
+
+Command line tools are pointed to it through GGMT_GOSUGAMERS_URL and GGMT_LIQUIPEDIA_URL environment variables.
+Latency and errors can be injected to exercise timeouts and error handling.
+POST requests are recorded, so the server also stands in for notification webhooks.
+"""
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, List, Match, Tuple
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'html')
+
+# route handler gets path and regex match and returns (status, body) or None if fixture is missing
+Route = Tuple[str, Callable[[str, Match], Tuple[int, bytes]]]
+
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def _page(name: str):
+    def handle(path, found):
+        try:
+            return 200, fixture(name.format(*found.groups()))
+        except OSError:
+            return None
+    return handle
+
+
+def _match_detail(path, found):
+    return 200, fixture('match_detail.html').replace(b'{id}', found.group(1).encode('utf-8'))
+
+
+def gosugamers_routes() -> List[Route]:
+    """routes serving match lists of every recorded game, recent matches and match detail pages"""
+    return [
+        (r'/matches/(\d+)', _match_detail),
+        (r'^/[a-z0-9]*/?gosubet$', _page('match_all.html')),
+        (r'^/$', _page('match_all.html')),
+        (r'^/([a-z0-9]+)$', _page('match_{}.html')),
+    ]
+
+
+def liquipedia_routes() -> List[Route]:
+    """routes serving tournament index of dota2 and the same event page for every tournament"""
+    return [
+        (r'^/([a-z0-9]+)$', _page('liquipedia_{}.html')),
+        (r'^/[a-z0-9]+/.+', _page('liquipedia_event.html')),
+    ]
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    """threading http server, http.server.ThreadingHTTPServer is python 3.7+"""
+    daemon_threads = True
+
+
+class ReplayServer:
+    """
+    Threaded http server replaying fixtures, counts requests and bytes it served.
+    """
+
+    def __init__(self, routes: List[Route], latency: float = 0, errors: Dict[str, int] = None,
+                 error_rate: float = 0, seed: int = 0):
+        """
+        :param routes: list of (path regex, handler) tuples, first matching route is used
+        :param latency: seconds every response is delayed by
+        :param errors: {path regex: status code} of responses that should fail
+        :param error_rate: fraction of requests that randomly fail with 503
+        :param seed: seed of random failures so runs are repeatable
+        """
+        self.routes = [(re.compile(pattern), handler) for pattern, handler in routes]
+        self.latency = latency
+        self.errors = errors or {}
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+        self.server = _Server(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        self.thread = None
+
+    def reset(self):
+        """reset request statistics"""
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+            self.paths = []
+            self.posts = []  # (path, body) of POST requests
+
+    def respond(self, path: str) -> Tuple[int, bytes]:
+        """:returns: (status code, body) for request path"""
+        path = path.split('?', 1)[0]
+        for pattern, status in self.errors.items():
+            if re.search(pattern, path):
+                return status, b''
+        with self.lock:
+            failed = self.error_rate and self.random.random() < self.error_rate
+        if failed:
+            return 503, b''
+        for pattern, handler in self.routes:
+            found = pattern.search(path)
+            if found:
+                response = handler(path, found)
+                if response is not None:
+                    return response
+        return 404, b''
+
+    def _handler(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                """webhook stand-in: request bodies are recorded and answered like GET requests"""
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with replay.lock:
+                    replay.posts.append((self.path, body))
+                self.do_GET()
+
+            def do_GET(self):
+                if replay.latency:
+                    time.sleep(replay.latency)
+                status, body = replay.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with replay.lock:
+                    replay.requests += 1
+                    replay.bytes += len(body)
+                    replay.paths.append(self.path)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'ReplayServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
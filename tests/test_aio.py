@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+
+from ggmt.http import CircuitBreaker, CircuitOpen, HttpPolicy
+from ggmt.matchticker import GosuTicker
+from ggmt.tournament import LiquidBracketDownloader
+from tests.replay import ReplayServer, gosugamers_routes, liquipedia_routes
+
+pytest.importorskip('httpx')
+
+from ggmt.aio import AsyncFetcher, AsyncGosuTicker, AsyncLiquidBracketDownloader, download_games  # noqa: E402
+
+
+def _without_timestamp(matches):
+    """timestamp depends on when the page was parsed"""
+    return [{k: v for k, v in m.items() if k != 'timestamp'} for m in matches]
+
+
+@pytest.fixture
+def gosu(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        yield server
+
+
+def test_download_matches(gosu):
+    expected = GosuTicker('dota2').download_matches()
+    gosu.reset()
+
+    async def download():
+        async with AsyncFetcher() as fetcher:
+            return await AsyncGosuTicker('dota2', fetcher=fetcher).download_matches()
+
+    assert _without_timestamp(asyncio.run(download())) == _without_timestamp(expected)
+    assert gosu.requests == 1 + len([m for m in expected if not m['time_secs']])
+
+
+def test_blocking_only():
+    ticker = AsyncGosuTicker('dota2', fetcher=object())
+    for method in (ticker.download_changes, ticker.iter_matches):
+        with pytest.raises(NotImplementedError):
+            method()
+    with pytest.raises(NotImplementedError):
+        ticker.iter_match_streams([])
+
+
+def test_download_games_default_fetcher(gosu):
+    async def download():
+        return await download_games(['dota2', 'counterstrike', 'dota2'])
+
+    matches = asyncio.run(download())
+    assert {m['source'] for m in matches} == {'dota2', 'counterstrike'}
+    assert [m['time_secs'] for m in matches] == sorted(m['time_secs'] for m in matches)
+
+
+def test_per_host_limit(gosu):
+    gosu.latency = 0.05
+    active = peak = 0
+
+    async def download():
+        async with AsyncFetcher(per_host=2) as fetcher:
+            get = fetcher.client.get
+
+            async def counting_get(url, **kwargs):
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                try:
+                    return await get(url, **kwargs)
+                finally:
+                    active -= 1
+
+            fetcher.client.get = counting_get
+            await asyncio.gather(*[AsyncGosuTicker(g, fetcher=fetcher).download_matches()
+                                   for g in ('dota2', 'lol', 'counterstrike')])
+
+    asyncio.run(download())
+    assert peak == 2
+
+
+def test_policy():
+    with ReplayServer([(r'.*', lambda path, found: (503, b''))]) as server:
+        policy = HttpPolicy(retries=1, backoff=0.01, breaker=CircuitBreaker(threshold=1))
+
+        async def download():
+            async with AsyncFetcher(policy=policy) as fetcher:
+                with pytest.raises(ConnectionRefusedError):
+                    await fetcher.get_ok(server.url + 'a')
+                assert server.requests == 2
+                with pytest.raises(CircuitOpen):
+                    await fetcher.get(server.url + 'a')
+                assert server.requests == 2
+
+        asyncio.run(download())
+
+
+def test_cancellation(gosu):
+    gosu.latency = 2
+
+    async def download():
+        async with AsyncFetcher() as fetcher:
+            task = asyncio.ensure_future(AsyncGosuTicker('dota2', fetcher=fetcher).download_matches())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    started = time.perf_counter()
+    asyncio.run(download())
+    assert time.perf_counter() - started < 1
+
+
+def test_tournaments(monkeypatch):
+    with ReplayServer(liquipedia_routes()) as server:
+        monkeypatch.setattr(LiquidBracketDownloader, 'url_base', server.url)
+        expected = LiquidBracketDownloader('dota2').find_all_tournaments(info=True)
+        server.reset()
+
+        async def download():
+            async with AsyncFetcher() as fetcher:
+                return await AsyncLiquidBracketDownloader('dota2', fetcher=fetcher).find_all_tournaments(info=True)
+
+        assert asyncio.run(download()) == expected
+        assert server.requests == 1 + len(expected)
+
+
+def test_brackets(monkeypatch):
+    with ReplayServer(liquipedia_routes()) as server:
+        monkeypatch.setattr(LiquidBracketDownloader, 'url_base', server.url)
+        url = server.url + 'dota2/Kiev_Major/2017'
+        expected = LiquidBracketDownloader('dota2').find_brackets(url)
+        server.reset()
+
+        async def download():
+            async with AsyncLiquidBracketDownloader('dota2') as downloader:
+                brackets = await downloader.find_brackets(url)
+                assert await downloader.find_brackets(url) == brackets  # same revision is parsed once
+                with pytest.raises(NotImplementedError):
+                    downloader.download_brackets(url)
+                fetcher = downloader.fetcher
+            assert fetcher.client.is_closed  # fetcher created by downloader is closed with it
+            return brackets
+
+        assert asyncio.run(download()) == expected
+        assert server.requests == 2
+
+
+def test_max_workers(gosu):
+    gosu.latency = 0.05
+    peak = active = 0
+
+    async def download():
+        async with AsyncGosuTicker('dota2') as ticker:
+            find_stream = ticker.find_stream
+
+            async def counting_find_stream(match):
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                try:
+                    return await find_stream(match)
+                finally:
+                    active -= 1
+
+            ticker.find_stream = counting_find_stream
+            return await ticker.download_matches(max_workers=1)
+
+    assert len([m for m in asyncio.run(download()) if not m['time_secs']]) > 1
+    assert peak == 1
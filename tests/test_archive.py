@@ -0,0 +1,51 @@
+import time
+
+from ggmt import Match
+from ggmt.archive import Archive
+
+NOW = int(time.time())
+
+
+def test_add_and_dedupe(tmp_path, make_match):
+    location = str(tmp_path / 'archive.db')
+    with Archive(location) as archive:
+        archive.add([make_match('1', 'OG', 'Secret', timestamp=NOW - 600)])
+        # same match seen again: live, then finished in match history
+        archive.add([make_match('1', 'OG', 'Secret', timestamp=NOW)])
+        archive.add([make_match('1', 'OG', 'Secret', t1_score='2', t2_score='1', timestamp=NOW + 60)], finished=True)
+        assert len(archive) == 1
+    with Archive(location) as archive:
+        match, = archive.query('og')
+        assert (match['t1_score'], match['t2_score'], match['timestamp']) == ('2', '1', NOW - 600)
+        assert isinstance(match, Match)
+
+
+def test_queries(make_match):
+    archive = Archive(location=None)
+    archive.add([
+        make_match('1', 'OG', 'Secret', t1_score='2', t2_score='1', timestamp=NOW - 3 * 86400),
+        make_match('2', 'Secret', 'OG', t1_score='2', t2_score='0', timestamp=NOW - 2 * 86400),
+        make_match('3', 'OG', 'VP', t1_score='1', t2_score='1', timestamp=NOW - 86400),
+        make_match('4', 'OG', 'Liquid', t1_score='2', t2_score='0', timestamp=NOW - 3600, game='counterstrike'),
+    ], finished=True)
+    archive.add([make_match('5', 'OG', 'Secret', timestamp=NOW + 3600)])
+
+    assert [m['id'] for m in archive.query('og', finished=True)] == ['4', '3', '2', '1']
+    assert [m['id'] for m in archive.query('OG', 'secret')] == ['5', '2', '1']
+    assert [m['id'] for m in archive.query('og', limit=2)] == ['5', '4']
+    assert [m['id'] for m in archive.query(game='dota2', since=NOW - 2 * 86400, until=NOW)] == ['3', '2']
+    assert archive.win_rate('og') == {'played': 4, 'won': 2, 'lost': 1, 'draws': 1, 'rate': 0.5}
+    assert archive.win_rate('og', 'secret')['rate'] == 0.5
+    assert archive.win_rate('nobody')['rate'] is None
+
+
+def test_compact(make_match):
+    archive = Archive(location=None)
+    archive.add([make_match('1', 'OG', 'Secret', t1_score='2', t2_score='1', timestamp=NOW - 30 * 86400)],
+                finished=True)
+    archive.add([make_match('2', 'OG', 'Secret', timestamp=NOW - 30 * 86400)])  # never seen finished
+    # teams of upcoming match were announced later
+    archive.add([make_match('3', 'TBD', 'Secret', timestamp=NOW + 3600)])
+    archive.add([make_match('3', 'OG', 'Secret', timestamp=NOW + 3600)])
+    assert archive.compact() == 2
+    assert sorted(m.id for m in archive.query()) == ['1_OG_Secret', '3_OG_Secret']
@@ -0,0 +1,117 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from ggmt.cache import HttpCache, MATCH_LIST
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.headers.get('If-None-Match'))
+        if self.path == '/missing':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = 'page {}'.format(self.path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpCache:
+    def setup_method(self):
+        _Handler.hits = []
+        self.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fresh_and_revalidate(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        assert cache.get(session, self.url + 'a', MATCH_LIST).text == 'page /a'
+        assert cache.get(session, self.url + 'a', MATCH_LIST).text == 'page /a'
+        assert _Handler.hits == [None]
+        cache.ttl = 0
+        resp = cache.get(session, self.url + 'a', MATCH_LIST)
+        assert resp.status_code == 200 and resp.text == 'page /a'
+        assert _Handler.hits == [None, '"v1"']
+
+    def test_lru_eviction(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60, max_size=1)
+        cache.get(session, self.url + 'a', MATCH_LIST)
+        cache.get(session, self.url + 'b', MATCH_LIST)
+        entries = [f for f in os.listdir(str(tmpdir)) if not f.endswith('.lock')]
+        assert entries == []
+        cache.max_size = 10 ** 6
+        cache.get(session, self.url + 'a', MATCH_LIST)
+        cache.get(session, self.url + 'b', MATCH_LIST)
+        os.utime(cache._path(self.url + 'a'), (0, 0))
+        cache.max_size = os.path.getsize(cache._path(self.url + 'b'))
+        cache.evict()
+        assert not os.path.exists(cache._path(self.url + 'a'))
+        assert os.path.exists(cache._path(self.url + 'b'))
+
+    def test_stream_cached_page(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        b''.join(cache.get(session, self.url + 'a', MATCH_LIST, stream=True).iter_content(8192))
+        resp = cache.get(session, self.url + 'a', MATCH_LIST, stream=True)
+        assert _Handler.hits == [None]
+        assert b''.join(resp.iter_content(8192)) == b'page /a'
+
+    def test_stream_miss_is_cached(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        resp = cache.get(session, self.url + 'a', MATCH_LIST, stream=True)
+        assert not os.path.exists(cache._path(self.url + 'a'))  # nothing is read before iterating
+        assert b''.join(resp.iter_content(2)) == b'page /a'
+        assert cache.get(session, self.url + 'a', MATCH_LIST).text == 'page /a'
+        assert _Handler.hits == [None]
+
+    def test_stream_miss_is_downloaded_once(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        resp = cache.get(session, self.url + 'a', MATCH_LIST, stream=True)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(
+            cache.get(requests.session(), self.url + 'a', MATCH_LIST).text))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()  # waits for the body of the first download
+        assert b''.join(resp.iter_content(2)) == b'page /a'
+        thread.join()
+        assert other == ['page /a']
+        assert _Handler.hits == [None]
+
+    def test_stream_closed_releases_lock(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        cache.get(session, self.url + 'a', MATCH_LIST, stream=True).close()
+        assert cache.get(session, self.url + 'a', MATCH_LIST).text == 'page /a'
+        assert _Handler.hits == [None, None]
+
+    def test_error_leaves_no_lock_file(self, tmpdir):
+        session = requests.session()
+        cache = HttpCache(str(tmpdir), ttl=60)
+        assert cache.get(session, self.url + 'missing', MATCH_LIST).status_code == 404
+        assert cache.get(session, self.url + 'missing', MATCH_LIST, stream=True).status_code == 404
+        assert os.listdir(str(tmpdir)) == []
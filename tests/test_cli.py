@@ -0,0 +1,138 @@
+import json
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from ggmt import cli as ggmt_cli
+from ggmt.history import History
+from ggmt.matchticker import GosuTicker
+from ggmt.tournament import LiquidBracketDownloader
+from tests.replay import ReplayServer, gosugamers_routes, liquipedia_routes
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as gosu, ReplayServer(liquipedia_routes()) as liquid:
+        monkeypatch.setattr(GosuTicker, 'url_base', gosu.url)
+        monkeypatch.setattr(LiquidBracketDownloader, 'url_base', liquid.url)
+        yield gosu, liquid
+
+
+def test_lazy_imports():
+    code = ("import sys; from ggmt.cli import cli; sys.argv = ['ggmt', 'tick', '--help']\n"
+            "try:\n    cli()\nexcept SystemExit:\n    pass\n"
+            "print(' '.join(m for m in ('requests', 'parsel', 'lxml', 'jinja2', 'colorama', 'ggmt.metrics')"
+            " if m in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+    assert output.splitlines()[-1] == ''
+
+
+def invoke(*args, **kwargs):
+    result = CliRunner().invoke(ggmt_cli.cli, ['--no-cache'] + list(args), catch_exceptions=False, **kwargs)
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_tick(servers):
+    gosu, _ = servers
+    matches = json.loads(invoke('tick', 'dota2', '--json').output)
+    assert matches
+    live = [m for m in matches if m['time_secs'] == 0]
+    assert live and all(m['stream'] == 'http://twitch.tv/en_{}'.format(m['id']) for m in live)
+    # match list and one detail page per live match
+    assert gosu.requests == 1 + len(live)
+
+
+def test_tick_detail_errors(servers):
+    gosu, _ = servers
+    gosu.errors = {r'/matches/': 500}
+    matches = json.loads(invoke('tick', 'dota2', '--json').output)
+    assert matches and not any(m.get('stream') for m in matches)
+
+
+def test_recap(servers):
+    output = invoke('recap', 'dota2', '-nc').output
+    assert output.strip()
+
+
+def test_watch_print(servers):
+    output = invoke('watch', 'dota2', '--print', input='0\n').output
+    assert output.strip().endswith('http://twitch.tv/en_165637')
+
+
+def test_notify(servers, monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr('ggmt.notifications.notify_send', lambda title, body, env=None: sent.append((title, body)))
+    monkeypatch.setattr('ggmt.history.History', lambda: History(str(tmp_path / 'history.db'), legacy_location=None))
+    assert invoke('notify', 'dota2', '.').output == ''  # nothing for cron to mail
+    assert sent
+    invoke('notify', 'dota2', '.')
+    assert len(sent) == len(set(sent))
+
+
+def test_notify_watch_list(servers, monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr('ggmt.notifications.notify_send', lambda title, body, env=None: sent.append((title, body)))
+    monkeypatch.setattr('ggmt.history.History', lambda: History(str(tmp_path / 'history.db'), legacy_location=None))
+    watch_list = tmp_path / 'teams.json'
+    watch_list.write_text(json.dumps({'teams': [{'name': 'Nobody', 'aliases': ['no one']},
+                                                {'name': 'Anyone', 'pattern': '.', 'seconds': 10 ** 9}]}))
+    lines = invoke('notify', 'dota2', '-w', str(watch_list), '--verbose').output.splitlines()
+    assert sent and all(line.endswith('(watching Anyone)') for line in lines)
+    # matches starting at the same time are sent as one message
+    assert len(sent) < len(lines)
+    titles = ' '.join(title for title, _ in sent)
+    assert all(line.split(' in ')[0] in titles for line in lines)
+    watch_list.write_text('[{"name": "broken", "pattern": "("}]')
+    result = CliRunner().invoke(ggmt_cli.cli, ['--no-cache', 'notify', 'dota2', '-w', str(watch_list)])
+    assert result.exit_code != 0 and 'invalid pattern' in result.output
+
+
+def test_profile(servers):
+    result = invoke('--profile', 'tick', 'dota2')
+    assert 'fetch match_list' in result.stderr
+    assert 'row_parse dota2' in result.stderr
+    assert 'phase render' in result.stderr
+    assert 'http_requests' in result.stderr
+    assert 'fetch' not in invoke('tick', 'dota2').stderr
+
+
+def test_tournament(servers):
+    _, liquid = servers
+    events = json.loads(invoke('tournament', 'dota2', '--json').output)
+    assert events and all('info' in e for e in events)
+    assert liquid.requests == 1 + len(events)
+
+
+def test_tick_changes(servers, monkeypatch, tmp_path):
+    monkeypatch.setattr('ggmt.diff.SNAPSHOT_LOCATION', str(tmp_path))
+    changes = [json.loads(line) for line in invoke('tick', 'dota2', 'all', '--changes').output.splitlines()]
+    assert changes and all(c['change'] == 'added' for c in changes)
+    assert len({c['match']['id'] for c in changes}) == len(changes)
+    assert invoke('tick', 'dota2', 'all', '--changes').output == ''
+
+
+def test_stream_then_query(servers):
+    # streamed matches are archived after they were printed, colors must not leak into the archive
+    invoke('tick', 'dota2', '--stream')
+    invoke('recap', 'dota2', '--stream')
+    matches = json.loads(invoke('query', '--all', '--json', '-n', '1000').output)['matches']
+    assert matches and not any('\x1b' in str(value) for m in matches for value in m.values())
+    team = [m for m in matches if m['time_secs'] == 0][0]['t1']
+    result = json.loads(invoke('query', team, '--all', '--json').output)
+    assert result['matches'] and all(team in (m['t1'], m['t2']) for m in result['matches'])
+
+
+def test_query(servers):
+    recent = json.loads(invoke('recap', 'all', '--json').output)
+    gosu, _ = servers
+    gosu.reset()
+    team = recent[0]['t1']
+    result = json.loads(invoke('query', team, '--json').output)
+    assert [m['id'] for m in result['matches']] == [m['id'] for m in recent if team in (m['t1'], m['t2'])]
+    assert result['results']['played'] == len(result['matches'])
+    output = invoke('query', team.upper(), '--compact').output
+    assert '{}: {} played'.format(team.upper(), len(result['matches'])) in output
+    assert gosu.requests == 0
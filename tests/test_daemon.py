@@ -0,0 +1,40 @@
+import time
+
+from ggmt.daemon import Daemon, Rule
+from ggmt.history import History
+
+
+class _Ticker:
+    def __init__(self, matches):
+        self.matches = matches
+        self.calls = 0
+
+    def download_matches(self, **kwargs):
+        self.calls += 1
+        return self.matches
+
+
+class TestDaemon:
+    def test_poll_schedules_notifications(self, tmpdir, monkeypatch, make_match):
+        sent = []
+        monkeypatch.setattr('ggmt.notifications.notify_send', lambda title, body, env=None: sent.append(title))
+        rules = [Rule('dota2', 'navi', seconds=600), Rule('dota2', 'liquid', seconds=0)]
+        history = History(str(tmpdir.join('history.db')), legacy_location=None)
+        daemon = Daemon({'dota2': 300}, rules, history=history, metrics_location=str(tmpdir.join('ggmt.prom')))
+        ticker = _Ticker([make_match('1', 'Navi', 'OG', 300), make_match('2', 'Liquid', 'VP', 3600),
+                          make_match('3', 'EG', 'Secret', 0)])
+        daemon.tickers['dota2'] = ticker
+        daemon.poll('dota2')
+        assert ticker.calls == 1  # one download for all rules of the game
+        assert 'ggmt_polls_total{game="dota2",result="ok"}' in tmpdir.join('ggmt.prom').read()
+        assert len(daemon.scheduled) == 2
+        daemon.scheduler.run(blocking=False)
+        daemon.flush()  # notifications are sent in the background
+        assert sent == ['Navi vs OG in 5m']
+        assert '1_Navi_OG' in history
+        liquid = daemon.scheduled[('2_Liquid_VP', 1)]
+        assert abs(liquid.time - (time.time() + 3600)) < 5
+        # repeated poll reschedules instead of duplicating
+        daemon.poll('dota2')
+        assert len(daemon.scheduled) == 1
+        history.close()
@@ -0,0 +1,43 @@
+from ggmt.diff import ADDED, REMOVED, WENT_LIVE, SCORE_CHANGED, STREAM_APPEARED, Snapshot, diff_matches
+from ggmt.matchticker import GosuTicker
+from tests.replay import ReplayServer, gosugamers_routes
+
+
+def _kinds(changes):
+    return [(c['change'], c['match']['id']) for c in changes]
+
+
+def test_diff_matches(make_match):
+    previous = {m.id: m for m in [make_match('1', time_secs=3600), make_match('2'), make_match('3', time_secs=3600)]}
+    current = [make_match('1', time_secs=0, stream='http://twitch.tv/x'), make_match('2', t1_score='1'),
+               make_match('4', time_secs=3600)]
+    changes = diff_matches(previous, current)
+    assert _kinds(changes) == [(WENT_LIVE, '1'), (STREAM_APPEARED, '1'), (SCORE_CHANGED, '2'),
+                               (ADDED, '4'), (REMOVED, '3')]
+    assert changes[2]['previous']['t1_score'] is None
+    assert 'previous' not in changes[3]
+    assert diff_matches({m.id: m for m in current}, current) == []
+
+
+def test_snapshot_persisted(tmp_path, make_match):
+    snapshot = Snapshot.for_game('dota2', str(tmp_path))
+    assert _kinds(snapshot.update([make_match('1', time_secs=3600)])) == [(ADDED, '1')]
+    snapshot = Snapshot.for_game('dota2', str(tmp_path))
+    assert _kinds(snapshot.update([make_match('1', time_secs=0)])) == [(WENT_LIVE, '1')]
+    (tmp_path / 'dota2.json').write_text('broken')
+    assert Snapshot.for_game('dota2', str(tmp_path)).matches == {}
+
+
+def test_download_changes(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        ticker = GosuTicker('dota2', results=None)
+        changes = ticker.download_changes()
+        live = [c['match'] for c in changes if not c['match']['time_secs']]
+        assert live and {c['change'] for c in changes} == {ADDED}
+        assert server.requests == 1 + len(live)
+
+        # streams of matches that are still live are reused
+        server.reset()
+        assert ticker.download_changes() == []
+        assert server.requests == 1
@@ -0,0 +1,41 @@
+import json
+import os
+
+import pkg_resources
+from parsel import Selector
+
+from ggmt.export import export, load_manifest
+from ggmt.matchticker import GosuTicker
+from ggmt.render import Renderer
+
+
+class TestExport:
+    def test_export(self, tmpdir, monkeypatch):
+        calls = []
+
+        def download_each(games, history=False, **kwargs):
+            calls.append((sorted(set(games)), history))
+            results = {}
+            for game in games:
+                data = pkg_resources.resource_string('tests', f'/html/match_{game}.html').decode('utf-8')
+                results[game] = list(GosuTicker(game).find_matches(Selector(text=data)))
+            return results
+
+        monkeypatch.setattr('ggmt.export.download_each', download_each)
+        tmpdir.join('page.html').write('{% for m in matches %}<li>{{m.t1}} vs {{m.t2}}</li>{% endfor %}')
+        tmpdir.join('manifest.json').write(json.dumps([
+            {'games': ['dota2', 'counterstrike'], 'template': 'page.html', 'output': 'out/all.html'},
+            {'games': 'dota2', 'template': '{{t1}}', 'inline': True, 'per_match': True, 'output': 'out/dota2.txt'},
+        ]))
+        outputs = load_manifest(str(tmpdir.join('manifest.json')))
+        written = export(outputs, renderer=Renderer(None))
+        assert calls == [(['counterstrike', 'dota2'], False)]  # every game downloaded once
+        assert [changed for _, changed in written] == [True, True]
+        assert tmpdir.join('out', 'all.html').read().count('<li>') == 24
+        assert tmpdir.join('out', 'dota2.txt').read().splitlines()[0] == 'WG.Y'
+
+        os.utime(str(tmpdir.join('out', 'all.html')), (0, 0))
+        written = export(outputs, renderer=Renderer(None))
+        assert [changed for _, changed in written] == [False, False]
+        assert os.path.getmtime(str(tmpdir.join('out', 'all.html'))) == 0
+        assert sorted(os.listdir(str(tmpdir.join('out')))) == ['all.html', 'dota2.txt']
@@ -0,0 +1,64 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ggmt.flight import RESULTS, ResultCache, SingleFlight
+from ggmt.matchticker import GosuTicker
+from tests.replay import ReplayServer, gosugamers_routes
+
+
+def test_single_flight():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(5) as executor:
+        futures = [executor.submit(flight.do, 'key', slow) for _ in range(5)]
+        while flight.coalesced < 4:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result() for f in futures] == ['result'] * 5
+    assert len(calls) == 1
+    assert flight.calls == {}
+
+
+def test_single_flight_error():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.do('key', lambda: 1) == 1
+
+
+def test_result_cache():
+    cache = ResultCache(ttl=60, max_entries=2)
+    assert cache.get('a', lambda: 1) == 1
+    assert cache.get('a', lambda: 2) == 1
+    cache.get('b', lambda: 1)
+    cache.get('c', lambda: 1)
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'coalesced': 0, 'entries': 2}
+    cache.ttl = 0
+    assert cache.get('d', lambda: 1) == 1
+    assert cache.get('d', lambda: 2) == 2
+
+
+def test_ticker_burst(monkeypatch):
+    with ReplayServer(gosugamers_routes(), latency=0.1) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        misses = RESULTS.stats()['misses']
+        with ThreadPoolExecutor(10) as executor:
+            results = list(executor.map(lambda _: GosuTicker('dota2').download_matches(), range(10)))
+        live = [m for m in results[0] if not m['time_secs']]
+        assert live and server.requests == 1 + len(live)
+        assert all(r == results[0] for r in results)
+        # every caller gets its own matches
+        results[0][0]['t1'] = 'changed'
+        assert GosuTicker('dota2').download_matches()[0]['t1'] != 'changed'
+        assert RESULTS.stats()['misses'] == misses + 1
@@ -0,0 +1,52 @@
+import os
+import threading
+
+from ggmt.history import History
+
+
+class TestHistory:
+    def test_membership(self, tmpdir):
+        history = History(str(tmpdir.join('history.db')), legacy_location=None)
+        history.add('165637_WG.Y_XctN')
+        assert '165637_WG.Y_XctN' in history
+        assert '165637_WG.Y' not in history  # no substring matches
+        history.close()
+        with History(str(tmpdir.join('history.db')), legacy_location=None) as history:
+            assert '165637_WG.Y_XctN' in history
+
+    def test_legacy_import(self, tmpdir):
+        legacy = tmpdir.join('ggmt_history')
+        legacy.write('1_a_b\n2_c_d\n\n')
+        with History(str(tmpdir.join('history.db')), legacy_location=str(legacy)) as history:
+            assert len(history) == 2
+            assert '2_c_d' in history
+        legacy.write('3_e_f\n')
+        with History(str(tmpdir.join('history.db')), legacy_location=str(legacy)) as history:
+            assert '3_e_f' not in history  # imported only once
+
+    def test_prune(self, tmpdir):
+        with History(str(tmpdir.join('history.db')), legacy_location=None) as history:
+            for i in range(10):
+                history.add(str(i))
+            history.prune(max_count=3)
+            assert len(history) == 3
+            history.prune(max_age=-1)
+            assert len(history) == 0
+
+    def test_concurrent_writers(self, tmpdir):
+        location = str(tmpdir.join('history.db'))
+        History(location, legacy_location=None).close()
+
+        def write(n):
+            with History(location, legacy_location=None) as history:
+                for i in range(50):
+                    history.add('{}_{}'.format(n, i))
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with History(location, legacy_location=None) as history:
+            assert len(history) == 200
+        assert os.path.exists(location)
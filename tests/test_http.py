@@ -0,0 +1,111 @@
+import time
+
+import pytest
+import requests
+
+from ggmt.cache import HttpCache, MATCH_LIST
+from ggmt.http import CircuitBreaker, CircuitOpen, DeadlineExceeded, HttpPolicy
+from tests.replay import ReplayServer
+
+
+def _flaky(failures):
+    """route failing with 503 `failures` times before responding"""
+    calls = []
+
+    def handle(path, found):
+        calls.append(path)
+        if len(calls) <= failures:
+            return 503, b''
+        return 200, 'page {}'.format(path).encode('utf-8')
+    return [(r'.*', handle)]
+
+
+def _policy(**kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return HttpPolicy(**kwargs)
+
+
+def test_retries():
+    with ReplayServer(_flaky(2)) as server:
+        resp = _policy().get(requests.session(), server.url + 'a')
+        assert resp.status_code == 200 and server.requests == 3
+    with ReplayServer(_flaky(5)) as server:
+        resp = _policy(retries=1).get(requests.session(), server.url + 'a')
+        assert resp.status_code == 503 and server.requests == 2
+
+
+def test_circuit_breaker(tmp_path):
+    location = str(tmp_path / 'breakers.json')
+    cache = HttpCache(str(tmp_path / 'cache'), ttl=0)
+    session = requests.session()
+    with ReplayServer(_flaky(100)) as server:
+        policy = _policy(retries=0, breaker=CircuitBreaker(location, threshold=2))
+        with pytest.raises(requests.ConnectionError):
+            policy.get(session, 'http://127.0.0.1:1/')
+        assert policy.get(session, server.url + 'a', cache, MATCH_LIST).status_code == 503
+        assert policy.get(session, server.url + 'a', cache, MATCH_LIST).status_code == 503
+        server.reset()
+        with pytest.raises(CircuitOpen):
+            policy.get(session, server.url + 'a', cache, MATCH_LIST)
+        assert server.requests == 0
+
+        # breakers are shared by runs
+        policy = _policy(breaker=CircuitBreaker(location, threshold=2, reset_timeout=0))
+        assert not CircuitBreaker(location, threshold=2).allow(server.url.split('/')[2])
+        with pytest.raises(requests.ConnectionError):
+            policy.get(session, 'http://127.0.0.1:1/')
+        assert policy.breaker.hosts['127.0.0.1:1']['failures'] == 2
+
+
+def test_half_open(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    breaker.failure('a')
+    assert not breaker.allow('a')
+    now[0] += 60
+    assert breaker.allow('a')  # single trial request
+    assert not breaker.allow('a')
+    breaker.failure('a')
+    assert not breaker.allow('a')
+    now[0] += 60
+    assert breaker.allow('a') and not breaker.allow('a')
+    now[0] += 60  # trial never reported back
+    assert breaker.allow('a')
+    breaker.success('a')
+    assert breaker.allow('a') and breaker.allow('a')
+
+
+def test_stale_fallback(tmp_path):
+    cache = HttpCache(str(tmp_path), ttl=0)
+    session = requests.session()
+    with ReplayServer(_flaky(0)) as server:
+        policy = _policy(retries=1, breaker=CircuitBreaker(threshold=1, reset_timeout=60))
+        assert policy.get(session, server.url + 'a', cache, MATCH_LIST).text == 'page /a'
+        server.errors = {'.*': 500}
+        resp = policy.get(session, server.url + 'a', cache, MATCH_LIST)
+        assert resp.status_code == 200 and resp.text == 'page /a' and 'Age' in resp.headers
+        server.reset()
+        # breaker is open now, cached response is served without asking the host
+        assert policy.get(session, server.url + 'a', cache, MATCH_LIST).text == 'page /a'
+        assert server.requests == 0
+
+
+def test_deadline(tmp_path):
+    cache = HttpCache(str(tmp_path), ttl=0)
+    session = requests.session()
+    with ReplayServer(_flaky(0)) as server:
+        policy = _policy(deadline=5)
+        policy.get(session, server.url + 'a', cache, MATCH_LIST)
+        server.latency = 1
+        policy.set_deadline(0.2)
+        started = time.perf_counter()
+        assert policy.get(session, server.url + 'a', cache, MATCH_LIST).text == 'page /a'
+        with pytest.raises(requests.Timeout):
+            policy.get(session, server.url + 'b')
+        assert time.perf_counter() - started < 0.9
+        # running out of time doesn't count against the host
+        failures = policy.breaker.hosts[server.url.split('/')[2]]['failures']
+        with pytest.raises(DeadlineExceeded):
+            policy.get(session, server.url + 'b')
+        assert policy.breaker.hosts[server.url.split('/')[2]]['failures'] == failures
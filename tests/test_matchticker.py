@@ -1,11 +1,18 @@
 import json
+import threading
+import time
 
 import pkg_resources
 
 import requests
+from lxml import etree
 from parsel import Selector
 
-from ggmt.matchticker import GosuTicker
+from ggmt import Match
+from ggmt.matchticker import GosuTicker, download_games, iter_games, merge_matches, time_to_seconds
+
+# fixtures were parsed as if pages were downloaded at this time
+REFERENCE = 1500000000
 
 
 class TestMatchTicker:
@@ -18,16 +25,131 @@ class TestMatchTicker:
         data = pkg_resources.resource_string('tests', f'/html/match_{game}.html').decode('utf-8')
         result = pkg_resources.resource_string('tests', f'/html/match_{game}.json').decode('utf-8')
         sel = Selector(text=data)
-        matches = list(gt.find_matches(sel))
+        matches = list(gt.find_matches(sel, REFERENCE))
         assert json.dumps(matches) == result
 
+    def test_time_to_seconds(self):
+        assert time_to_seconds('Live') == 0
+        assert time_to_seconds(' 1h 30m ') == 5400
+        assert time_to_seconds('1w 2d') == 3600 * 24 * 9
+        assert time_to_seconds('2h 5m ago') == -7500
+        assert time_to_seconds('') == 0
+
+    def test_timestamp(self):
+        gt = GosuTicker('dota2')
+        data = pkg_resources.resource_string('tests', '/html/match_dota2.html').decode('utf-8')
+        for m in gt.find_matches(Selector(text=data), REFERENCE):
+            assert m['timestamp'] == REFERENCE + m['time_secs']
+
+    def test_history_timestamp(self):
+        gt = GosuTicker('dota2')
+        rows = ['<tr><td class="status"><span>{}</span></td><td><a href="/dota2/tournaments/1/matches/{}-a-vs-b">'
+                '<span class="opp1"><span>A</span></span><span class="opp2"><span>B</span></span></a></td></tr>'
+                .format(text, i) for i, text in enumerate(['2h 5m ago', '5m ago'])]
+        matches = [gt.extractor.extract(etree.fromstring(row), REFERENCE) for row in rows]
+        assert [m['timestamp'] for m in matches] == [REFERENCE - 7500, REFERENCE - 300]
+        # merged history lists the most recent matches first
+        assert [m['time'] for m in merge_matches([matches])] == ['5m ago', '2h 5m ago']
+
+    def test_stream_matches(self):
+        for game in GosuTicker.games:
+            gt = GosuTicker(game)
+            data = pkg_resources.resource_string('tests', f'/html/match_{game}.html')
+            expected = list(gt.find_matches(Selector(text=data.decode('utf-8'))))
+            chunks = (data[i:i + 1000] for i in range(0, len(data), 1000))
+            streamed = list(gt.stream_matches(chunks))
+            for m in expected + streamed:
+                del m['timestamp']
+            assert json.dumps(streamed) == json.dumps(expected)
+
+    def test_update_match_streams(self):
+        gt = GosuTicker('dota2')
+        data = pkg_resources.resource_string('tests', '/html/match_dota2.html').decode('utf-8')
+        matches = list(gt.find_matches(Selector(text=data)))
+        live = [m for m in matches if not m['time_secs']]
+        failing = live[0]['url']
+
+        def find_stream(match):
+            if match['url'] == failing:
+                raise requests.ConnectionError('connection reset')
+            return 'http://twitch.tv/{}'.format(match['id'])
+
+        gt.find_stream = find_stream
+        updated = gt.update_match_streams(matches, max_workers=4)
+        assert [m['url'] for m in updated] == [m['url'] for m in matches]
+        assert live[0]['stream'] is None
+        for m in live[1:]:
+            assert m['stream'] == 'http://twitch.tv/{}'.format(m['id'])
+        assert all('stream' not in m for m in updated if m['time_secs'])
+
+    def test_iter_match_streams(self):
+        gt = GosuTicker('dota2')
+        data = pkg_resources.resource_string('tests', '/html/match_dota2.html').decode('utf-8')
+        matches = list(gt.find_matches(Selector(text=data)))
+        first_live = next(m for m in matches if not m['time_secs'])
+        release = threading.Event()
+
+        def find_stream(match):
+            if match is first_live:
+                release.wait(5)
+            return 'http://twitch.tv/{}'.format(match['id'])
+
+        gt.find_stream = find_stream
+        release.set()
+        ordered = list(gt.iter_match_streams(matches, ordered=True))
+        assert [m['url'] for m in ordered] == [m['url'] for m in matches]
+
+        release.clear()
+        unordered = gt.iter_match_streams(matches, ordered=False)
+        ready = [next(unordered) for _ in range(len(matches) - 1)]
+        assert first_live not in ready  # slow page doesn't hold back the rest
+        release.set()
+        assert list(unordered) == [first_live]
+        assert first_live['stream'] == 'http://twitch.tv/{}'.format(first_live['id'])
+
+    def test_download_games(self, monkeypatch):
+        def download_matches(ticker, crawl_stream=True, max_workers=None):
+            data = pkg_resources.resource_string('tests', f'/html/match_{ticker.game}.html').decode('utf-8')
+            matches = list(ticker.find_matches(Selector(text=data)))
+            for m in matches:
+                m['source'] = ticker.game
+            return matches
+
+        monkeypatch.setattr(GosuTicker, 'download_matches', download_matches)
+        matches = download_games(['dota2', 'counterstrike', 'dota2'])
+        assert [m['time_secs'] for m in matches] == sorted(m['time_secs'] for m in matches)
+        assert {m['source'] for m in matches} == {'dota2', 'counterstrike'}
+        assert len(matches) == 24
+        assert [m['game'] for m in download_games(['dota2'])] == ['dota2'] * 12
+
+    def test_iter_games_stops_early(self, monkeypatch):
+        produced = []
+        closed = threading.Semaphore(0)
+
+        def iter_matches(ticker, history=False, ordered=True, max_workers=None):
+            try:
+                for i in range(1000):
+                    produced.append(i)
+                    time.sleep(0.001)
+                    yield Match(id=i, t1=ticker.game, t2='', source=ticker.game)
+            finally:
+                closed.release()
+
+        monkeypatch.setattr(GosuTicker, 'iter_matches', iter_matches)
+        for _ in iter_games(['dota2', 'counterstrike']):
+            break
+        assert closed.acquire(timeout=5) and closed.acquire(timeout=5)  # both producers stopped
+        count = len(produced)
+        time.sleep(0.05)
+        assert len(produced) == count < 2000
+
     def _save_matches(self):
         for game in GosuTicker.games:
             print('updating test data for: {}'.format(game))
             gt = GosuTicker(game)
             data = requests.get(gt.game_url).text
             sel = Selector(text=data)
-            matches = list(gt.find_matches(sel))
+            matches = list(gt.find_matches(sel, REFERENCE))
             with open(f'html/match_{game}.html', 'w') as f:
                 f.write(data)
             with open(f'html/match_{game}.json', 'w') as f:
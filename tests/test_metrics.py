@@ -0,0 +1,73 @@
+import urllib.request
+
+import pytest
+
+from ggmt.cache import HttpCache
+from ggmt.matchticker import GosuTicker
+from ggmt.metrics import METRICS, Metrics
+from tests.replay import ReplayServer, gosugamers_routes
+
+
+@pytest.fixture
+def gosu(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        METRICS.reset()
+        yield server
+    METRICS.reset()
+
+
+def test_openmetrics(tmp_path):
+    metrics = Metrics()
+    metrics.inc('ggmt_http_requests', host='a', status='200')
+    metrics.inc('ggmt_http_requests', host='a', status='200')
+    metrics.inc('ggmt_http_response_bytes', 10, host='a "b"')
+    with metrics.timer('ggmt_phase_seconds', phase='render'):
+        pass
+    metrics.observe('ggmt_phase_seconds', 0.5, phase='selector')
+    text = metrics.openmetrics()
+    lines = text.splitlines()
+    assert 'ggmt_http_requests_total{host="a",status="200"} 2' in lines
+    assert 'ggmt_http_response_bytes_total{host="a \\"b\\""} 10' in lines
+    assert '# TYPE ggmt_phase_seconds summary' in lines and '# UNIT ggmt_phase_seconds seconds' in lines
+    assert 'ggmt_phase_seconds_count{phase="selector"} 1' in lines
+    assert 'ggmt_phase_seconds_sum{phase="selector"} 0.5' in lines
+    assert lines[-1] == '# EOF'
+    location = tmp_path / 'metrics' / 'ggmt.prom'
+    metrics.write(str(location))
+    assert location.read_text() == text
+    assert 'phase render' in metrics.table()
+
+
+def test_serve():
+    metrics = Metrics()
+    metrics.inc('ggmt_polls', game='dota2', result='ok')
+    server = metrics.serve(0)
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(server.server_port)
+        with urllib.request.urlopen(url) as resp:
+            assert resp.headers['Content-Type'].startswith('application/openmetrics-text')
+            assert resp.read().decode('utf-8') == metrics.openmetrics()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_ticker_phases(gosu, tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache'), ttl=60)
+    GosuTicker('dota2', results=None).download_matches(crawl_stream=False)
+    assert not any(name == 'ggmt_row_parse_seconds' for name, _ in METRICS.summaries)  # off unless asked for
+    METRICS.reset()
+    gosu.reset()
+    METRICS.detailed = True
+    matches = GosuTicker('dota2', cache=cache, results=None).download_matches()
+    GosuTicker('dota2', cache=cache, results=None).download_matches(crawl_stream=False)
+    counters = {(name, labels): value for (name, labels), value in METRICS.counters.items()}
+    requests = sum(value for (name, _), value in counters.items() if name == 'ggmt_http_requests')
+    assert requests == gosu.requests
+    assert sum(value for (name, _), value in counters.items() if name == 'ggmt_http_response_bytes') == gosu.bytes
+    assert counters[('ggmt_cache_requests', (('kind', 'match_list'), ('result', 'hit')))] == 1
+    summaries = {(name, labels): value for (name, labels), value in METRICS.summaries.items()}
+    assert summaries[('ggmt_row_parse_seconds', (('page', 'dota2'),))][0] == 2 * len(matches)
+    assert summaries[('ggmt_phase_seconds', (('phase', 'selector'),))][0] == 2
+    assert ('ggmt_phase_seconds', (('phase', 'streams'),)) in summaries
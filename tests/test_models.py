@@ -0,0 +1,22 @@
+import json
+
+import pkg_resources
+
+from ggmt import Event, Match
+
+
+class TestMatch:
+    def matches(self):
+        data = pkg_resources.resource_string('tests', '/html/match_dota2.json').decode('utf-8')
+        return [Match.from_json(json.dumps(m)) for m in json.loads(data)]
+
+    def test_roundtrip(self):
+        for match in self.matches():
+            assert Match.from_json(match.to_json()) == match
+            # rows don't tell missing keys and None values apart
+            assert Match.from_tuple(match.as_tuple()).as_tuple() == match.as_tuple()
+            assert len(match.as_tuple()) == len(Match.keys)
+
+    def test_from_tuple(self):
+        event = Event.from_tuple(('TI7', None, 'http://wiki.teamliquid.net/dota2/TI7', None))
+        assert event == {'name': 'TI7', 'url': 'http://wiki.teamliquid.net/dota2/TI7'}
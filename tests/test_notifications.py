@@ -0,0 +1,123 @@
+import json
+import subprocess
+import threading
+import time
+
+import pytest
+
+from ggmt.notifications import (Dispatcher, Notification, NotificationBackend, RateLimiter, WebhookBackend,
+                                dbus_environment, notify_send)
+from tests.replay import ReplayServer
+
+
+class _Backend(NotificationBackend):
+    name = 'test'
+
+    def __init__(self, fail=False, **kwargs):
+        super().__init__(**kwargs)
+        self.fail = fail
+        self.connects = 0
+        self.sent = []
+
+    def connect(self):
+        self.connects += 1
+        return object()
+
+    def send(self, title, body, notifications):
+        if self.fail:
+            raise ConnectionError('backend is down')
+        self.sent.append((title, body))
+
+
+def test_notify_send_without_shell(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(subprocess, 'run', lambda args, **kwargs: calls.append((args, kwargs)))
+    xdbus = tmp_path / 'Xdbus'
+    xdbus.write_text("DBUS_SESSION_BUS_ADDRESS='unix:abstract=/tmp/dbus-x,guid=1'\n"
+                     "export DBUS_SESSION_BUS_ADDRESS\n$(touch {})\n".format(tmp_path / 'pwned'))
+    env = dbus_environment(str(xdbus))
+    assert env['DBUS_SESSION_BUS_ADDRESS'] == 'unix:abstract=/tmp/dbus-x,guid=1'
+    notify_send('"; rm -rf ~; "', '$(reboot)', env=env)
+    args, kwargs = calls[0]
+    assert args == ['notify-send', '--', '"; rm -rf ~; "', '$(reboot)']
+    assert kwargs['env'] is env and not kwargs.get('shell')
+    assert not (tmp_path / 'pwned').exists()
+
+
+def test_dispatcher_batches():
+    backend = _Backend()
+    with Dispatcher([backend]) as dispatcher:
+        navi = dispatcher.submit(Notification('Navi vs OG', '5m', 'http://a', 100), 'test')
+        liquid = dispatcher.submit(Notification('Liquid vs VP', '5m', 'http://b', 100), 'test')
+        secret = dispatcher.submit(Notification('EG vs Secret', '1h 0m', 'http://c', 3400), 'test')
+    assert backend.sent == [('Navi vs OG, Liquid vs VP in 5m', 'Navi vs OG: http://a\nLiquid vs VP: http://b'),
+                            ('EG vs Secret in 1h 0m', 'http://c')]
+    assert backend.connects == 1  # client is reused
+    assert all(n.future.result() for n in (navi, liquid, secret))
+    with pytest.raises(ValueError):
+        Dispatcher([backend]).submit(navi, 'unknown')
+
+
+def test_dispatcher_failure():
+    backend = _Backend(fail=True)
+    with Dispatcher([backend]) as dispatcher:
+        notification = dispatcher.submit(Notification('Navi vs OG', '5m', 'http://a'), 'test')
+    with pytest.raises(ConnectionError):
+        notification.future.result()
+
+
+def test_full_queue_blocks_only_its_backend():
+    release = threading.Event()
+
+    class Slow(_Backend):
+        name = 'slow'
+
+        def send(self, title, body, notifications):
+            release.wait(5)
+            super().send(title, body, notifications)
+
+    slow, fast = Slow(), _Backend()
+    with Dispatcher([slow, fast], queue_size=1, batch_window=0) as dispatcher:
+        # first is being sent, second waits in queue, third blocks its submitter
+        submitter = threading.Thread(target=lambda: [dispatcher.submit(Notification(str(i), '5m', 'http://a', i),
+                                                                       'slow') for i in range(3)])
+        submitter.start()
+        time.sleep(0.1)
+        started = time.monotonic()
+        notification = dispatcher.submit(Notification('Navi vs OG', '5m', 'http://b'), 'test')
+        assert notification.future.result(timeout=1) and time.monotonic() - started < 1
+        release.set()
+        submitter.join()
+    assert len(slow.sent) == 3 and fast.sent == [('Navi vs OG in 5m', 'http://b')]
+
+
+def test_rate_limit():
+    limiter = RateLimiter(rate=20, burst=2)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.wait()
+    # two messages at once, the other two 50ms apart
+    assert 0.09 < time.monotonic() - started < 0.5
+    backend = _Backend(rate=20)
+    started = time.monotonic()
+    with Dispatcher([backend], batch_window=0) as dispatcher:
+        for start in range(3):
+            dispatcher.submit(Notification('Navi vs OG', '5m', 'http://a', start), 'test')
+    assert len(backend.sent) == 3
+    assert time.monotonic() - started > 0.09
+
+
+def test_webhook():
+    with ReplayServer([(r'^/hook$', lambda path, found: (204, b''))]) as server:
+        backend = WebhookBackend(server.url + 'hook')
+        with Dispatcher([backend]) as dispatcher:
+            dispatcher.submit(Notification('Navi vs OG', '5m', 'http://a', 100), 'webhook')
+            dispatcher.submit(Notification('Liquid vs VP', '5m', 'http://b', 100), 'webhook')
+        with Dispatcher([WebhookBackend(server.url + 'missing')]) as dispatcher:
+            failed = dispatcher.submit(Notification('EG vs Secret', 'Live', 'http://c'), 'webhook')
+    path, body = server.posts[0]
+    data = json.loads(body)
+    assert path == '/hook' and len(server.posts) == 2  # one batched message and the failed one
+    assert data['title'] == 'Navi vs OG, Liquid vs VP in 5m'
+    assert [m['link'] for m in data['matches']] == ['http://a', 'http://b']
+    assert failed.future.exception() is not None  # 404
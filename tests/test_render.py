@@ -0,0 +1,20 @@
+import os
+
+from ggmt.render import Renderer
+
+
+class TestRenderer:
+    def test_render_many(self, tmpdir, make_match):
+        renderer = Renderer(str(tmpdir), prefix='>')
+        template = renderer.template('{{prefix}} {{t1}} vs {{t2}}')
+        assert renderer.template('{{prefix}} {{t1}} vs {{t2}}') is template
+        text = renderer.render_many(template, [make_match(t1='Navi', t2='OG'), make_match(t1='EG', t2='Secret')])
+        assert text == '> Navi vs OG\n> EG vs Secret'
+
+    def test_bytecode_cache(self, tmpdir, make_match):
+        Renderer(str(tmpdir)).template('{{t1}}')
+        assert len(os.listdir(str(tmpdir))) == 1
+        # compiled template is picked up by new renderer
+        template = Renderer(str(tmpdir)).template('{{t1}}')
+        assert template.render(make_match(t1='Navi', t2='OG')) == 'Navi'
+        assert len(os.listdir(str(tmpdir))) == 1
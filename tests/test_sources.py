@@ -0,0 +1,139 @@
+import json
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from ggmt import Match
+from ggmt.cli import RegistryChoice, cli
+from ggmt.matchticker import GosuTicker
+from ggmt.sources import (SOURCES, GosuSource, MatchSource, SourceStats, Sources, merge_results, register,
+                          source_games)
+from tests.replay import ReplayServer, gosugamers_routes
+
+
+class FakeSource(MatchSource):
+    games = ['dota2']
+    matches = []
+    error = None
+    delay = 0
+
+    def __init__(self, cache=None, streams=None):
+        super().__init__(cache, streams)
+        self.calls = 0
+        self.release = threading.Event()
+
+    def download_matches(self, game, crawl_stream=True, max_workers=None):
+        self.calls += 1
+        self.release.wait(self.delay)
+        if self.error:
+            raise self.error
+        return [Match(m) for m in self.matches]
+
+
+@pytest.fixture
+def fakes(monkeypatch, make_match):
+    monkeypatch.setattr('ggmt.sources.SOURCES', SOURCES.copy())
+
+    @register
+    class Fast(FakeSource):
+        name = 'fast'
+        matches = [make_match('1', 'Team A', 'Team B')]
+
+    @register
+    class Slow(FakeSource):
+        name = 'slow'
+        matches = [make_match('x1', 'team b', 'team a', time_secs=600), make_match('x2', 'c', 'd')]
+        delay = 5
+
+    return Fast, Slow
+
+
+def test_cli_choices(fakes):
+    # providers registered by other modules are available in the cli
+    assert RegistryChoice().choices == ('gosugamers', 'fast', 'slow')
+    assert RegistryChoice(games=True).choices == tuple(source_games())
+    result = CliRunner().invoke(cli, ['--no-cache', '--no-archive', '--provider', 'fast', 'tick', 'dota2', '--json'])
+    assert result.exit_code == 0, result.output
+    assert [(m['id'], m['provider']) for m in json.loads(result.output)] == [('1', 'fast')]
+
+
+def test_merge_results(make_match):
+    first = [make_match('1'), make_match('2', time_secs=3600)]
+    second = [make_match('x1', t1='B', t2='A', time_secs=300), make_match('x2', time_secs=7200)]
+    merged = merge_results([('first', first), ('second', second), ('first', [make_match('1')])])
+    assert [m['id'] for m in merged] == ['1', '2', 'x2']
+    # matches of a single source are told apart by id only
+    assert len(merge_results([('first', first + [make_match('3')])])) == 3
+
+
+def test_first_good_response(fakes):
+    fast, slow = fakes
+    stats = SourceStats()
+    stats.record('fast', 0.01, ok=True)
+    stats.record('slow', 3, ok=True)
+    sources = Sources(['slow', 'fast'], stats=stats)
+    assert [s.name for s in sources.for_game('dota2')] == ['fast', 'slow']
+    assert [m['id'] for m in sources.download('dota2')] == ['1']
+    # slow source wasn't asked at all since fast one responded within its hedge delay
+    assert sources.sources[0].calls == 0
+
+
+def test_fallback_and_stats(fakes):
+    fast, slow = fakes
+    fast.error = ConnectionRefusedError('Got response error 503')
+    slow.delay = 0
+    sources = Sources(['fast', 'slow'])
+    assert [m['id'] for m in sources.download('dota2')] == ['x1', 'x2']
+    assert sources.stats.sources['fast']['error_rate'] == 1
+    assert [s.name for s in sources.for_game('dota2')] == ['slow', 'fast']
+
+    slow.error = ConnectionRefusedError('Got response error 500')
+    with pytest.raises(ConnectionRefusedError):
+        sources.download('dota2')
+    with pytest.raises(NotImplementedError):
+        sources.download('lol')
+
+
+def test_hedged_request(fakes):
+    fast, slow = fakes
+    stats = SourceStats()
+    stats.record('slow', 0.01, ok=True)
+    stats.record('fast', 1, ok=True)
+    sources = Sources(['slow', 'fast'], stats=stats)
+    try:
+        # slow source is expected to be fast, but hangs
+        assert [m['id'] for m in sources.download('dota2')] == ['1']
+    finally:
+        sources.sources[0].release.set()
+    assert [s.calls for s in sources.sources] == [1, 1]
+
+
+def test_merge(fakes):
+    fast, slow = fakes
+    slow.delay = 0
+    sources = Sources(['fast', 'slow'], merge=True)
+    assert [m['id'] for m in sources.download('dota2')] == ['1', 'x2']
+
+
+def test_stats_persisted(tmp_path):
+    location = str(tmp_path / 'sources.json')
+    stats = SourceStats(location)
+    stats.record('gosugamers', 1, ok=True)
+    stats.record('gosugamers', 2, ok=False)
+    stats.save()
+    assert SourceStats(location).sources == stats.sources
+    (tmp_path / 'sources.json').write_text('broken')
+    assert SourceStats(location).sources == {}
+
+
+def test_gosu_source(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        expected = GosuTicker('dota2', results=None).download_matches()
+        matches = Sources(['gosugamers']).download_games(['dota2'])
+        assert [m.id for m in matches] == [m.id for m in expected]
+        assert {m['provider'] for m in matches} == {'gosugamers'}
+        live = next(m for m in matches if not m['time_secs'])
+        assert Sources().resolve_stream(live) == live['stream']
+        assert isinstance(Sources().sources[0], GosuSource)
@@ -0,0 +1,51 @@
+import time
+
+from ggmt.matchticker import GosuTicker
+from ggmt.streams import StreamMemo
+from tests.replay import ReplayServer, gosugamers_routes
+
+
+class TestStreamMemo:
+    def test_persisted(self, tmp_path, make_match):
+        location = str(tmp_path / 'streams.db')
+        with StreamMemo(location) as memo:
+            assert memo.get(make_match('1')) == (False, None)
+            memo.set(make_match('1'), 'http://twitch.tv/x')
+            memo.set(make_match('2'), None)
+        with StreamMemo(location) as memo:
+            assert memo.get(make_match('1')) == (True, 'http://twitch.tv/x')
+            assert memo.get(make_match('2')) == (True, None)
+            # only live matches have streams
+            assert memo.get(make_match('1', time_secs=60)) == (False, None)
+            memo.discard(make_match('1'))
+        with StreamMemo(location, refresh=True) as memo:
+            assert len(memo) == 1
+            assert memo.get(make_match('2')) == (False, None)
+
+    def test_expiry(self, make_match):
+        memo = StreamMemo(location=None, ttl=100, missing_ttl=10)
+        memo.set(make_match('1'), 'http://twitch.tv/x')
+        memo.set(make_match('2'), None)
+        memo.entries = {key: (stream, resolved - 50) for key, (stream, resolved) in memo.entries.items()}
+        assert memo.get(make_match('1')) == (True, 'http://twitch.tv/x')
+        assert memo.get(make_match('2')) == (False, None)
+
+    def test_old_entries_pruned(self, tmp_path):
+        location = str(tmp_path / 'streams.db')
+        with StreamMemo(location) as memo:
+            memo.db.execute("INSERT INTO streams VALUES ('old', NULL, ?)", (time.time() - 7 * 24 * 3600,))
+        assert 'old' not in StreamMemo(location).entries
+
+
+def test_ticker_reuses_streams(monkeypatch):
+    with ReplayServer(gosugamers_routes()) as server:
+        monkeypatch.setattr(GosuTicker, 'url_base', server.url)
+        memo = StreamMemo(location=None)
+        first = GosuTicker('dota2', streams=memo, results=None).download_matches()
+        live = [m for m in first if not m['time_secs']]
+        assert live and server.requests == 1 + len(live)
+
+        server.reset()
+        second = GosuTicker('dota2', streams=memo, results=None).download_matches()
+        assert [m.get('stream') for m in second] == [m.get('stream') for m in first]
+        assert server.requests == 1
@@ -0,0 +1,89 @@
+import sys
+import types
+
+import pkg_resources
+import requests
+
+from ggmt import tournament
+from ggmt.brackets import BracketCache, page_revision
+from ggmt.tournament import LiquidBracketDownloader, EVENT_PAST, EVENT_FUTURE
+
+
+def _response(name):
+    resp = requests.models.Response()
+    resp.status_code = 200
+    resp.encoding = 'utf-8'
+    resp._content = pkg_resources.resource_string('tests', '/html/{}'.format(name))
+    return resp
+
+
+class TestLiquidBracketDownloader:
+    def downloader(self, **kwargs):
+        dl = LiquidBracketDownloader('dota2', **kwargs)
+        dl.requested = []
+
+        def get(url, kind, **kwargs):
+            dl.requested.append(url)
+            return _response('liquipedia_dota2.html' if url == dl.game_url else 'liquipedia_event.html')
+
+        dl._get = get
+        return dl
+
+    def test_find_tournaments(self):
+        dl = self.downloader()
+        events = dl.find_tournaments()
+        assert [e['name'] for e in events] == ['Kiev Major 2017 ', 'StarLadder i-League Invitational 3 ']
+        assert events[0]['date'] == 'Apr 24 - 30'
+        assert events[0]['url'] == 'http://wiki.teamliquid.net/dota2/Kiev_Major/2017'
+        assert 'info' not in events[0]
+        assert dl.requested == [dl.game_url]
+
+    def test_find_all_tournaments(self):
+        dl = self.downloader()
+        events = dl.find_all_tournaments()
+        assert len(events) == 4
+        assert events[0]['name'] == dl.find_tournaments(EVENT_PAST)[0]['name']
+        assert events[-1]['name'] == dl.find_tournaments(EVENT_FUTURE)[0]['name']
+        assert dl.requested == [dl.game_url]  # index downloaded once
+
+    def test_load_info(self):
+        dl = self.downloader()
+        events = dl.find_tournaments(info=True)
+        assert events[0]['info'] == {
+            'organizer': {'value': 'PGL', 'url': 'http://wiki.teamliquid.net/dota2/PGL'},
+            'prize pool': '$3,000,000 USD',
+        }
+        assert len(dl.requested) == 3
+        dl.load_info(events)  # already loaded
+        assert len(dl.requested) == 3
+
+    def test_find_brackets(self, monkeypatch, tmp_path):
+        parsed = []
+        parse = tournament.parse_brackets
+        monkeypatch.setattr(tournament, 'parse_brackets', lambda body: parsed.append(1) or parse(body))
+        dl = self.downloader(brackets=BracketCache(str(tmp_path)))
+        brackets = dl.find_brackets('http://wiki.teamliquid.net/dota2/Kiev_Major/2017')
+        assert [b['name'] for b in brackets] == ['Upper Bracket']
+        first, final = brackets[0]['rounds']
+        assert first[0] == {'t1': 'OG', 't1_score': '2', 't2': 'Secret', 't2_score': '1'} and first[0].finished
+        assert final == [{'t1': 'OG', 't1_score': None, 't2': 'VP', 't2_score': None}] and not final[0].finished
+
+        # unchanged page is parsed once, also by later runs, and every caller gets its own copy
+        url = 'http://wiki.teamliquid.net/dota2/Kiev_Major/2017'
+        final[0]['t1'] = 'changed'
+        assert dl.find_brackets(url)[0]['rounds'][1][0]['t1'] == 'OG'
+        assert self.downloader(brackets=BracketCache(str(tmp_path))).find_brackets(url)[0]['rounds'][0] == first
+        assert len(parsed) == 1
+
+    def test_page_revision(self):
+        assert page_revision(b'<script>{"wgRevisionId":1234,"x":1}</script>') == '1234'
+        assert page_revision(b'a') != page_revision(b'b')
+
+    def test_download_brackets(self, monkeypatch, capsys):
+        terminalbrackets = types.ModuleType('terminalbrackets')
+        terminalbrackets.Team = lambda name, score: (name, score)
+        terminalbrackets.Bracket = lambda name, rounds: (name, rounds)
+        monkeypatch.setitem(sys.modules, 'terminalbrackets', terminalbrackets)
+        brackets = self.downloader().download_brackets('http://wiki.teamliquid.net/dota2/Kiev_Major/2017')
+        assert brackets == [('Upper Bracket', [[('OG', '2'), ('Secret', '1'), ('Liquid', '0'), ('VP', '2')], []])]
+        assert capsys.readouterr().out == ''
@@ -0,0 +1,45 @@
+import pytest
+
+from ggmt.watchlist import WatchList, WatchRule, load_watch_list, normalize_team, parse_watch_list
+
+
+def test_normalize_team():
+    assert normalize_team(" Na`Vi ") == normalize_team('NAVI') == 'navi'
+    assert normalize_team('Team_Liquid') == 'teamliquid'
+
+
+def test_find(make_match):
+    navi = WatchRule('Natus Vincere', aliases=["na`vi"], seconds=1800)
+    liquid = WatchRule('Liquid', pattern='team ?liquid', game='dota2')
+    og = WatchRule('OG', seconds=0)
+    also_og = WatchRule('OG again', pattern='og')
+    watched = WatchList([navi, liquid, og, also_og])
+    assert watched.find(make_match(t1='Na Vi', t2='Secret')) == [navi]
+    assert watched.find(make_match(t1='VP', t2='Team Liquid')) == [liquid]
+    assert watched.find(make_match(t1='VP', t2='teamliquid', game='counterstrike')) == []
+    assert watched.find(make_match(t1='VP', t2='teamliquid', game='counterstrike'), game='dota2') == [liquid]
+    # all rules that fired are reported in order of the list
+    assert watched.find(make_match(t1='OG', t2='Natus Vincere')) == [navi, og, also_og]
+    assert watched.find(make_match(t1='Secret', t2='EG')) == []
+
+
+def test_find_backreferences(make_match):
+    # group numbers change in the combined pattern, patterns with groups are matched on their own
+    a = WatchRule('A', pattern=r'(a)\1')
+    b = WatchRule('B', pattern=r'(b)\1')
+    named = WatchRule('C', pattern=r'(?P<c>c)(?P=c)')
+    watched = WatchList([a, b, named, WatchRule('D', pattern='d')])
+    assert watched.find(make_match(t1='bb', t2='x')) == [b]
+    assert watched.find(make_match(t1='aa', t2='cc')) == [a, named]
+    assert watched.find(make_match(t1='ab', t2='x')) == []
+
+
+def test_parse_watch_list(tmp_path):
+    path = tmp_path / 'teams.json'
+    path.write_text('{"seconds": 600, "teams": ["OG", {"name": "Liquid", "pattern": "team ?liquid", "seconds": 0}]}')
+    watched = load_watch_list(str(path))
+    assert [(r.name, r.pattern, r.seconds) for r in watched.rules] == [('OG', None, 600), ('Liquid', 'team ?liquid', 0)]
+    assert len(parse_watch_list(['OG', 'Secret'], seconds=60)) == 2
+    for broken in [{'teams': [{'pattern': 'x'}]}, [{'name': 'x', 'pattern': '('}], [{'name': 'x', 'typo': 1}], 'OG']:
+        with pytest.raises(ValueError):
+            parse_watch_list(broken)